@@ -1,9 +1,14 @@
 import os
+import sys
 import csv
 
 from datetime import datetime, timedelta
 from decimal import *
 
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+import run_report_util
+import manifest_util
+
 # ======================================================================
 # GLOBAL VARIABLES
 
@@ -212,15 +217,14 @@ def write_ev_banner(ev_dem, ev_mm_str, ev_moneyball_states, ev_plus_2, ev_minus_
 
 # ======================================================================
 
-def main():
-    # HOUSE
+def write_house_banners():
     gen_polling, gen_polling_ahead_str, gen_metamargin, gen_ahead_str = parse_house()
     gen_poll_mm_str = f'{gen_polling_ahead_str}{abs(gen_polling)}%'
     gen_mm_str = f'{gen_ahead_str}{abs(gen_metamargin)}%'
 
     write_house_banner(gen_poll_mm_str, gen_mm_str)
 
-    # SENATE
+def write_senate_banners():
     sen_seats_dem, sen_seats_rep, sen_metamargin, sen_ahead_str = parse_senate()
     dem_seats = f'{sen_seats_dem}{" Dem"}'
     rep_seats = f'{sen_seats_rep}{" Rep"}'
@@ -231,13 +235,38 @@ def main():
     write_senate_banner(dem_seats, rep_seats, sen_mm_str)
     write_senate_moneyball_banner(sen_moneyball_states)
 
-    # PRESIDENTIAL
+def write_ev_banners():
     ev_dem, ev_rep, ev_metamargin, ev_ahead_str, ev_plus_2, ev_minus_2 = parse_ev()
     ev_mm_str = f'{ev_ahead_str}{abs(ev_metamargin)}%'
     ev_moneyball_states = get_ev_moneyball_states(3)
 
     write_ev_banner(ev_dem, ev_mm_str, ev_moneyball_states, ev_plus_2, ev_minus_2)    
-    
+
+def run_banners():
+    """
+    Writes the House, Senate and Presidential banners, timing each race as
+    a stage of the run report. A race is skipped if the outputs it reads 
+    did not change since its banners were last written today (see 
+    manifest_util).
+    """
+    stamp_path = os.path.join(DIR_PATH, manifest_util.STAMP_NAME)
+    races = [('House', ['house'], write_house_banners),
+             ('Senate', [f'matlab/Senate_estimates_{YEAR}.csv', f'matlab/Senate_jerseyvotes_{YEAR}.csv'], write_senate_banners),
+             ('Presidential', [f'matlab/EV_estimates_{YEAR}.csv', f'matlab/EV_jerseyvotes_{YEAR}.csv', 
+                               f'matlab/EV_perturbation_{YEAR}.csv'], write_ev_banners)]
+
+    for name, names, write in races:
+        with run_report_util.stage(f'{name} banner', outputs=[DIR_PATH]) as info:
+            info['skipped'] = not manifest_util.run_if_changed(stamp_path, name, names, write)
+
+def main():
+    run_report_util.start_report('banner', os.path.join(DIR_PATH, run_report_util.REPORT_NAME))
+    try:
+        run_banners()
+    except BaseException:
+        run_report_util.write_report('error')
+        raise
+    run_report_util.write_report()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import struct
+import zipfile
+import argparse
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # Optional: Parquet copies of the exports
+except ImportError:
+    pyarrow = None
+
+# ======================================================================
+# GLOBAL VARIABLES
+
+SCHEMA_KEY = '__schema__'
+
+# Columns (name, dtype) of each output, in file order. Scraper outputs
+# have a header row; MATLAB outputs do not.
+POLLS_MEDIAN_COLUMNS = [('num_polls', 'int32'),
+                        ('julian_date', 'int16'),
+                        ('date_most_recent_poll', 'int16'),
+                        ('median_margin', 'float64'),
+                        ('median_std_dev', 'float64')]
+
+EV_ESTIMATES_COLUMNS = [('median_ev_dem', 'int16'),
+                        ('median_ev_rep', 'int16'),
+                        ('mode_ev_dem', 'int16'),
+                        ('mode_ev_rep', 'int16'),
+                        ('assigned_ev_dem', 'int16'),
+                        ('assigned_ev_rep', 'int16'),
+                        ('assigned_ev_undecided', 'int16'),
+                        ('ev_1sigma_lower', 'int16'),
+                        ('ev_1sigma_upper', 'int16'),
+                        ('ev_95ci_lower', 'int16'),
+                        ('ev_95ci_upper', 'int16'),
+                        ('total_polls_used', 'int32'),
+                        ('meta_margin', 'float64'),
+                        ('dem_win_prob', 'float64'),
+                        ('drift_winprob', 'float64'),
+                        ('bayesian_winprob', 'float64')]
+
+SENATE_ESTIMATES_COLUMNS = [('median_seats', 'int16'),
+                            ('mean_seats', 'float64'),
+                            ('dem_control_prob', 'float64'),
+                            ('assigned_dem', 'int16'),
+                            ('assigned_rep', 'int16'),
+                            ('assigned_uncertain', 'int16'),
+                            ('total_polls_used', 'int32'),
+                            ('seats_1sigma_lower', 'int16'),
+                            ('seats_1sigma_upper', 'int16'),
+                            ('mean_contested_margin', 'float64'),
+                            ('meta_margin', 'float64')]
+
+SCHEMAS = {
+    # scraping/outputs/{YEAR}.{name}.polls.median.csv
+    'house.polls.median': POLLS_MEDIAN_COLUMNS,
+    # (in EV.districts, state_num is the num of a 'poll' district, see
+    # scraping_util.get_districts)
+    'polls.median': POLLS_MEDIAN_COLUMNS + [('state_num', 'int16')],
+
+    # matlab/outputs/{name}_{YEAR}.csv
+    'EV_estimates': EV_ESTIMATES_COLUMNS,
+    'EV_estimate_history': [('julian_date', 'int16')] + EV_ESTIMATES_COLUMNS,
+    'EV_histogram': [('probability', 'float64')],
+    'EV_jerseyvotes': [('state_num', 'int16'), ('state', 'U2'), ('jerseyvotes', 'float64')],
+    'EV_MM_table': [('margin', 'float64'), ('median_ev_dem', 'int16')],
+    'EV_perturbation': [('median_ev_dem', 'int16'), ('median_ev_dem_plus_2', 'int16'), ('median_ev_dem_minus_2', 'int16')],
+    'EV_prediction': [('ev_1sigma_lower', 'int16'), ('ev_1sigma_upper', 'int16'),
+                      ('ev_2sigma_lower', 'int16'), ('ev_2sigma_upper', 'int16')],
+    'EV_prediction_MM': [('mm_1sigma_lower', 'float64'), ('mm_1sigma_upper', 'float64'),
+                         ('mm_2sigma_lower', 'float64'), ('mm_2sigma_upper', 'float64')],
+    'EV_prediction_probs': [('bayesian_winprob', 'float64'), ('drift_winprob', 'float64')],
+    'EV_stateprobs': [('dem_win_prob', 'float64'), ('median_margin', 'float64'), ('dem_win_prob_d2', 'float64'),
+                      ('dem_win_prob_r2', 'float64'), ('state', 'U2'), ('nov_dem_win_prob', 'float64')],
+    'House_predictions': [('predicted_mean', 'float64'), ('margin_1sigma_lower', 'float64'), ('margin_1sigma_upper', 'float64'),
+                          ('margin_2sigma_lower', 'float64'), ('margin_2sigma_upper', 'float64'),
+                          ('bayesian_winprob', 'float64'), ('drift_winprob', 'float64')],
+    'Senate_estimates': SENATE_ESTIMATES_COLUMNS,
+    'Senate_estimate_history': [('julian_date', 'int16')] + SENATE_ESTIMATES_COLUMNS,
+    'Senate_histogram': [('probability', 'float64')],
+    'Senate_jerseyvotes': [('state_num', 'int16'), ('state', 'U2'), ('date_most_recent_poll', 'int16'), ('jerseyvotes', 'float64')],
+    'Senate_stateprobs': [('dem_win_prob', 'float64'), ('nov_dem_win_prob', 'float64'), ('median_margin', 'float64'),
+                          ('nov_dem_win_prob_d2', 'float64'), ('nov_dem_win_prob_r2', 'float64'), ('state', 'U2')],
+}
+
+# ======================================================================
+# EXPORT
+
+def get_schema_name(path):
+    """
+    Returns the schema name (see SCHEMAS) of an output CSV from its file
+    name, e.g. 'polls.median' for 2024.Senate.polls.median.csv or
+    'EV_estimates' for EV_estimates_2024.csv, or None if it has none.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+
+    match = re.match(r'^\d{4}\.(.+)$', stem)
+    if match:
+        if match.group(1) == 'house.polls.median':
+            return 'house.polls.median'
+        return 'polls.median' if match.group(1).endswith('.polls.median') else None
+
+    match = re.match(r'^(.+)_\d{4}$', stem)
+    if match and match.group(1) in SCHEMAS:
+        return match.group(1)
+    return None
+
+def export_csv(path, schema_name=None):
+    """
+    Writes an output CSV as a typed columnar file next to it (same name,
+    '.npz'): one array per column, named and typed as in SCHEMAS, plus the
+    schema. The file is uncompressed, so columns load without parsing
+    and can be memory-mapped (see load_columns). With pyarrow installed,
+    a '.parquet' copy is written too.
+
+    Args:
+    - path (str): Path to the CSV.
+    - schema_name (str, optional): Schema (see SCHEMAS). Default is None
+        (from the file name, see get_schema_name).
+
+    Returns:
+    - str: Path to the '.npz' file.
+    """
+    schema_name = schema_name or get_schema_name(path)
+    schema = SCHEMAS[schema_name]
+    names = [name for name, dtype in schema]
+
+    # Scraper outputs have a header row
+    header = 0 if schema_name.endswith('polls.median') else None
+    frame = pd.read_csv(path, header=header, names=names, dtype={name: dtype for name, dtype in schema if dtype[0] != 'U'},
+                        keep_default_na=False)
+
+    columns = {name: frame[name].to_numpy(dtype=dtype) for name, dtype in schema}
+    columns[SCHEMA_KEY] = np.array(json.dumps(dict(name=schema_name, columns=schema)))
+
+    npz_path = os.path.splitext(path)[0] + '.npz'
+    tmp_path = npz_path + '.tmp.npz'
+    np.savez(tmp_path, **columns)
+    os.replace(tmp_path, npz_path)
+
+    if pyarrow is not None:
+        frame.astype({name: dtype for name, dtype in schema if dtype[0] != 'U'}).to_parquet(
+            os.path.splitext(path)[0] + '.parquet', index=False)
+
+    return npz_path
+
+def export_dir(directory):
+    """
+    Exports every output CSV with a schema in a directory (see export_csv).
+
+    Returns:
+    - list of str: Paths to the '.npz' files.
+    """
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith('.csv') and get_schema_name(path) is not None:
+            paths.append(export_csv(path))
+    return paths
+
+# ======================================================================
+# READER
+
+def map_column(path, info):
+    """
+    NOTE: Helper function for load_columns.
+
+    Memory-maps one (uncompressed) '.npy' member of an '.npz' file.
+
+    Args:
+    - path (str): Path to the '.npz' file.
+    - info (zipfile.ZipInfo): Member of the column.
+
+    Returns:
+    - numpy.memmap: Read-only column.
+    """
+    with open(path, 'rb') as f:
+        # Skip the local file header to the '.npy' data
+        f.seek(info.header_offset)
+        name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if shape == (0,):
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran_order else 'C')
+
+def get_schema(path):
+    """
+    Returns the schema of an exported file: a dict with the schema name
+    and the (name, dtype) of each column.
+    """
+    with np.load(path) as data:
+        return json.loads(str(data[SCHEMA_KEY]))
+
+def load_columns(path, columns=None, mmap=False):
+    """
+    Loads columns of an exported output (see export_csv) by name.
+
+    Args:
+    - path (str): Path to the '.npz' file (or the CSV it was exported
+        from).
+    - columns (list of str, optional): Columns to load. Default is None
+        (all columns).
+    - mmap (bool, optional): Whether to memory-map the columns instead of
+        reading them. Default is False.
+
+    Returns:
+    - dict: numpy array by column name, in file order.
+    """
+    path = os.path.splitext(path)[0] + '.npz'
+    names = columns or [name for name, dtype in get_schema(path)['columns']]
+
+    if mmap:
+        with zipfile.ZipFile(path) as archive:
+            return {name: map_column(path, archive.getinfo(f'{name}.npy')) for name in names}
+
+    with np.load(path) as data:
+        return {name: data[name] for name in names}
+
+def load_frame(path, columns=None):
+    """
+    Loads an exported output (see export_csv) as a DataFrame.
+
+    Args:
+    - path (str): Path to the '.npz' file (or the CSV it was exported
+        from).
+    - columns (list of str, optional): Columns to load. Default is None
+        (all columns).
+
+    Returns:
+    - pandas.DataFrame: Output with named, typed columns.
+    """
+    return pd.DataFrame(load_columns(path, columns))
+
+# ======================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Export output CSVs as typed columnar files (.npz, and .parquet with pyarrow).')
+    parser.add_argument('paths', nargs='+', help='output CSVs, or directories of them (e.g. matlab/outputs)')
+    args = parser.parse_args()
+
+    for path in args.paths:
+        exported = export_dir(path) if os.path.isdir(path) else [export_csv(path)]
+        for npz_path in exported:
+            print("Exported", npz_path)
+
+if __name__ == '__main__':
+    main()
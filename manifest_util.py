@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime
+
+# ======================================================================
+# GLOBAL VARIABLES
+
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+MANIFEST_PATH = os.path.join(DIR_PATH, 'scraping', 'outputs', 'manifest.json')
+STAMP_NAME = 'manifest.stamp.json'
+
+# Set FORCE_REGENERATE=1 to redo all work, even if its inputs did not change
+FORCE = os.environ.get('FORCE_REGENERATE') == '1'
+
+# ======================================================================
+# CHANGE MANIFEST
+
+def hash_file(path):
+    """
+    Returns the SHA-256 hex digest of a file's contents, or None if the
+    file does not exist.
+    """
+    if not os.path.isfile(path):
+        return None
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_json(path):
+    """
+    NOTE: Helper function for read_manifest and the stamps.
+
+    Reads a JSON file, or returns an empty dict if it does not exist or
+    cannot be read.
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_json(data, path):
+    """
+    NOTE: Helper function for write_manifest and the stamps.
+
+    Writes a JSON file atomically.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def read_manifest(path=MANIFEST_PATH):
+    """
+    Reads the change manifest: content hashes of the inputs and outputs of
+    each race (written by scraping_util.py) and of the MATLAB outputs
+    (recorded by run2024.sh).
+
+    Returns:
+    - manifest (dict): Entry by name, e.g. 'Senate' or 'matlab', each
+        with an 'outputs' dict of file hashes by file name.
+    """
+    return read_json(path)
+
+def update_manifest(entries, path=MANIFEST_PATH):
+    """
+    Adds or replaces entries of the change manifest.
+
+    Args:
+    - entries (dict): Entry by name (see read_manifest).
+    - path (str, optional): Path of the manifest.
+    """
+    manifest = read_manifest(path)
+    manifest.update(entries)
+    write_json(manifest, path)
+
+def record_outputs(name, paths, path=MANIFEST_PATH):
+    """
+    Records the hashes of output files (e.g. the MATLAB outputs) as a
+    manifest entry.
+
+    Args:
+    - name (str): Entry name, e.g. 'matlab'.
+    - paths (list of str): Output files.
+    - path (str, optional): Path of the manifest.
+    """
+    outputs = {os.path.basename(output): hash_file(output) for output in paths}
+    update_manifest({name: dict(outputs=outputs)}, path)
+
+def get_fingerprint(names, manifest=None):
+    """
+    Fingerprints the outputs a piece of work reads, from the manifest.
+
+    Args:
+    - names (list of str): Manifest entries (e.g. 'EV'), or single files
+        of an entry (e.g. 'matlab/EV_estimates_2024.csv').
+    - manifest (dict, optional): Change manifest. Default is None (read
+        it from MANIFEST_PATH).
+
+    Returns:
+    - str: Hex digest, or None if an entry or file is missing from the
+        manifest (then the work is never skipped).
+    """
+    if manifest is None:
+        manifest = read_manifest()
+
+    hashes = []
+    for name in names:
+        entry, _, file_name = name.partition('/')
+        outputs = manifest.get(entry, {}).get('outputs', {})
+        if file_name:
+            outputs = {file_name: outputs.get(file_name)}
+        if not outputs or None in outputs.values():
+            return None
+        hashes.append([name, outputs])
+
+    return hashlib.sha256(json.dumps(hashes, sort_keys=True).encode()).hexdigest()
+
+def is_up_to_date(stamp_path, key, fingerprint):
+    """
+    Checks whether the work named key was already done today with inputs
+    of the same fingerprint (see mark_up_to_date). Work is always redone
+    at least once a day, and with FORCE_REGENERATE=1.
+
+    Args:
+    - stamp_path (str): Path of the stamps of the consumer, next to its
+        outputs.
+    - key (str): Name of the work, e.g. 'senate'.
+    - fingerprint (str): Fingerprint from get_fingerprint.
+
+    Returns:
+    - bool: Whether the work can be skipped.
+    """
+    if FORCE or fingerprint is None:
+        return False
+
+    stamp = read_json(stamp_path).get(key, {})
+    return (stamp.get('fingerprint') == fingerprint
+            and stamp.get('date') == datetime.today().date().isoformat())
+
+def mark_up_to_date(stamp_path, key, fingerprint):
+    """
+    Records that the work named key was done with inputs of the given
+    fingerprint. Call after its outputs have been written.
+    """
+    stamps = read_json(stamp_path)
+    stamps[key] = dict(fingerprint=fingerprint, date=datetime.today().date().isoformat())
+    write_json(stamps, stamp_path)
+
+def run_if_changed(stamp_path, key, names, function):
+    """
+    Runs function unless the manifest entries it reads (names) are
+    unchanged since it last ran today.
+
+    Args:
+    - stamp_path (str): Path of the stamps of the consumer.
+    - key (str): Name of the work, e.g. 'senate'.
+    - names (list of str): Manifest entries or files (see get_fingerprint).
+    - function (callable): Work to run, without arguments.
+
+    Returns:
+    - bool: Whether function ran.
+    """
+    fingerprint = get_fingerprint(names)
+    if is_up_to_date(stamp_path, key, fingerprint):
+        print(f"Skipping {key}: inputs unchanged")
+        return False
+
+    function()
+    mark_up_to_date(stamp_path, key, fingerprint)
+    return True
+
+# ======================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Change manifest of the nightly pipeline.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for command, help in (('changed', 'exit with 0 if the work must run (inputs changed), 1 if it can be skipped'),
+                          ('mark', 'record that the work ran with the current inputs')):
+        command_parser = subparsers.add_parser(command, help=help)
+        command_parser.add_argument('stamp', help=f'stamps path (e.g. matlab/outputs/{STAMP_NAME})')
+        command_parser.add_argument('key', help='name of the work')
+        command_parser.add_argument('names', nargs='+', help='manifest entries or files the work reads')
+
+    record_parser = subparsers.add_parser('record', help='record output file hashes as a manifest entry')
+    record_parser.add_argument('name', help='entry name (e.g. matlab)')
+    record_parser.add_argument('paths', nargs='+', help='output files')
+
+    args = parser.parse_args()
+
+    if args.command == 'changed':
+        fingerprint = get_fingerprint(args.names)
+        sys.exit(1 if is_up_to_date(args.stamp, args.key, fingerprint) else 0)
+    elif args.command == 'mark':
+        mark_up_to_date(args.stamp, args.key, get_fingerprint(args.names))
+    else:
+        record_outputs(args.name, args.paths)
+
+if __name__ == '__main__':
+    main()
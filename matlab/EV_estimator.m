@@ -133,8 +133,12 @@ polls.SEM(52:53) = max(polls.SEM(52:53), zeros(1,2)+3);
 % polls.margin(52:53)=polls.margin(20)+[12 -12]; % the differences are 2* the deviation in D vote share from statewide average in davesredistricting.org
 % polls.SEM(52:53)=sqrt(polls.SEM(20)^2+4);
 % Use NE state-wide + aggregated district polls for now
-polls.margin(54:56)=polls.margin(28)+[8 21 -28]; % again the differences are 2* the deviation in D vote share from statewide average in davesredistricting.org
-polls.SEM(54:56)=sqrt(polls.SEM(28)^2+4);
+% Derived units (mode 'derive') and their offsets are read from EV_DISTRICTS_CSV
+% (derive_offset: again the differences are 2* the deviation in D vote share from statewide average in davesredistricting.org)
+districts = readtable(EV_DISTRICTS_CSV);
+derived = strcmp(districts.mode, 'derive');
+polls.margin(districts.num(derived))=polls.margin(28)+districts.derive_offset(derived)';
+polls.SEM(districts.num(derived))=sqrt(polls.SEM(28)^2+districts.derive_variance(derived)');
 
 %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
 %%%%%%%%%%%%%%%%%%%%%%% Where the magic happens! %%%%%%%%%%%%%%%%%%%
@@ -0,0 +1,899 @@
+import os
+import csv
+import argparse
+from datetime import datetime
+from functools import partial
+
+import numpy as np
+from scipy.special import erf
+from scipy.stats import t, norm
+
+import regenerate_util
+from distribution_util import get_distributions, get_pivot_probs, solve_shift
+
+# ======================================================================
+# GLOBAL VARIABLES (see federal_constants_2024.m)
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+YEAR = 2024
+POLLS_DIR = os.path.join(dir_path, '..', 'scraping', 'outputs')
+OUTPUT_DIR = os.path.join(dir_path, 'outputs')
+
+EV_POLLS_TXT = os.path.join(POLLS_DIR, f'{YEAR}.EV.polls.median.txt')
+EV_POLLS_DISTRICT_TXT = os.path.join(POLLS_DIR, f'{YEAR}.EV.district.polls.median.txt')
+# Daily medians of the 'poll' districts, with the unit number as the state number
+EV_POLLS_DISTRICTS_TXT = os.path.join(POLLS_DIR, f'{YEAR}.EV.districts.polls.median.txt')
+
+# Tables of the scraper (see scraping_util.get_districts)
+EV_DISTRICTS_CSV = os.path.join(dir_path, '..', 'scraping', f'{YEAR}.EV.districts.csv')
+EV_PRIORS_CSV = os.path.join(dir_path, '..', 'scraping', f'{YEAR}.EV.priors.csv')
+
+# Output files
+EV_ESTIMATES_CSV = f'EV_estimates_{YEAR}.csv'
+EV_ESTIMATE_HISTORY_CSV = f'EV_estimate_history_{YEAR}.csv'
+EV_HISTOGRAM_CSV = f'EV_histogram_{YEAR}.csv'
+EV_STATEPROBS_CSV = f'EV_stateprobs_{YEAR}.csv'
+EV_MM_TABLE_CSV = f'EV_MM_table_{YEAR}.csv'
+EV_PREDICTION_CSV = f'EV_prediction_{YEAR}.csv'
+EV_PREDICTION_PROBS_CSV = f'EV_prediction_probs_{YEAR}.csv'
+EV_PREDICTION_MM_CSV = f'EV_prediction_MM_{YEAR}.csv'
+EV_JERSEYVOTES_CSV = f'EV_jerseyvotes_{YEAR}.csv'
+EV_PERTURBATION_CSV = f'EV_perturbation_{YEAR}.csv'
+TOWIN_URL_TXT = '270towin_URL.txt'
+
+# Julian dates count days since December 31 of the previous year
+JULIAN_EPOCH = datetime(year=YEAR - 1, month=12, day=31)
+ELECTION_DATE = 310         # November 5
+# federal_constants_2024.m subtracts today's Julian date from the MATLAB
+# datenum of the election (days since year 0), not from its Julian date,
+# so DAYS_UNTIL_ELECTION is about 739,000 and the drifts stay at their caps
+ELECTION_DATENUM = datetime(year=YEAR, month=11, day=5).toordinal() + 366
+EV_START_DATE = 112         # first day of EV_regenerate
+
+def read_districts(path=EV_DISTRICTS_CSV, priors_path=EV_PRIORS_CSV):
+    """
+    Reads the sub-units (districts of Maine and Nebraska) from the EV
+    districts table of the scraper.
+
+    Args:
+    - path (str, optional): Path of the EV districts CSV.
+    - priors_path (str, optional): Path of the EV priors CSV, which gives
+        the state number of each parent state.
+
+    Returns:
+    - districts (dict): In table order, 'code' (list of str), 'unit' and
+        'state' (indices of the unit and of its parent state), 'poll'
+        (whether the unit has its own medians, or is derived from its
+        state's), 'derive_offset' and 'derive_variance'.
+    """
+    with open(priors_path, 'r') as f:
+        state_nums = {row['name']: int(row['num']) for row in csv.DictReader(f)}
+    with open(path, 'r') as f:
+        rows = list(csv.DictReader(f))
+
+    return dict(code=[row['code'] for row in rows],
+                unit=np.array([int(row['num']) - 1 for row in rows]),
+                state=np.array([state_nums[row['name']] - 1 for row in rows]),
+                poll=np.array([row['mode'] == 'poll' for row in rows]),
+                derive_offset=np.array([float(row['derive_offset']) for row in rows]),
+                derive_variance=np.array([float(row['derive_variance']) for row in rows]))
+
+DISTRICTS = read_districts()
+
+# States in the order of the TXT files (state_num 1-51), then the
+# districts in the order of the districts table (52-56)
+EV_STATES = ['AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DC', 'DE', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS',
+             'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC',
+             'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY'
+             ] + DISTRICTS['code']
+EV_PER_STATE = np.array([9, 3, 11, 6, 54, 10, 7, 3, 3, 30, 16, 4, 4, 19, 11, 6, 6, 8, 8, 2, 10, 11, 15, 10, 6,
+                         10, 4, 2, 6, 4, 14, 5, 28, 16, 3, 17, 7, 8, 19, 4, 9, 3, 11, 40, 6, 3, 13, 12, 4, 10,
+                         3, 1, 1, 1, 1, 1])
+NUM_STATES = len(EV_STATES)
+NUM_STATE_LINES = 51        # lines per day in the TXT file
+TOTAL_EV = 538
+WIN_EV = 269                # at least 269 EV (a tie) counts as a GOP win
+
+MIN_SEM = 3                 # floor on the uncertainty (percentage points)
+
+EV_MAXDRIFT = 4             # Sam 05/16/24
+# Shifts scanned to bracket the meta-margin (see get_meta_margin)
+SCAN_RANGE = np.arange(-20, 21, dtype=float)
+PRIOR_MM = 3.5              # long-term prediction if there is no history (see mean_MM.m)
+PRIOR_MM_SD = 6
+
+# Voters in 2008 (for jerseyvotes), with Maine and Nebraska split evenly
+# between their districts
+VOTERS = np.array([1424087, 267047, 2592313, 914227, 11146610, 2540666, 1297811, 325632, 205774, 7796916,
+                   3964926, 423443, 595350, 4144125, 1880755, 1230417, 1008998, 1502550, 1410466, 680909,
+                   2031635, 2511461, 4500400, 2526646, 709100, 2304250, 468326, 682716, 1023617, 626931,
+                   2645539, 714754, 5962278, 3790202, 242566, 4201368, 1153284, 1997689, 5410022, 361449,
+                   1718626, 354670, 1756397, 8151590, 1084634, 291955, 3021956, 3067686, 494753, 2673154,
+                   198198], dtype=float)
+VOTERS = np.concatenate([VOTERS, VOTERS[DISTRICTS['state']] / np.bincount(DISTRICTS['state'])[DISTRICTS['state']]])
+
+# 270towin.com map colors by Dem win probability (see write_270towin_strings.m)
+TOWIN_COLORS = ['2', '4', '6', '0', '5', '3', '1']
+TOWIN_THRESHOLDS = np.array([-0.1, 5, 20, 40, 60, 80, 95])
+TOWIN_ORDER = ['AK', 'AL', 'AR', 'AZ', 'CA', 'CO', 'CT', 'DC', 'DE', 'FL', 'GA', 'HI', 'IA', 'ID', 'IL', 'IN',
+               'KS', 'KY', 'LA', 'MA', 'MD', 'ME', 'MI', 'MN', 'MO', 'MS', 'MT', 'NC', 'ND', 'NE', 'NH', 'NJ',
+               'NM', 'NV', 'NY', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VA', 'VT', 'WA',
+               'WI', 'WV', 'WY', 'M1', 'M2', 'N1', 'N2', 'N3']
+
+# ======================================================================
+# MATLAB COMPATIBILITY
+
+def matlab_round(values):
+    """
+    Rounds half away from zero, like MATLAB's round (numpy rounds half
+    to even).
+    """
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+def matlab_colon(start, step, stop):
+    """
+    Returns start:step:stop as MATLAB computes it: the first half of the
+    values counts up from start and the second half down from the end, so
+    that values (and ties with other ranges) match MATLAB's exactly.
+    """
+    n = int(np.floor((stop - start) / step + 1e-10))
+    k = np.arange(n + 1)
+    end = start + n * step
+    return np.where(k <= n / 2, start + k * step, end - (n - k) * step)
+
+def format_value(value):
+    """
+    Formats a number like MATLAB's dlmwrite (5 significant digits).
+    """
+    if np.isnan(value):
+        return 'NaN'
+    if np.isinf(value):
+        return 'Inf' if value > 0 else '-Inf'
+    return '%.5g' % value
+
+def num2str(value):
+    """
+    Formats a number like MATLAB's num2str: integers in full, other
+    numbers with at least 5 significant digits (more for larger numbers).
+    """
+    if np.isnan(value):
+        return 'NaN'
+    if value == np.round(value):
+        return '%d' % value
+    digits = max(int(np.floor(np.log10(abs(value)))) + 5, 5)
+    return '%.*g' % (digits, value)
+
+def write_rows(path, rows, append=False):
+    """
+    NOTE: Helper function for the CSV outputs.
+
+    Writes rows of numbers like MATLAB's dlmwrite.
+
+    Args:
+    - path (str): Path of the CSV.
+    - rows (list of lists): Rows of numbers.
+    - append (bool, optional): Whether to append to the file. Default is
+        False.
+    """
+    with open(path, 'a' if append else 'w') as f:
+        for row in rows:
+            f.write(','.join(format_value(value) for value in row) + '\n')
+
+# ======================================================================
+# POLL MEDIANS
+
+def read_poll_medians(path=EV_POLLS_TXT):
+    """
+    Reads a poll median TXT file written by scraping_util.py. Each line has
+    the number of polls, the Julian date, the date of the most recent
+    poll, the median margin, its standard deviation, and the state number.
+
+    Returns:
+    - polldata (numpy.ndarray): One row per line, newest day first.
+    """
+    return np.loadtxt(path, ndmin=2)
+
+def get_day_polls(polldata, analysis_date=0):
+    """
+    NOTE: Helper function for estimate_ev.
+
+    Gets the 51 lines of one day.
+
+    Args:
+    - polldata (numpy.ndarray): Poll medians from read_poll_medians.
+    - analysis_date (int, optional): Julian date. Default is 0 (the
+        newest day).
+
+    Returns:
+    - polldata (numpy.ndarray): Lines of the day, by state number.
+    """
+    if len(polldata) % NUM_STATE_LINES:
+        print(f"Warning: {EV_POLLS_TXT} is not a multiple of {NUM_STATE_LINES} lines long")
+
+    idx = 0
+    if analysis_date > 0:
+        matches = np.flatnonzero(polldata[:, 1] == analysis_date)
+        if len(matches) == 0:
+            raise ValueError(f"No poll medians for Julian date {analysis_date}")
+        idx = matches[0]
+
+    return polldata[idx:idx + NUM_STATE_LINES]
+
+def get_day_district_polls(polldata, analysis_date):
+    """
+    NOTE: Helper function for estimate_history_row.
+
+    Gets the lines of the 'poll' districts (see read_districts) of one day
+    from their daily medians, in the layout of
+    EV_POLLS_DISTRICT_TXT (which only has the newest day).
+
+    Args:
+    - polldata (numpy.ndarray): Medians of EV_POLLS_DISTRICTS_TXT.
+    - analysis_date (int): Julian date.
+
+    Returns:
+    - district_polldata (numpy.ndarray): Lines of the day, in table order.
+    """
+    day = polldata[polldata[:, 1] == analysis_date]
+    lines = [day[day[:, 5] == unit + 1] for unit in DISTRICTS['unit'][DISTRICTS['poll']]]
+    if any(len(line) != 1 for line in lines):
+        raise ValueError(f"No district poll medians for Julian date {analysis_date}")
+
+    return np.concatenate(lines)
+
+def get_state_polls(polldata, district_polldata):
+    """
+    NOTE: Helper function for estimate_ev.
+
+    Gets the margin and uncertainty of each state and district (see
+    read_districts). Districts with mode 'poll' (Maine's) have their own
+    medians; the others (Nebraska's) are derived from the statewide
+    median.
+
+    Args:
+    - polldata (numpy.ndarray): Lines of the day (see get_day_polls).
+    - district_polldata (numpy.ndarray): Lines of the 'poll' districts,
+        in table order.
+
+    Returns:
+    - margin (numpy.ndarray): D-R margin of each of the NUM_STATES units.
+    - SEM (numpy.ndarray): Uncertainty of each unit.
+    """
+    margin = np.zeros(NUM_STATES)
+    SEM = np.zeros(NUM_STATES)
+
+    margin[:NUM_STATE_LINES] = polldata[:, 3]
+    SEM[:NUM_STATE_LINES] = np.maximum(polldata[:, 4], MIN_SEM)
+
+    poll = DISTRICTS['poll']
+    margin[DISTRICTS['unit'][poll]] = district_polldata[:, 3]
+    SEM[DISTRICTS['unit'][poll]] = np.maximum(district_polldata[:, 4], MIN_SEM)
+
+    derived, state = DISTRICTS['unit'][~poll], DISTRICTS['state'][~poll]
+    margin[derived] = margin[state] + DISTRICTS['derive_offset'][~poll]
+    SEM[derived] = np.sqrt(SEM[state] ** 2 + DISTRICTS['derive_variance'][~poll])
+
+    return margin, SEM
+
+# ======================================================================
+# EV DISTRIBUTION
+
+def get_win_probs(margin, SEM, bias_pct=0):
+    """
+    Converts margins to Dem win probabilities, assuming a normal
+    distribution.
+    """
+    z = (margin + bias_pct) / SEM
+    return (erf(z / np.sqrt(2)) + 1) / 2
+
+def EV_median(margin, SEM, bias_pct=0):
+    """
+    NOTE: Port of EV_median.m.
+
+    Calculates the exact probability distribution of all possible
+    outcomes by convolving the states' outcomes one at a time.
+
+    Args:
+    - margin (numpy.ndarray): D-R margin of each unit.
+    - SEM (numpy.ndarray): Uncertainty of each unit.
+    - bias_pct (float, optional): Shift added to all margins. Default is 0.
+
+    Returns:
+    - result (dict): 'prob_Dem_win' and 'state_probs' (percent) of each
+        unit; 'histogram' and 'cumulative_prob' of 1 to 538 Dem EV; and
+        'median_ev' (Dem).
+    """
+    prob_Dem_win = get_win_probs(margin, SEM, bias_pct)
+
+    # Index i of the distribution is the probability of i EV for the GOP
+    distribution = np.ones(1)
+    for prob, ev in zip(prob_Dem_win, EV_PER_STATE):
+        next_ev = np.zeros(ev + 1)
+        next_ev[0], next_ev[-1] = prob, 1 - prob
+        distribution = np.convolve(distribution, next_ev)
+
+    # Cumulative histogram of all possibilities, from 1 Dem EV
+    histogram = distribution[:TOTAL_EV][::-1]
+    cumulative_prob = np.cumsum(histogram)
+
+    return dict(prob_Dem_win=prob_Dem_win,
+                state_probs=matlab_round(prob_Dem_win * 100),
+                histogram=histogram,
+                cumulative_prob=cumulative_prob,
+                median_ev=int(np.argmax(cumulative_prob >= 0.5)) + 1)
+
+def get_median_evs(margin, SEM, bias_pcts):
+    """
+    Calculates the Dem median EV for several shifts of all margins at 
+    once, with one batched distribution (see get_distributions).
+
+    Args:
+    - margin (numpy.ndarray): D-R margin of each unit.
+    - SEM (numpy.ndarray): Uncertainty of each unit.
+    - bias_pcts (numpy.ndarray): Shifts added to all margins.
+
+    Returns:
+    - numpy.ndarray: Dem median EV for each shift.
+    """
+    probs = get_win_probs(margin, SEM, np.asarray(bias_pcts, dtype=float)[:, None])
+    cumulative_prob = np.cumsum(get_distributions(probs, EV_PER_STATE)[:, 1:], axis=1)
+    return np.argmax(cumulative_prob >= 0.5, axis=1) + 1
+
+def get_gop_win_probs(margins, SEM, bias_pct=0):
+    """
+    Calculates the probability of at least 269 GOP EV (at most 269 Dem EV,
+    as cumulative_prob in EV_median) for several sets of margins at once.
+
+    Args:
+    - margins (numpy.ndarray): D-R margins, one row per scenario.
+    - SEM (numpy.ndarray): Uncertainty of each unit.
+    - bias_pct (float, optional): Shift added to all margins. Default is 0.
+
+    Returns:
+    - numpy.ndarray: GOP win probability of each scenario.
+    """
+    distributions = get_distributions(get_win_probs(margins, SEM, bias_pct), EV_PER_STATE)
+    return distributions[:, 1:WIN_EV + 1].sum(axis=1)
+
+def get_confidence_intervals(cumulative_prob):
+    """
+    NOTE: Helper function for estimate_ev.
+
+    Returns:
+    - list of int: Dem EV of the 1-sigma lower and upper limits, then the
+        95-pct lower and upper limits.
+    """
+    def last_at_most(prob):
+        return int(np.flatnonzero(cumulative_prob <= prob)[-1]) + 1
+
+    def first_at_least(prob):
+        return int(np.flatnonzero(cumulative_prob >= prob)[0]) + 1
+
+    return [last_at_most(0.15865), first_at_least(0.84135), last_at_most(0.025), first_at_least(0.975)]
+
+# ======================================================================
+# META-MARGIN
+
+def get_meta_margin(margin, SEM, median_ev, mm_table=True):
+    """
+    NOTE: Helper function for estimate_ev.
+
+    Finds the meta-margin: minus the smallest shift of all margins, to the
+    hundredth of a point, that makes the race a toss-up (at least 269 Dem
+    EV; see solve_shift). With mm_table, also tabulates the median EV of
+    the shifts EV_estimator.m scans (fine steps of 0.02 near the expected
+    value, and steps of 1 from -20 to 20) in one batch, and brackets the
+    meta-margin with them.
+
+    Args:
+    - margin (numpy.ndarray): D-R margin of each unit.
+    - SEM (numpy.ndarray): Uncertainty of each unit.
+    - median_ev (int): Dem median EV without a shift.
+    - mm_table (bool, optional): Whether to calculate the meta-margin
+        table. Default is True.
+
+    Returns:
+    - metamargin (float): Meta-margin, or -999 if no shift makes it a
+        toss-up.
+    - mm_table (numpy.ndarray): Meta-margin plus shift, and Dem median EV,
+        of each shift tested, or None.
+    """
+    def evaluate(bias_pcts):
+        return get_median_evs(margin, SEM, bias_pcts)
+
+    if not mm_table:
+        shift = solve_shift(evaluate, WIN_EV, SCAN_RANGE)
+        return (-999 if shift is None else -shift), None
+
+    start = matlab_round((WIN_EV - median_ev) / 1.25) / 10 - 2
+    test_values = np.union1d(matlab_colon(start, 0.02, start + 6), SCAN_RANGE)
+    ev_test = evaluate(test_values)
+
+    shift = solve_shift(evaluate, WIN_EV, test_values, ev_test)
+    metamargin = -999 if shift is None else -shift
+    return metamargin, np.column_stack([test_values + metamargin, ev_test])
+
+# ======================================================================
+# PREDICTION
+
+def get_sigma_drift(days_until_election):
+    """
+    NOTE: Helper function for estimate_ev.
+
+    Returns the uncertainty of the November (state-by-state) prediction.
+    """
+    if days_until_election > 90:
+        return 7
+    if days_until_election < 1:
+        return 1.5
+    return np.sqrt((days_until_election / 90 * 7) ** 2 + 1.5 ** 2)
+
+def read_history_metamargins(history_path):
+    """
+    NOTE: Helper function for mean_MM and EV_regenerate.
+
+    Returns the meta-margin of the first line of each date of the
+    estimate history, by Julian date (empty if there is no history).
+    """
+    if not os.path.isfile(history_path) or os.path.getsize(history_path) == 0:
+        return {}
+
+    history = np.loadtxt(history_path, delimiter=',', ndmin=2)
+    dates, first = np.unique(history[:, 0], return_index=True)
+    return dict(zip(dates, history[first, 13]))
+
+def get_mean_metamargin(metamargins, default=PRIOR_MM):
+    """
+    NOTE: Helper function for mean_MM and EV_regenerate.
+
+    Returns the mean of meta-margins by Julian date (see 
+    read_history_metamargins), or default if there are none.
+    """
+    if not metamargins:
+        return default
+    return np.mean([metamargins[date] for date in sorted(metamargins)])
+
+def mean_MM(history_path, default=PRIOR_MM):
+    """
+    NOTE: Port of mean_MM.m.
+
+    Returns the mean meta-margin of the estimate history (the first line
+    of each date), or default if there is no history.
+    """
+    return get_mean_metamargin(read_history_metamargins(history_path), default)
+
+def get_mm_evs(values, metamargin, mm_table=None, margin=None, SEM=None):
+    """
+    NOTE: Helper function for predict_ev.
+
+    Converts meta-margins to Dem EV: by interpolating the meta-margin
+    table (as written to its CSV, like EV_prediction.m), or without one,
+    from the median EV of the corresponding shifts, in one batch.
+
+    Args:
+    - values (list of float): Meta-margins.
+    - metamargin (float): Today's meta-margin.
+    - mm_table (numpy.ndarray, optional): Meta-margin table from 
+        get_meta_margin. Default is None.
+    - margin (numpy.ndarray, optional): D-R margin of each unit (without
+        mm_table).
+    - SEM (numpy.ndarray, optional): Uncertainty of each unit (without
+        mm_table).
+
+    Returns:
+    - numpy.ndarray: Dem EV of each meta-margin (NaN outside the table).
+    """
+    if mm_table is None:
+        return get_median_evs(margin, SEM, np.asarray(values) - metamargin).astype(float)
+
+    mmf = np.array([float(format_value(value)) for value in mm_table[:, 0]])
+    mmf, first = np.unique(mmf, return_index=True)
+    evf = mm_table[first, 1]
+    return matlab_round(np.interp(values, mmf, evf, left=np.nan, right=np.nan))
+
+def get_mm_drift(days_until_election):
+    """
+    NOTE: Helper function for predict_ev.
+
+    Returns the expected drift of the meta-margin until the election.
+    """
+    MM_drift = min(0.4 * np.sqrt(max(days_until_election, 0)), EV_MAXDRIFT)
+    return max(MM_drift, 1.5)
+
+def get_prediction_density(metamargin, days_until_election, prior_mm):
+    """
+    NOTE: Helper function for predict_ev and EV_regenerate.
+
+    Combines the near-term drift of the meta-margin from today with the
+    long-term prediction (the prior).
+
+    Returns:
+    - M_range (numpy.ndarray): November meta-margins.
+    - pred (numpy.ndarray): Probability of each, normalized.
+    """
+    MM_drift = get_mm_drift(days_until_election)
+
+    # Cover a range of +/-4 sigma
+    M_range = matlab_colon(metamargin - 4 * MM_drift, 0.02, metamargin + 4 * MM_drift)
+
+    # Near-term drift from today (long-tailed) and the long-term prediction
+    now_density = t.pdf((M_range - metamargin) / MM_drift, 3)
+    now_density = now_density / now_density.sum()
+    prior = t.pdf((M_range - prior_mm) / PRIOR_MM_SD, 1)
+    prior = prior / prior.sum()
+
+    # Combine to make the prediction
+    pred = now_density * prior
+    return M_range, pred / pred.sum()
+
+def predict_ev(metamargin, days_until_election, history_path, mm_table=None, margin=None, SEM=None, prior_mm=None):
+    """
+    NOTE: Port of EV_prediction.m.
+
+    Predicts the November meta-margin from its drift since today, combined
+    with the long-term prediction from the history (the prior), and
+    converts it to EV (see get_mm_evs).
+
+    Args:
+    - metamargin (float): Today's meta-margin.
+    - days_until_election (int): Days until the election.
+    - history_path (str): Path to the EV estimate history.
+    - mm_table (numpy.ndarray, optional): Meta-margin table from 
+        get_meta_margin. Default is None (convert with margin and SEM).
+    - margin (numpy.ndarray, optional): D-R margin of each unit.
+    - SEM (numpy.ndarray, optional): Uncertainty of each unit.
+    - prior_mm (float, optional): Long-term prediction. Default is None
+        (the mean meta-margin of the history, see mean_MM).
+
+    Returns:
+    - prediction (dict): 'ev_bands' (the 1- and 2-sigma EV limits),
+        'mm_bands' (the same for the meta-margin), 'bayesian_winprob' and
+        'drift_winprob'.
+    """
+    if prior_mm is None:
+        prior_mm = mean_MM(history_path)
+    M_range, pred = get_prediction_density(metamargin, days_until_election, prior_mm)
+
+    predict_mean = (pred * M_range).sum() / pred.sum()
+    cumul_predict = np.cumsum(pred)
+    mm_bands = [M_range[np.argmax(cumul_predict > norm.cdf(sigma))] for sigma in (-1, 1, -2, 2)]
+
+    bands = get_mm_evs([predict_mean] + mm_bands, metamargin, mm_table, margin, SEM)
+
+    return dict(ev_bands=list(bands[1:]),
+                mm_bands=mm_bands,
+                bayesian_winprob=pred[M_range >= 0].sum() / pred.sum(),
+                drift_winprob=t.cdf(metamargin / get_mm_drift(days_until_election), 3))
+
+def write_prediction(prediction, output_dir=OUTPUT_DIR):
+    """
+    Writes the EV prediction, its win probabilities and the meta-margin
+    prediction CSVs.
+    """
+    write_rows(os.path.join(output_dir, EV_PREDICTION_CSV), [prediction['ev_bands']])
+    write_rows(os.path.join(output_dir, EV_PREDICTION_PROBS_CSV), [[prediction['bayesian_winprob'], prediction['drift_winprob']]])
+    write_rows(os.path.join(output_dir, EV_PREDICTION_MM_CSV), [prediction['mm_bands']])
+
+# ======================================================================
+# VOTER POWER
+
+def get_jerseyvotes(margin, SEM, metamargin, days_until_election):
+    """
+    NOTE: Port of EV_jerseyvotes.m.
+
+    Calculates the power of a voter in each state to influence the
+    outcome: the change in win probability when the state's margin moves
+    by 0.1 points, per 1,000 voters, averaged over the drift of a race
+    shifted to a perfect toss-up. The change is exact without rerunning
+    the race per state: it is the change in the state's win probability
+    times the probability that the state is pivotal (see get_pivot_probs).
+
+    Args:
+    - margin (numpy.ndarray): D-R margin of each unit.
+    - SEM (numpy.ndarray): Uncertainty of each unit.
+    - metamargin (float): Today's meta-margin.
+    - days_until_election (int): Days until the election.
+
+    Returns:
+    - jerseyvotes (numpy.ndarray): Voter power of each unit, normalized to
+        100 for the most powerful.
+    """
+    MM_sigma = min(0.4 * np.sqrt(max(days_until_election, 0)), 3)
+    MM_sigma = max(MM_sigma, 2)
+
+    M_range = matlab_colon(-2 * MM_sigma, 0.1, 2 * MM_sigma)
+    now_density = t.pdf(M_range / MM_sigma, 3)
+    now_density = now_density / now_density.sum()
+
+    # Every drift point at once: the GOP wins with 1 to 269 Dem EV
+    margins = margin + M_range[:, None]
+    prob_Dem_win = get_win_probs(margins, SEM, -metamargin)
+    lost, won = get_pivot_probs(prob_Dem_win, EV_PER_STATE, 1, WIN_EV)
+
+    # Nudging a state by -0.1 changes only its own win probability, and the
+    # GOP win probability by that change times the probability that the
+    # state is pivotal
+    nudge = prob_Dem_win - get_win_probs(margins - 0.1, SEM, -metamargin)
+    difference = nudge * (lost - won) * 10000
+
+    kvoters = matlab_round(VOTERS / 1000)
+    accumulator = (difference / kvoters * now_density[:, None]).sum(axis=0)
+
+    return 100 * accumulator / accumulator.max()
+
+def write_jerseyvotes(jerseyvotes, output_dir=OUTPUT_DIR):
+    """
+    Writes the voter power CSV: state number, abbreviation and voter power
+    of each unit, most powerful first.
+    """
+    order = np.argsort(jerseyvotes, kind='stable')[::-1]
+    with open(os.path.join(output_dir, EV_JERSEYVOTES_CSV), 'w') as f:
+        for idx in order:
+            f.write(f'{idx + 1},{EV_STATES[idx]},{num2str(jerseyvotes[idx])}\n')
+
+# ======================================================================
+# EV ESTIMATOR
+
+def get_days_until_election(today=None):
+    """
+    Returns DAYS_UNTIL_ELECTION of federal_constants_2024.m for today (or
+    the given day): ELECTION_DATENUM minus the Julian date.
+    """
+    today = today or datetime.today()
+    return ELECTION_DATENUM - (today - JULIAN_EPOCH).days
+
+def estimate_ev(polldata, district_polldata, analysis_date=0, days_until_election=None, history_path=None, mm_table=True,
+                prior_mm=None):
+    """
+    NOTE: Port of EV_estimator.m (without the histogram plot).
+
+    Calculates the EV estimates of one day.
+
+    Args:
+    - polldata (numpy.ndarray): Poll medians from read_poll_medians.
+    - district_polldata (numpy.ndarray): Maine district poll medians.
+    - analysis_date (int, optional): Julian date. Default is 0 (the
+        newest day).
+    - days_until_election (int, optional): Default is None (from today).
+    - history_path (str, optional): EV estimate history for the
+        prediction. Default is None (in OUTPUT_DIR).
+    - mm_table (bool, optional): Whether to calculate the meta-margin 
+        table. Default is True.
+    - prior_mm (float, optional): Long-term prediction. Default is None
+        (from the history, see predict_ev).
+
+    Returns:
+    - estimate (dict): 'julian_date', 'outputs' (the EV_estimates row),
+        'margin', 'SEM', 'state_probs', 'D2_probs', 'R2_probs',
+        'nov_probs', 'histogram', 'metamargin', 'mm_table' (or None),
+        'perturbation' and 'prediction'.
+    """
+    if days_until_election is None:
+        days_until_election = get_days_until_election()
+    history_path = history_path or os.path.join(OUTPUT_DIR, EV_ESTIMATE_HISTORY_CSV)
+
+    polldata = get_day_polls(polldata, analysis_date)
+    margin, SEM = get_state_polls(polldata, district_polldata)
+    total_polls_used = polldata[:, 0].sum()
+
+    result = EV_median(margin, SEM)
+    state_probs, histogram, cumulative_prob = result['state_probs'], result['histogram'], result['cumulative_prob']
+
+    median_ev = result['median_ev']
+    mode_ev = int(np.argmax(histogram)) + 1
+    probability_GOP_win = cumulative_prob[WIN_EV - 1]
+
+    # Safe EV for each party, and undecided
+    assigned_dem = EV_PER_STATE[state_probs >= 95].sum()
+    assigned_rep = EV_PER_STATE[state_probs <= 5].sum()
+    assigned_ev = [assigned_dem, assigned_rep, TOTAL_EV - assigned_dem - assigned_rep]
+
+    outputs = ([median_ev, TOTAL_EV - median_ev, mode_ev, TOTAL_EV - mode_ev] + assigned_ev
+               + get_confidence_intervals(cumulative_prob) + [total_polls_used])
+
+    # State probabilities for D+2% and R+2% biases, and in November
+    sigma_drift = get_sigma_drift(days_until_election)
+    D2_probs = matlab_round((erf((margin + 2) / SEM / np.sqrt(2)) + 1) * 50)
+    R2_probs = matlab_round((erf((margin - 2) / SEM / np.sqrt(2)) + 1) * 50)
+    nov_probs = matlab_round((erf(margin / np.sqrt(sigma_drift ** 2 + SEM ** 2) / np.sqrt(2)) + 1) * 50)
+
+    metamargin, mm_table = get_meta_margin(margin, SEM, median_ev, mm_table)
+    prediction = predict_ev(metamargin, days_until_election, history_path, mm_table, margin, SEM, prior_mm)
+
+    outputs += [metamargin, 1 - probability_GOP_win, prediction['drift_winprob'], prediction['bayesian_winprob']]
+
+    # Median EV with all polls perturbed by +/- 2
+    perturbation = [median_ev] + list(get_median_evs(margin, SEM, [2, -2]))
+
+    return dict(julian_date=polldata[0, 1],
+                outputs=outputs,
+                margin=margin,
+                SEM=SEM,
+                state_probs=state_probs,
+                D2_probs=D2_probs,
+                R2_probs=R2_probs,
+                nov_probs=nov_probs,
+                histogram=histogram,
+                metamargin=metamargin,
+                mm_table=mm_table,
+                perturbation=perturbation,
+                prediction=prediction)
+
+def write_270towin_strings(state_probs, D2_probs, R2_probs, output_dir=OUTPUT_DIR):
+    """
+    NOTE: Port of write_270towin_strings.m.
+
+    Writes the 270towin.com map strings of today's probabilities and of
+    D+2% and R+2% biases: one color code per unit, in 270towin's order.
+    """
+    order = [EV_STATES.index(state) for state in TOWIN_ORDER]
+
+    def get_string(probs):
+        colors = np.maximum(np.searchsorted(TOWIN_THRESHOLDS, np.asarray(probs)[order], side='right') - 1, 0)
+        return ''.join(TOWIN_COLORS[color] for color in colors)
+
+    with open(os.path.join(output_dir, TOWIN_URL_TXT), 'w', newline='') as f:
+        for probs in (state_probs, D2_probs, R2_probs):
+            f.write(get_string(probs) + '\r')
+
+def write_estimate(estimate, for_history=True, output_dir=OUTPUT_DIR):
+    """
+    Writes the CSVs of EV_estimator.m: estimates (and a line of the
+    history), histogram, state probabilities, meta-margin table (if it
+    was calculated), perturbation, prediction and the 270towin strings.
+
+    Args:
+    - estimate (dict): EV estimates from estimate_ev.
+    - for_history (bool, optional): Whether to append the estimates to
+        the history. Default is True.
+    - output_dir (str, optional): Output directory.
+    """
+    write_rows(os.path.join(output_dir, EV_HISTOGRAM_CSV), [[value] for value in estimate['histogram']])
+
+    with open(os.path.join(output_dir, EV_STATEPROBS_CSV), 'w') as f:
+        for idx, state in enumerate(EV_STATES):
+            f.write(','.join([num2str(estimate['state_probs'][idx]), num2str(estimate['margin'][idx]),
+                              num2str(estimate['D2_probs'][idx]), num2str(estimate['R2_probs'][idx]), state,
+                              num2str(estimate['nov_probs'][idx])]) + '\n')
+
+    write_270towin_strings(estimate['state_probs'], estimate['D2_probs'], estimate['R2_probs'], output_dir)
+    if estimate['mm_table'] is not None:
+        write_rows(os.path.join(output_dir, EV_MM_TABLE_CSV), estimate['mm_table'])
+    write_prediction(estimate['prediction'], output_dir)
+
+    write_rows(os.path.join(output_dir, EV_ESTIMATES_CSV), [estimate['outputs']])
+    if for_history:
+        write_rows(os.path.join(output_dir, EV_ESTIMATE_HISTORY_CSV), [[estimate['julian_date']] + estimate['outputs']], append=True)
+
+    write_rows(os.path.join(output_dir, EV_PERTURBATION_CSV), [estimate['perturbation']])
+
+def run_ev(analysis_date=0, for_history=True, jerseyvotes=True, mm_table=True, today=None, output_dir=OUTPUT_DIR):
+    """
+    Runs the EV part of federal_runner.m: EV_estimator, EV_jerseyvotes
+    and EV_prediction (again, with today's line in the history).
+
+    Args:
+    - analysis_date (int, optional): Julian date. Default is 0 (the
+        newest day).
+    - for_history (bool, optional): Whether to append the estimates to
+        the history. Default is True.
+    - jerseyvotes (bool, optional): Whether to calculate voter power.
+        Default is True.
+    - mm_table (bool, optional): Whether to calculate the meta-margin
+        table. Default is True.
+    - today (datetime, optional): Default is None (today).
+    - output_dir (str, optional): Output directory.
+
+    Returns:
+    - estimate (dict): EV estimates from estimate_ev.
+    """
+    days_until_election = get_days_until_election(today)
+    history_path = os.path.join(output_dir, EV_ESTIMATE_HISTORY_CSV)
+
+    estimate = estimate_ev(read_poll_medians(EV_POLLS_TXT), read_poll_medians(EV_POLLS_DISTRICT_TXT),
+                           analysis_date, days_until_election, history_path, mm_table)
+    write_estimate(estimate, for_history, output_dir)
+
+    if jerseyvotes:
+        write_jerseyvotes(get_jerseyvotes(estimate['margin'], estimate['SEM'], estimate['metamargin'], days_until_election), output_dir)
+
+    write_prediction(predict_ev(estimate['metamargin'], days_until_election, history_path, estimate['mm_table'],
+                                estimate['margin'], estimate['SEM']), output_dir)
+
+    return estimate
+
+# ======================================================================
+# HISTORY REGENERATION
+
+def estimate_history_row(medians, analysis_date, days_until_election):
+    """
+    NOTE: Helper function for EV_regenerate (runs in a worker).
+
+    Calculates the EV estimates of one day, without the meta-margin table
+    and with a placeholder prior (see EV_regenerate). The districts are
+    taken from the same day, not from the newest one.
+
+    Returns:
+    - julian_date (int): Julian date of the poll medians.
+    - outputs (list): EV_estimates row.
+    """
+    district_polldata = get_day_district_polls(medians['EV.districts'], analysis_date)
+    estimate = estimate_ev(medians['EV'], district_polldata, analysis_date, days_until_election, mm_table=False,
+                           prior_mm=PRIOR_MM)
+    return int(estimate['julian_date']), estimate['outputs']
+
+def EV_regenerate(start_date=EV_START_DATE, today=None, jobs=None, output_dir=OUTPUT_DIR):
+    """
+    NOTE: Port of EV_regenerate.m (without the old histogram plots).
+
+    Rebuilds the EV estimate history: estimates every day from start_date
+    to today that has poll medians, across a pool of worker processes
+    (see regenerate_util.map_analysis_dates), and appends them to the 
+    history in date order. Each day uses the district medians of that
+    day from EV_POLLS_DISTRICTS_TXT, not the newest ones of
+    EV_POLLS_DISTRICT_TXT as EV_regenerate.m does.
+
+    The Bayesian win probability of each day depends on the history
+    before it (its prior is the mean meta-margin, see mean_MM), so it is
+    calculated afterwards, in date order, as if each day had been appended
+    before the next one was estimated.
+
+    Args:
+    - start_date (int, optional): First Julian date. Default is 
+        EV_START_DATE.
+    - today (datetime, optional): Default is None (today).
+    - jobs (int, optional): Number of worker processes. Default is None
+        (all CPUs).
+    - output_dir (str, optional): Output directory.
+
+    Returns:
+    - rows (list of lists): Lines appended to the history.
+    """
+    today = today or datetime.today()
+    days_until_election = get_days_until_election(today)
+
+    polldata = {'EV': read_poll_medians(EV_POLLS_TXT), 'EV.districts': read_poll_medians(EV_POLLS_DISTRICTS_TXT)}
+    dates = regenerate_util.get_analysis_dates(polldata['EV'], start_date, (today - JULIAN_EPOCH).days)
+    results = regenerate_util.map_analysis_dates(partial(estimate_history_row, days_until_election=days_until_election),
+                                                 polldata, dates, jobs)
+
+    history_path = os.path.join(output_dir, EV_ESTIMATE_HISTORY_CSV)
+    metamargins = read_history_metamargins(history_path)
+
+    rows = []
+    for julian_date, outputs in results:
+        metamargin = outputs[12]
+        M_range, pred = get_prediction_density(metamargin, days_until_election, get_mean_metamargin(metamargins))
+        outputs[15] = pred[M_range >= 0].sum() / pred.sum()
+
+        metamargins.setdefault(julian_date, metamargin)
+        rows.append([julian_date] + outputs)
+
+    write_rows(history_path, rows, append=True)
+    return rows
+
+# ======================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='EV estimates from the poll medians (the EV part of federal_runner.m).')
+    parser.add_argument('--date', type=int, default=0, help='Julian date to analyze (default: the newest day)')
+    parser.add_argument('--no-history', action='store_true', help='do not append the estimates to the history')
+    parser.add_argument('--no-jerseyvotes', action='store_true', help='skip the voter power calculation')
+    parser.add_argument('--no-mm-table', action='store_true', help='skip the meta-margin table (EV_MM_table)')
+    parser.add_argument('--regenerate', action='store_true',
+                        help=f'append the estimates of every day since Julian date {EV_START_DATE} to the history instead '
+                             '(see EV_regenerate.m), across --jobs worker processes')
+    parser.add_argument('--jobs', type=int, default=None, help='number of worker processes with --regenerate (default: all CPUs)')
+    args = parser.parse_args()
+
+    if args.regenerate:
+        rows = EV_regenerate(jobs=args.jobs)
+        print(f"Appended {len(rows)} days to {EV_ESTIMATE_HISTORY_CSV}")
+        return
+
+    estimate = run_ev(analysis_date=args.date, for_history=not args.no_history, jerseyvotes=not args.no_jerseyvotes,
+                      mm_table=not args.no_mm_table)
+    print(','.join(format_value(value) for value in estimate['outputs']))
+
+if __name__ == '__main__':
+    main()
@@ -1,253 +1,247 @@
+import os
+import argparse
+from datetime import datetime
+
 import numpy as np
-import pandas as pd
 from scipy.stats import t
-from datetime import datetime
 
-# Initialize global variables
-data_file = '../scraping/outputs/2024.Senate.polls.median.csv'
-output_path = 'outputs/'
-# TODO: Check with the spreadsheet
-polling_states = ['AZ', 'FL', 'MD', 'MI', 'MT', 'NV', 'OH', 'PA', 'TX', 'WI', 'WV'] # 11 races
-num_polling_states = len(polling_states)
-# contested_races = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
-contested_races = list(range(1, num_polling_states // 3 + 1)) # races in serious question
+import regenerate_util
+from distribution_util import get_distributions, solve_shift
+from EV_util import YEAR, POLLS_DIR, OUTPUT_DIR, JULIAN_EPOCH, matlab_round, format_value, write_rows, read_poll_medians
+
+# ======================================================================
+# GLOBAL VARIABLES (see federal_constants_2024.m)
+
+SENATE_POLLS_TXT = os.path.join(POLLS_DIR, f'{YEAR}.Senate.polls.median.txt')
+SENATE_ESTIMATES_CSV = f'Senate_estimates_{YEAR}.csv'
+SENATE_ESTIMATE_HISTORY_CSV = f'Senate_estimate_history_{YEAR}.csv'
 
+SENATE_START_DATE = 46      # February 15, first day of Senate_regenerate
 
-# == SENATE ============================================================
+SENATE_STATES = ['AZ', 'FL', 'MD', 'MI', 'MT', 'NE', 'NV', 'OH', 'PA', 'TX', 'WI', 'WV']
+NUM_STATES = len(SENATE_STATES)
+CONTESTED_STATES = np.arange(NUM_STATES)    # races in serious question
+DEM_ASSIGNED = 42           # seats not up for election or safe
+REP_ASSIGNED = 46
+CONTROL_SEATS = 50          # with a Democratic VP
 
-def Senate_median(polls, bias_pct, num_states, dem_safe):
+MIN_SEM = 3                 # floor on the uncertainty (percentage points)
+T_DF = 3                    # degrees of freedom of the t distribution
+
+# Scan of the meta-margin (see Senate_estimator.m, which steps by 0.02 from -7)
+SCAN_RANGE = np.arange(-7, 21, dtype=float)
+MM_RESOLUTION = 0.02
+
+# ======================================================================
+# SENATE DISTRIBUTION
+
+def get_day_polls(polldata, analysis_date=0):
     """
+    NOTE: Helper function for Senate_estimator.
+
+    Gets the lines of one day (one per race).
+
     Args:
-        polls, biaspct, num_states, and Demsafe
-        
-    Returns: 
-        various calculated values that correspond to their MATLAB counterparts
-        Note that the tcdf function needs to be replaced with the appropriate Python function
-
-    scipy.stats.t.cdf
-    computes the cumulative distribution function (CDF) of the t-distribution
-    
-    x = np.array([-1, 0, 3, 4])  # Values at which to evaluate the CDF
-    df = 10  # Degrees of freedom
-    p = t.cdf(x, df)  # Compute the CDF
-
-    print(p)
-    # Output: [0.19146012 0.5        0.99330715 0.99864852]
-
-    """
-
-    # Working with pandas.DataFrame
-    
-    num_polls = polls['num_polls'] 
-    # julian_date = polls[:, 1]
-    # date_most_recent_poll = polls[:, 2]
-    # median_margin = polls[:, 3]
-    # est_std_dev = polls[:, 4]
-    # state_num = polls[:, 5]
-
-    # Calculate z-score and convert to probability, assuming normal distribution.
-    polls['z'] = (polls['median_margin'] + bias_pct) / polls['est_std_dev']
-    
-
-    polls['prob_Dem_win'] = t.cdf(polls['z'], df=2)
-    polls['prob_GOP_win'] = 1 - polls['prob_Dem_win']
-
-    # using ESD, not SEM
-    # polls_znov = (polls['median_margin'] + bias_pct) / np.sqrt(polls['SEM'] * polls['SEM'] + 5 * 5)
-    # SEM = ESD / sqrt (N) where N = num of polls
-    polls_znov = (polls['median_margin'] + bias_pct) / np.sqrt(polls['est_std_dev'] * polls['est_std_dev'] + 5 * 5)
-    polls['prob_Dem_November'] = t.cdf(polls_znov, 2)
-
-    state_probs = np.round(polls['prob_Dem_win'] * 100)
-    state_nov_probs = np.round(polls['prob_Dem_November'] * 100)
-
-    # print(state_nov_probs)
-
-    # The meta-magic: store the Electoral Votes (EV) distribution,
-    # the exact probability distribution of all possible outcomes
-    # Initialize a list to store the EV distribution
-    EV_distribution = [1 - polls['prob_Dem_win'].iloc[0], polls['prob_Dem_win'].iloc[0]]
-    for i in range(1, num_states):
-        nextEV = [1 - polls['prob_Dem_win'].iloc[i], polls['prob_Dem_win'].iloc[i]]
-        EV_distribution = np.convolve(EV_distribution, nextEV)
-    
-    print("Printing")
-    print(EV_distribution)
-    print("Done")
-
-    # Cumulative histogram of all possibilities
-    histogram = EV_distribution[1:num_states + 1]
+    - polldata (numpy.ndarray): Poll medians from read_poll_medians.
+    - analysis_date (int, optional): Julian date. Default is 0 (the
+        newest day).
+
+    Returns:
+    - polldata (numpy.ndarray): Lines of the day, by state number.
+    """
+    if len(polldata) % NUM_STATES:
+        print(f"Warning: {SENATE_POLLS_TXT} is not a multiple of {NUM_STATES} lines long")
+
+    idx = 0
+    if analysis_date > 0:
+        matches = np.flatnonzero(polldata[:, 1] == analysis_date)
+        if len(matches) == 0:
+            raise ValueError(f"No poll medians for Julian date {analysis_date}")
+        idx = matches[0]
+
+    return polldata[idx:idx + NUM_STATES]
+
+def get_win_probs(margin, SEM, bias_pct=0):
+    """
+    Converts margins to Dem win probabilities, assuming a (long-tailed) t
+    distribution.
+    """
+    return t.cdf((margin + bias_pct) / SEM, T_DF)
+
+def get_median_seats(distributions):
+    """
+    NOTE: Helper function for Senate_median and get_meta_margin.
+
+    Returns the Dem median seats of seat distributions (last axis: 0 to
+    NUM_STATES races won). Like Senate_median.m, the cumulative histogram
+    starts at 1 race won; if no race is won with probability 0.5 or more,
+    the median is the safe seats.
+    """
+    cumulative_prob = np.cumsum(distributions[..., 1:], axis=-1)
+    median_seats = DEM_ASSIGNED + 1 + np.argmax(cumulative_prob >= 0.5, axis=-1)
+    return np.where(distributions[..., 0] >= 0.5, DEM_ASSIGNED, median_seats)
+
+def Senate_median(margin, SEM, bias_pct=0):
+    """
+    NOTE: Port of Senate_median.m.
+
+    Calculates the exact probability distribution of all possible outcomes
+    of the races.
+
+    Args:
+    - margin (numpy.ndarray): D-R margin of each race.
+    - SEM (numpy.ndarray): Uncertainty of each race.
+    - bias_pct (float, optional): Shift added to all margins. Default is 0.
+
+    Returns:
+    - result (dict): 'state_probs' (percent) of each race; 'histogram'
+        and 'cumulative_prob' of 1 to NUM_STATES races won; 'D_control_prob',
+        'median_seats' and 'mean_seats' (Dem).
+    """
+    prob_Dem_win = get_win_probs(margin, SEM, bias_pct)
+    distribution = get_distributions(prob_Dem_win, np.ones(NUM_STATES))
+
+    # Truncated by 1, which implicitly assumes at least one race goes to
+    # Democrats (see Senate_median.m)
+    histogram = distribution[1:]
     cumulative_prob = np.cumsum(histogram)
+    senate_seats = np.arange(DEM_ASSIGNED + 1, DEM_ASSIGNED + NUM_STATES + 1)
+
+    return dict(state_probs=matlab_round(prob_Dem_win * 100),
+                histogram=histogram,
+                cumulative_prob=cumulative_prob,
+                D_control_prob=1 - cumulative_prob[max(CONTROL_SEATS - DEM_ASSIGNED, 0) - 1],
+                median_seats=int(get_median_seats(distribution)),
+                mean_seats=matlab_round((histogram * senate_seats).sum() * 100) / 100)
+
+def get_meta_margin(margin, SEM):
+    """
+    NOTE: Helper function for Senate_estimator.
+
+    Finds the meta-margin: minus the smallest shift of all margins, on the
+    0.02-point steps of Senate_estimator.m, that gives Democrats a median
+    of CONTROL_SEATS (see distribution_util.solve_shift).
+
+    Returns:
+    - float: Meta-margin, or -999 if no shift of the scan gives control.
+    """
+    def evaluate(bias_pcts):
+        probs = get_win_probs(margin, SEM, np.asarray(bias_pcts)[:, None])
+        return get_median_seats(get_distributions(probs, np.ones(NUM_STATES)))
+
+    shift = solve_shift(evaluate, CONTROL_SEATS, SCAN_RANGE, resolution=MM_RESOLUTION)
+    return -999 if shift is None else -shift
+
+# ======================================================================
+# SENATE ESTIMATOR
+
+def Senate_estimator(polldata, analysis_date=0):
+    """
+    NOTE: Port of Senate_estimator.m (the estimates only: no histogram
+    plot, state probabilities or November prediction).
+
+    Calculates the Senate estimates of one day.
+
+    Args:
+    - polldata (numpy.ndarray): Poll medians from read_poll_medians.
+    - analysis_date (int, optional): Julian date. Default is 0 (the
+        newest day).
+
+    Returns:
+    - estimate (dict): 'julian_date', 'outputs' (the Senate_estimates
+        row), 'margin', 'SEM', 'state_probs', 'histogram' and 'metamargin'.
+    """
+    polldata = get_day_polls(polldata, analysis_date)
+    margin = polldata[:, 3]
+    SEM = np.maximum(polldata[:, 4], MIN_SEM)
+    total_polls_used = polldata[:, 0].sum()
+
+    result = Senate_median(margin, SEM)
+    state_probs, cumulative_prob = result['state_probs'], result['cumulative_prob']
+    senate_seats = np.arange(DEM_ASSIGNED + 1, DEM_ASSIGNED + NUM_STATES + 1)
+
+    # 1-sigma lower and upper limits
+    confidence_intervals = [senate_seats[np.flatnonzero(cumulative_prob <= 0.15865)[-1]],
+                            senate_seats[np.flatnonzero(cumulative_prob >= 0.84135)[0]]]
+
+    # Safe seats for each party, and uncertain
+    assigned_dem = DEM_ASSIGNED + int((state_probs >= 95).sum())
+    assigned_rep = REP_ASSIGNED + int((state_probs <= 5).sum())
+    assigned = [assigned_dem, assigned_rep, 100 - assigned_dem - assigned_rep]
+
+    metamargin = get_meta_margin(margin, SEM)
+
+    outputs = ([result['median_seats'], result['mean_seats'], result['D_control_prob']] + assigned
+               + [total_polls_used] + confidence_intervals + [polldata[CONTESTED_STATES, 3].mean(), metamargin])
+
+    return dict(julian_date=polldata[0, 1],
+                outputs=outputs,
+                margin=margin,
+                SEM=SEM,
+                state_probs=state_probs,
+                histogram=result['histogram'],
+                metamargin=metamargin)
+
+# ======================================================================
+# HISTORY REGENERATION
+
+def estimate_history_row(medians, analysis_date):
+    """
+    NOTE: Helper function for Senate_regenerate (runs in a worker).
+
+    Returns the Julian date and the Senate_estimates row of one day.
+    """
+    estimate = Senate_estimator(medians['Senate'], analysis_date)
+    return int(estimate['julian_date']), estimate['outputs']
+
+def Senate_regenerate(start_date=SENATE_START_DATE, today=None, jobs=None, output_dir=OUTPUT_DIR):
+    """
+    NOTE: Port of Senate_regenerate.m (without the old histogram plots).
+
+    Rebuilds the Senate estimate history: estimates every day from
+    start_date to today that has poll medians, across a pool of worker
+    processes (see regenerate_util.map_analysis_dates), and appends them
+    to the history in date order.
+
+    Args:
+    - start_date (int, optional): First Julian date. Default is
+        SENATE_START_DATE.
+    - today (datetime, optional): Default is None (today).
+    - jobs (int, optional): Number of worker processes. Default is None
+        (all CPUs).
+    - output_dir (str, optional): Output directory.
+
+    Returns:
+    - rows (list of lists): Lines appended to the history.
+    """
+    end_date = ((today or datetime.today()) - JULIAN_EPOCH).days
+
+    polldata = {'Senate': read_poll_medians(SENATE_POLLS_TXT)}
+    dates = regenerate_util.get_analysis_dates(polldata['Senate'], start_date, end_date)
+    results = regenerate_util.map_analysis_dates(estimate_history_row, polldata, dates, jobs)
+
+    rows = [[julian_date] + outputs for julian_date, outputs in results]
+    write_rows(os.path.join(output_dir, SENATE_ESTIMATE_HISTORY_CSV), rows, append=True)
+    return rows
+
+# ======================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Senate estimates from the poll medians (see Senate_estimator.m).')
+    parser.add_argument('--date', type=int, default=0, help='Julian date to analyze (default: the newest day)')
+    parser.add_argument('--regenerate', action='store_true',
+                        help=f'append the estimates of every day since Julian date {SENATE_START_DATE} to the history '
+                             '(see Senate_regenerate.m), across --jobs worker processes')
+    parser.add_argument('--jobs', type=int, default=None, help='number of worker processes with --regenerate (default: all CPUs)')
+    args = parser.parse_args()
+
+    if args.regenerate:
+        rows = Senate_regenerate(jobs=args.jobs)
+        print(f"Appended {len(rows)} days to {SENATE_ESTIMATE_HISTORY_CSV}")
+        return
+
+    estimate = Senate_estimator(read_poll_medians(SENATE_POLLS_TXT), args.date)
+    print(','.join(format_value(value) for value in estimate['outputs']))
 
-    print(histogram)
-
-    # Range of Senate seats Democratics are projected to win
-    senate_seats = range(dem_safe + 1, dem_safe + num_states + 1)
-    print(senate_seats)
-    R_Senate_control_probability = cumulative_prob[max(50 - dem_safe, 0)]
-    D_Senate_control_probability = 1 - R_Senate_control_probability
-
-    # Calculate Senate seat that represents the median of distribution of outcomes
-    median_index = next(i for i, prob in enumerate(cumulative_prob) if prob >= 0.5)
-    median_seats = senate_seats[median_index]
-
-    # Calculate the mean number of expected Senate seats 
-    weighted_seats = [histogram[i] * senate_seats[i] for i in range(len(histogram))]
-    mean_seats = round(sum(weighted_seats), 2)
-
-    print(mean_seats)
-
-    return state_probs, state_nov_probs, histogram, cumulative_prob, R_Senate_control_probability, D_Senate_control_probability, median_seats, mean_seats
-
-# == SENATE ============================================================
-
-def Senate_estimator(polls, bias_pct=0, for_history=0, analysis_date=0):
-    # Distribution of Senate seats
-    # Democratic, Republican, up for election
-    assigned_EV = [0, 0, 0]
-    # 0, 1, these are the seats not up for election or safe
-    assigned_EV[0] = 42 # Democratic
-    dem_safe = assigned_EV[0] # Initially considered safe for Dems
-    assigned_EV[1] = 47 # Republican
-
-    # Check if total number of assigned seats equals 0
-    if np.sum(assigned_EV) != 100:
-        print('Warning: Senate seats do not sum to 100!')
-        print(assigned_EV)
-
-    # Initialize other variables
-    print(analysis_date)
-    meta_calc = 1
-
-    num_lines = sen_polls.shape[0]
-    if num_lines % num_polling_states != 0:
-        # TODO: Change this warning to include the file name
-        print('Warning: polls.median.2022.Senate.txt is not a multiple of num_states lines long')
-    
-    # TODO: Test
-    print(polls)
-    print(num_lines) 
-    print(num_polling_states)
-    # Initialize an empty DataFrame with the same column names as polls
-    # TODO: Replace all polldata with parsed_polls
-    parsed_polls = pd.DataFrame(columns=polls.columns)
-    if num_lines > num_polling_states: 
-        if analysis_date > 0: 
-            print(analysis_date)
-            # Index of the first (most recent, assuming reverse time order) entry matching the analysis date
-            i = np.where(polls['julian_date'] == analysis_date)[0]
-            print(i)
-            if i.size > 0:
-                idx = i[0]
-                print(idx)
-                parsed_polls = polls.reset_index(drop=True).iloc[idx:idx+num_polling_states, :]
-        else: 
-            # polldata = polls[:num_polling_states, :]
-            # Use default integer index
-            parsed_polls = polls.reset_index(drop=True).iloc[:num_polling_states, :]
-
-    print(parsed_polls)
-
-    # Initialize polls data
-    # TODO: calculate SEM 
-    polls_SEM = np.maximum(parsed_polls['est_std_dev'], np.zeros(num_polling_states) + 3)  # Minimum uncertainty of 2%
-    parsed_polls['est_std_dev'] = np.maximum(parsed_polls['est_std_dev'], 3)
-
-    # Add electoral votes (EV) to all the states
-    parsed_polls['EV'] = np.ones(num_polling_states)
-    assigned_EV[2] = parsed_polls['EV'].sum()
-
-    total_polls_used = np.sum(parsed_polls['num_polls'])
-    print(total_polls_used)
-
-    # Magic calculations
-    # TODO: Rename these variables
-    state_probs, state_nov_probs, histogram, cumulative_prob, R_control_probs, D_control_probs, median_seats, mean_seats = Senate_median(sen_polls, bias_pct, num_polling_states, dem_safe)
-
-    # OUTPUTS----------------------
-    # confidenceintervals(3)=Senateseats(find(cumulative_prob<=0.025,1,'last')); % 95-pct lower limit
-    # confidenceintervals(1)=Senateseats(find(cumulative_prob<=0.15865,1,'last')); % 1-sigma lower limit
-    # confidenceintervals(2)=Senateseats(find(cumulative_prob>=0.84135,1,'first')); % 1-sigma upper limit% confidenceintervals(4)=Senateseats(find(cumulative_prob>=0.975,1,'first')); % 95-pct upper limit
-
-    # Print the assigned_EV for each range of state_probs
-    print("State probs:", state_probs)
-    print("Assigned EV:", assigned_EV)
-
-    # Iterate over each range of state_probs
-    # Recalculate safe EV for each party
-
-    # Check i < len(parsed_polls) condition
-    assigned_EV[0] += sum(parsed_polls['EV'].iloc[i] for i, prob in enumerate(state_probs) if prob >= 95 and i < len(parsed_polls))
-    assigned_EV[1] += sum(parsed_polls['EV'].iloc[i] for i, prob in enumerate(state_probs) if prob <= 5 and i < len(parsed_polls))
-
-    
-    # assigned_EV[0] += np.sum(parsed_polls['EV'][np.where(state_probs >= 95)])
-    # assigned_EV[1] += np.sum(parsed_polls['EV'][np.where(state_probs <= 5)])
-    assigned_EV[2] = 100 - assigned_EV[0] - assigned_EV[1]
-
-    print(assigned_EV)
-
-    # uncertain = np.intersect1d(np.where(stateprobs < 95), np.where(stateprobs > 5))
-    # uncertain_states = ', '.join([polling_states[i] for i in uncertain])
-
-    # ------ Daily file update -----------------------------------
-    # outputs = [median_seats, mean_seats, D_Senate_control_probability] + list(assigned_EV) + [total_polls_used] + \
-    #         list(confidence_intervals) + [np.mean(polldata[contested, 2])]
-    # if bias_pct == 0:
-    #     np.savetxt(output_path + 'Senate_histogram_2022.csv', histogram)
-    #     # Export state-by-state percentage probabilities as CSV
-    #     # Update Senate_estimate_history_2022.csv
-
-    # # Meta-margin calculation
-    # reality = 1 - D_Senate_control_probability
-    # if meta_calc == 0:
-    #     metamargin = -999
-    # else:
-    #     foo = bias_pct
-    #     bias_pct = -7
-    #     Senate_median()
-    #     while median_seats < 50:
-    #         bias_pct += 0.02
-    #         Senate_median()
-    #     metamargin = -bias_pct
-    #     bias_pct = foo
-
-    # # Daily and History Update
-    # # Write file update to Senate_estimates
-    # outputs.append(metamargin)
-    # np.savetxt(output_path + 'Senate_estimates_2022.csv', outputs, delimiter=',')  # Just today's estimate
-    # if for_history:
-    #     np.savetxt(output_path + 'Senate_estimate_history_2022.csv', np.hstack([polldata[0, 4], outputs]),
-    #            delimiter=',', newline='\n', fmt='%s')  # Append to history file
-
-# == SENATE ============================================================
-
-def Senate_regenerate(polls):
-    """
-    iterates over dates starting from March 1st, 2024, up to the current date
-    """
-    start_date = datetime(2023, 12, 31)
-    today_date = datetime.today()
-    days_difference = (today_date - start_date).days
-
-    # Regenerate data from April 21 (julian date 112) to the current date
-    for analysis_date in range(111, days_difference + 1): 
-        # Perform analysis for Senate estimation 
-        Senate_estimator(polls, for_history=1, analysis_date=analysis_date) 
-        
-        # Copies histogram file to a destination folder
-        # senate_hist_filename = f'oldhistograms/Senate_histogram_{analysis_date}.jpg'
-        # shutil.copyfile('Senate_histogram_today.jpg', senate_hist_filename)
-
-        # MATLAB
-        # Senatehistfilename=['oldhistograms\Senate_histogram_' num2str(analysisdate,'%i') '.jpg']
-        # copyfile('Senate_histogram_today.jpg',Senatehistfilename);
-
-# == SENATE ============================================================
-
-sen_polls = pd.read_csv(data_file)
-# print(sen_polls)
-
-# Senate_regenerate(sen_polls) is called in Senate_estimator
-# Senate_median(sen_polls, 0, num_polling_states, 45)
-Senate_estimator(sen_polls)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
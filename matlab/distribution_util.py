@@ -0,0 +1,232 @@
+import numpy as np
+from scipy.fft import rfft, irfft, next_fast_len
+
+# ======================================================================
+# GLOBAL VARIABLES
+
+# Pairs of polynomials up to this length are convolved directly, longer
+# ones with FFTs
+DIRECT_MAX_LENGTH = 32
+
+# Resolution of solve_shift (points), as the meta-margin is displayed
+SHIFT_RESOLUTION = 0.01
+
+# ======================================================================
+# OUTCOME DISTRIBUTIONS
+
+def convolve_pairs(a, b, length):
+    """
+    NOTE: Helper function for get_distributions.
+
+    Convolves polynomials pairwise: a[..., i, :] with b[..., i, :].
+
+    Args:
+    - a (numpy.ndarray): Coefficients, in ascending order of the power.
+    - b (numpy.ndarray): Coefficients, same shape as a.
+    - length (int): Number of coefficients to keep (the longest product).
+
+    Returns:
+    - numpy.ndarray: Products, with length coefficients.
+    """
+    size = a.shape[-1] + b.shape[-1] - 1
+
+    if b.shape[-1] <= DIRECT_MAX_LENGTH:
+        products = np.zeros(a.shape[:-1] + (size,))
+        for power in range(b.shape[-1]):
+            products[..., power:power + a.shape[-1]] += a * b[..., power:power + 1]
+        return products[..., :length]
+
+    fft_size = next_fast_len(size, real=True)
+    products = irfft(rfft(a, fft_size) * rfft(b, fft_size), fft_size)[..., :length]
+    # Round-off can leave tiny negative probabilities
+    return np.maximum(products, 0)
+
+def get_distributions(probs, weights):
+    """
+    Calculates the exact probability distribution of the total weight won,
+    for a batch of win probabilities at once. Each unit (state, seat) is a
+    polynomial (1 - p) + p x^weight; the distribution is their product,
+    which is multiplied out in a balanced tree: short products directly,
+    long ones with FFTs.
+
+    Args:
+    - probs (numpy.ndarray): Win probability of each unit (last axis),
+        for any number of scenarios (leading axes).
+    - weights (numpy.ndarray): Weight (e.g. electoral votes) of each unit.
+
+    Returns:
+    - distributions (numpy.ndarray): Probability of each total weight, 0
+        to weights.sum() (last axis), for each scenario.
+    """
+    probs = np.asarray(probs, dtype=float)
+    weights = np.asarray(weights, dtype=np.int64)
+    batch_shape, num_units = probs.shape[:-1], probs.shape[-1]
+    probs = probs.reshape(-1, num_units)
+
+    if num_units % 2:
+        # Pad with a unit that is never won
+        probs = np.concatenate([probs, np.zeros((len(probs), 1))], axis=1)
+        weights = np.append(weights, 0)
+
+    # Multiply out pairs of units: at most 4 terms each
+    p, q = probs[:, 0::2], probs[:, 1::2]
+    a, b = weights[0::2], weights[1::2]
+    lengths = a + b + 1
+    nodes = np.arange(len(lengths))
+    polys = np.zeros((len(probs), len(lengths), lengths.max()))
+    polys[:, :, 0] = (1 - p) * (1 - q)
+    polys[:, nodes, a] += p * (1 - q)
+    polys[:, nodes, b] += (1 - p) * q
+    polys[:, nodes, a + b] += p * q
+
+    while polys.shape[1] > 1:
+        if polys.shape[1] % 2:
+            # Pad with the polynomial 1
+            identity = np.zeros((len(probs), 1, polys.shape[2]))
+            identity[:, :, 0] = 1
+            polys = np.concatenate([polys, identity], axis=1)
+            lengths = np.append(lengths, 1)
+
+        lengths = lengths[0::2] + lengths[1::2] - 1
+        polys = convolve_pairs(polys[:, 0::2], polys[:, 1::2], lengths.max())
+
+    return polys[:, 0, :lengths[0]].reshape(batch_shape + (lengths[0],))
+
+def get_prefix_products(probs, weights):
+    """
+    NOTE: Helper function for get_pivot_probs.
+
+    Multiplies the unit polynomials (1 - p) + p x^weight one at a time,
+    keeping every partial product.
+
+    Args:
+    - probs (numpy.ndarray): Win probability of each unit (last axis),
+        one row per scenario.
+    - weights (numpy.ndarray): Weight of each unit.
+
+    Returns:
+    - products (numpy.ndarray): Partial products (num_units, scenario,
+        weights.sum() + 1): products[i] is the product of units 0 to i - 1.
+    """
+    num_units = probs.shape[-1]
+    products = np.zeros((num_units, len(probs), weights.sum() + 1))
+    products[0, :, 0] = 1
+
+    size = 1
+    for unit in range(num_units - 1):
+        p, weight = probs[:, unit:unit + 1], weights[unit]
+        # Only the first size coefficients can be nonzero so far
+        products[unit + 1, :, :size] = products[unit, :, :size] * (1 - p)
+        products[unit + 1, :, weight:weight + size] += products[unit, :, :size] * p
+        size += weight
+    return products
+
+def get_pivot_probs(probs, weights, lo, hi):
+    """
+    Calculates, for each unit, the probability that the total weight won
+    falls in [lo, hi] when the unit is lost and when it is won, without
+    multiplying out the distribution once per unit. The distribution of
+    all other units is the product of the units before it and the units
+    after it (prefix and suffix products), and the probability of a window
+    of it is the prefix summed against the cumulative suffix.
+
+    The probability for the whole race is linear in the unit's own win
+    probability p: (1 - p) * lost + p * won. The difference lost - won is
+    the probability that the unit is pivotal.
+
+    Args:
+    - probs (numpy.ndarray): Win probability of each unit (last axis),
+        one row per scenario.
+    - weights (numpy.ndarray): Weight (e.g. electoral votes) of each unit.
+    - lo (int): Smallest total weight of the window.
+    - hi (int): Largest total weight of the window.
+
+    Returns:
+    - lost (numpy.ndarray): Probability of the window if the unit is lost
+        (scenario, unit).
+    - won (numpy.ndarray): Probability of the window if the unit is won.
+    """
+    probs = np.atleast_2d(np.asarray(probs, dtype=float))
+    weights = np.asarray(weights, dtype=np.int64)
+    num_units, length = probs.shape[-1], weights.sum() + 1
+
+    prefix = get_prefix_products(probs, weights)
+
+    # Cumulative suffix products, padded: cumulative[i, :, pad + k] is the
+    # probability that units i + 1 to the last win at most k - 1 (0 for
+    # k <= 0, 1 above the support). Cumulating is linear, so they follow
+    # the same recursion as the products themselves.
+    pad = max(length - 1 + weights.max() - lo, weights.max())
+    cumulative = np.empty((num_units, len(probs), pad + max(hi, length) + 2))
+    cumulative[:, :, :pad + 1] = 0
+    cumulative[:, :, pad + 1:] = 1
+
+    size = 1
+    for unit in range(num_units - 1, 0, -1):
+        p, weight = probs[:, unit:unit + 1], weights[unit]
+        changed = slice(pad + 1, pad + size + weight)
+        shifted = slice(pad + 1 - weight, pad + size)
+        cumulative[unit - 1, :, changed] = cumulative[unit, :, changed] * (1 - p) + cumulative[unit, :, shifted] * p
+        size += weight
+
+    # The prefix, reversed, against a slice of the cumulative suffix:
+    # P(suffix in [bottom - k, top - k]) for each prefix power k
+    reversed_prefix = prefix[:, :, ::-1]
+    start = pad - length + 1
+
+    def window_prob(unit, bottom, top):
+        upper = cumulative[unit, :, start + top + 1:start + top + 1 + length]
+        lower = cumulative[unit, :, start + bottom:start + bottom + length]
+        return np.einsum('sk,sk->s', reversed_prefix[unit], upper - lower)
+
+    lost = np.empty(probs.shape)
+    won = np.empty(probs.shape)
+    for unit in range(num_units):
+        lost[:, unit] = window_prob(unit, lo, hi)
+        won[:, unit] = window_prob(unit, lo - weights[unit], hi - weights[unit])
+    return lost, won
+
+# ======================================================================
+# META-MARGIN SOLVER
+
+def solve_shift(evaluate, target, shifts, values=None, resolution=SHIFT_RESOLUTION):
+    """
+    Finds the smallest shift of all margins, to a multiple of resolution,
+    for which an outcome (e.g. the median EV) reaches target. The outcome
+    must never decrease as the shift grows, as every state's win 
+    probability grows with it. The shift is bracketed by a scan of shifts
+    (evaluated in one batch, unless given), then bisected.
+
+    Args:
+    - evaluate (callable): Outcomes of an array of shifts, in one batch.
+    - target (float): Outcome to reach.
+    - shifts (numpy.ndarray): Shifts of the scan, in ascending order.
+    - values (numpy.ndarray, optional): Outcomes of shifts, if known.
+    - resolution (float, optional): Resolution of the result. Default is
+        SHIFT_RESOLUTION.
+
+    Returns:
+    - float: Smallest shift, or None if no shift of the scan reaches 
+        target. If the smallest shift of the scan does, it is returned.
+    """
+    if values is None:
+        values = evaluate(shifts)
+
+    reached = np.asarray(values) >= target
+    if not reached.any():
+        return None
+    hi = int(np.argmax(reached))
+    if hi == 0:
+        return shifts[0]
+
+    # Bisect in steps of resolution: lo does not reach target, hi does
+    scale = round(1 / resolution)
+    lo, hi = int(np.floor(shifts[hi - 1] * scale + 0.5)), int(np.floor(shifts[hi] * scale + 0.5))
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if evaluate(np.array([mid / scale]))[0] >= target:
+            hi = mid
+        else:
+            lo = mid
+
+    return hi / scale
@@ -9,16 +9,11 @@
 % so they can be run in the same MATLAB environment.
 % It references a constants file for the appropriate election year.
 
-clear
-close
-federal_constants_2024
-
-forhistory=1; 
-EV_estimator
-EV_jerseyvotes
-EV_prediction
+% The EV scripts (EV_estimator, EV_jerseyvotes, EV_prediction) are run
+% by EV_util.py instead, before this script (see run2024.sh).
 
 clear
+close
 federal_constants_2024
 
 forhistory=1;
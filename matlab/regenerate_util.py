@@ -0,0 +1,93 @@
+import os
+import tempfile
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# ======================================================================
+# GLOBAL VARIABLES
+
+DATES_PER_TASK = 8          # analysis dates per worker task (shard)
+
+# Poll medians of each worker process, memory-mapped (see open_medians)
+medians = {}
+
+# ======================================================================
+# HISTORY REGENERATION
+
+def share_medians(polldata, directory):
+    """
+    NOTE: Helper function for map_analysis_dates.
+
+    Saves poll medians as uncompressed '.npy' files, so that every worker
+    can memory-map the same copy instead of parsing the TXT files.
+
+    Args:
+    - polldata (dict): Poll medians (numpy.ndarray) by name, e.g. 'EV'.
+    - directory (str): Directory for the files.
+
+    Returns:
+    - paths (dict): Path of each file by name.
+    """
+    paths = {}
+    for name, data in polldata.items():
+        paths[name] = os.path.join(directory, f'{name}.npy')
+        np.save(paths[name], data)
+    return paths
+
+def open_medians(paths):
+    """
+    NOTE: Helper function for map_analysis_dates (worker initializer).
+
+    Memory-maps the shared poll medians (read-only) in a worker.
+    """
+    medians.clear()
+    medians.update({name: np.load(path, mmap_mode='r') for name, path in paths.items()})
+
+def estimate_shard(estimate, dates):
+    """
+    NOTE: Helper function for map_analysis_dates.
+
+    Runs estimate on the worker's poll medians for each date of a shard.
+    """
+    return [estimate(medians, analysis_date) for analysis_date in dates]
+
+def get_analysis_dates(polldata, start_date, end_date):
+    """
+    Returns the Julian dates from start_date to end_date (inclusive) that
+    have poll medians, in ascending order.
+    """
+    dates = np.unique(polldata[:, 1]).astype(int)
+    return [int(date) for date in dates if start_date <= date <= end_date]
+
+def map_analysis_dates(estimate, polldata, dates, jobs=None):
+    """
+    Runs an estimator for many analysis dates, e.g. to regenerate an
+    estimate history. Each date only depends on the poll medians, so the
+    dates are split into contiguous shards of DATES_PER_TASK and spread
+    across a pool of worker processes, which share one memory-mapped copy
+    of the medians. Results come back in date order, whatever the number
+    of workers.
+
+    Args:
+    - estimate (callable): Module-level function of the medians (dict
+        by name, as polldata) and a Julian date.
+    - polldata (dict): Poll medians (numpy.ndarray) by name, e.g. 'EV'.
+    - dates (list of int): Julian dates, in the order of the results.
+    - jobs (int, optional): Number of worker processes. Default is None
+        (all CPUs); with 1, the dates run in this process.
+
+    Returns:
+    - list: Result of estimate for each date.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        return [estimate(polldata, analysis_date) for analysis_date in dates]
+
+    shards = [dates[idx:idx + DATES_PER_TASK] for idx in range(0, len(dates), DATES_PER_TASK)]
+    with tempfile.TemporaryDirectory() as directory:
+        paths = share_medians(polldata, directory)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=open_medians, initargs=(paths,)) as executor:
+            results = executor.map(estimate_shard, repeat(estimate), shards)
+            return [result for shard in results for result in shard]
@@ -1,5 +1,6 @@
 
 import os
+import sys
 
 import numpy as np
 import pandas as pd
@@ -7,6 +8,10 @@ import datetime as dt
 
 from plotting_util import generate_line_plot, generate_superimposed_line_plot, generate_histogram
 
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+import run_report_util
+import manifest_util
+
 # ======================================================================
 # GLOBAL VARIABLES
 
@@ -407,13 +412,28 @@ def generate_superimposed_graphic():
 #         generate_ev_histogram_graphics()
 
 def main():
-        print("Generating House graphics...")
-        generate_house_graphics()       
-        print("Generating Senate graphics...")        
-        generate_senate_graphics()       
-        print("Generating Presidential graphics...")       
-        generate_presidential_graphics()
-        generate_superimposed_graphic()
+        # Each graphic is skipped if the outputs it reads did not change since it was last generated today
+        stamp_path = os.path.join(out_dir, manifest_util.STAMP_NAME)
+        sections = [('House', ['house', f'matlab/House_predictions_{YEAR}.csv'], 
+                     generate_house_graphics),
+                    ('Senate', [f'matlab/Senate_estimate_history_{YEAR}.csv', f'matlab/Senate_histogram_{YEAR}.csv'], 
+                     generate_senate_graphics),
+                    ('Presidential', [f'matlab/EV_estimate_history_{YEAR}.csv', f'matlab/EV_prediction_{YEAR}.csv', 
+                                      f'matlab/EV_histogram_{YEAR}.csv', f'matlab/EV_estimates_{YEAR}.csv'], 
+                     generate_presidential_graphics),
+                    ('superimposed', ['house', f'matlab/Senate_estimate_history_{YEAR}.csv', f'matlab/EV_estimate_history_{YEAR}.csv'], 
+                     generate_superimposed_graphic)]
+
+        run_report_util.start_report('graphics', os.path.join(out_dir, run_report_util.REPORT_NAME))
+        try:
+                for name, names, generate in sections:
+                        print(f"Generating {name} graphics...")
+                        with run_report_util.stage(f'{name} graphics', outputs=[out_dir]) as info:
+                                info['skipped'] = not manifest_util.run_if_changed(stamp_path, name, names, generate)
+        except BaseException:
+                run_report_util.write_report('error')
+                raise
+        run_report_util.write_report()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -12,11 +12,22 @@ git pull origin master
 # 538 SCRAPING
 python scraping/scraping_util.py
 
-# MATLAB SCRIPTS
+# EV ESTIMATES (EV_util.py) AND MATLAB SCRIPTS (skipped if the poll medians did not change 
+# since they last ran today; set FORCE_REGENERATE=1 to always regenerate, see manifest_util.py)
+# To rebuild the estimate histories after a methodology change, run python EV_util.py --regenerate
+# and python Senate_util.py --regenerate in matlab (they append every day since the start date)
 cd matlab
-/opt/MATLAB/R2021b/bin/matlab -r "federal_runner; quit"
+if python ../manifest_util.py changed outputs/manifest.stamp.json matlab house Senate EV EV.district; then
+    python EV_util.py \
+        && python ../run_report_util.py run --name matlab --report outputs/run_report.json --outputs outputs -- /opt/MATLAB/R2021b/bin/matlab -r "federal_runner; quit" \
+        && python ../export_util.py outputs \
+        && python ../manifest_util.py record matlab outputs/*.csv \
+        && python ../manifest_util.py mark outputs/manifest.stamp.json matlab house Senate EV EV.district
+fi
 cd ..
 
+# PYTHON GRAPHICS, BANNER AND SIDEBAR CODE skip races whose inputs did not change (see manifest_util.py)
+
 # PYTHON GRAPHICS
 cd python_graphics          # need to run in this directory
 python graphics_util.py 
@@ -28,6 +39,9 @@ python banner/banner_util.py
 # SIDEBAR CODE
 python sidebar/sidebar_util.py
 
+# RUN REPORTS (compare with the previous run: python run_report_util.py diff <dir>/run_report.prev.json <dir>/run_report.json)
+# scraping/outputs, matlab/outputs, python_graphics/outputs, banner, sidebar
+
 # OUTPUTS
 cp /opt/cron/scripts/data-backend/scraping/outputs/*.txt /opt/cron/output
 cp /opt/cron/scripts/data-backend/scraping/outputs/*.csv /opt/cron/output
@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import threading
+import subprocess
+from functools import wraps
+from contextlib import contextmanager
+from datetime import datetime
+
+# ======================================================================
+# GLOBAL VARIABLES
+
+REPORT_NAME = 'run_report.json'
+PREVIOUS_REPORT_NAME = 'run_report.prev.json'
+
+report = None
+report_lock = threading.Lock()
+
+# ======================================================================
+# RUN REPORTS
+
+def get_peak_rss_mb(who=resource.RUSAGE_SELF):
+    """
+    Returns the peak resident set size so far (MB) of this process, or of
+    its finished child processes with resource.RUSAGE_CHILDREN.
+    """
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def get_file_stats(outputs):
+    """
+    NOTE: Helper function for stage.
+
+    Returns the modification time and size of the output files.
+
+    Args:
+    - outputs (list of str): Output files or directories (all files in
+        them are considered).
+
+    Returns:
+    - dict: (mtime_ns, size) by file path.
+    """
+    paths = []
+    for output in outputs:
+        if os.path.isdir(output):
+            paths.extend(os.path.join(output, name) for name in os.listdir(output))
+        else:
+            paths.append(output)
+
+    stats = {}
+    for path in paths:
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+def get_bytes_written(before, after):
+    """
+    NOTE: Helper function for stage.
+
+    Sums the sizes of the output files created or modified by a stage.
+
+    Args:
+    - before (dict): File stats when the stage started (see get_file_stats).
+    - after (dict): File stats when the stage ended.
+
+    Returns:
+    - int: Number of bytes.
+    """
+    return sum(size for path, (mtime, size) in after.items() if before.get(path) != (mtime, size))
+
+def start_report(name, path):
+    """
+    Starts the run report of an entry point (e.g. 'scraping'). Stages
+    timed with stage or timed_stage are added to it, and write_report
+    writes it to path.
+
+    Args:
+    - name (str): Name of the entry point.
+    - path (str): Path of the run report (next to the outputs).
+    """
+    global report
+    report = dict(name=name,
+                  path=path,
+                  started=datetime.now().isoformat(timespec='seconds'),
+                  start_time=time.time(),
+                  stages=[])
+
+@contextmanager
+def stage(name, outputs=()):
+    """
+    Times a stage of the run. The stage may set info['rows'] to the
+    number of rows it processed; bytes written to outputs and the peak RSS
+    of the process so far are recorded when it ends. Without a started
+    report, this only times the stage.
+
+    Args:
+    - name (str): Name of the stage.
+    - outputs (list of str, optional): Files or directories the stage
+        writes to.
+
+    Yields:
+    - info (dict): Stage record.
+    """
+    info = dict(stage=name, rows=None)
+    before = get_file_stats(outputs)
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        info['duration'] = round(time.perf_counter() - start, 3)
+        info['bytes_written'] = get_bytes_written(before, get_file_stats(outputs))
+        info['peak_rss_mb'] = round(get_peak_rss_mb(), 1)
+        if report is not None:
+            with report_lock:
+                report['stages'].append(info)
+
+def timed_stage(name, outputs=()):
+    """
+    Decorator version of stage. If the function returns an int, it is
+    recorded as the number of rows processed.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name, outputs) as info:
+                result = function(*args, **kwargs)
+                if isinstance(result, int) and not isinstance(result, bool):
+                    info['rows'] = result
+            return result
+        return wrapper
+    return decorator
+
+def write_report(status='ok'):
+    """
+    Writes the run report started with start_report. The report of the
+    previous run is kept as run_report.prev.json (see diff_reports).
+
+    Args:
+    - status (str, optional): Outcome of the run. Default is 'ok'.
+    """
+    if report is None:
+        return
+
+    path = report['path']
+    data = dict(name=report['name'],
+                started=report['started'],
+                status=status,
+                duration=round(time.time() - report['start_time'], 3),
+                peak_rss_mb=round(get_peak_rss_mb(), 1),
+                stages=report['stages'])
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.exists(path):
+        os.replace(path, os.path.join(os.path.dirname(path), PREVIOUS_REPORT_NAME))
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+def format_value(value, spec):
+    """
+    NOTE: Helper function for diff_reports.
+
+    Formats a report value, or returns '' if it is missing.
+    """
+    return '' if value is None else format(value, spec)
+
+def diff_reports(old, new):
+    """
+    Prints the stages of two run reports side by side: durations (and
+    their change), rows processed, bytes written and peak RSS of the newer
+    report.
+
+    Args:
+    - old (dict): Earlier run report.
+    - new (dict): Later run report.
+    """
+    old_stages = {info['stage']: info for info in old['stages']}
+    rows = [(info['stage'], old_stages.get(info['stage'], {}).get('duration'), info['duration'],
+             info.get('rows'), info.get('bytes_written'), info.get('peak_rss_mb'))
+            for info in new['stages']]
+    rows.append(('TOTAL', old.get('duration'), new['duration'], None, None, new.get('peak_rss_mb')))
+
+    print(f"{new['name']}: {old.get('started')} ({old.get('status')}) -> {new.get('started')} ({new.get('status')})")
+    print(f"{'stage':<32} {'old (s)':>9} {'new (s)':>9} {'change':>8} {'rows':>9} {'bytes':>11} {'peak MB':>8}")
+    for name, old_duration, duration, num_rows, written, peak in rows:
+        change = f'{(duration - old_duration) / old_duration:+.0%}' if old_duration else 'new'
+        print(f"{name:<32} {format_value(old_duration, '.3f'):>9} {duration:>9.3f} {change:>8} "
+              f"{format_value(num_rows, 'd'):>9} {format_value(written, 'd'):>11} {format_value(peak, '.1f'):>8}")
+
+    for name in old_stages.keys() - {info['stage'] for info in new['stages']}:
+        print(f"{name:<32} (not run)")
+
+def run_command(name, path, outputs, command):
+    """
+    Runs an external command (e.g. MATLAB) as a single-stage run report,
+    recording the peak RSS of the command.
+
+    Args:
+    - name (str): Name of the stage.
+    - path (str): Path of the run report.
+    - outputs (list of str): Files or directories the command writes to.
+    - command (list of str): Command and arguments.
+
+    Returns:
+    - int: Exit code of the command.
+    """
+    start_report(name, path)
+    with stage(name, outputs) as info:
+        returncode = subprocess.call(command)
+    info['peak_rss_mb'] = round(get_peak_rss_mb(resource.RUSAGE_CHILDREN), 1)
+
+    write_report('ok' if returncode == 0 else f'exit {returncode}')
+    return returncode
+
+# ======================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Run reports of the nightly pipeline.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    diff_parser = subparsers.add_parser('diff', help='compare two run reports')
+    diff_parser.add_argument('old', help='earlier run report (e.g. run_report.prev.json)')
+    diff_parser.add_argument('new', help='later run report (e.g. run_report.json)')
+
+    run_parser = subparsers.add_parser('run', help='run a command and write its run report')
+    run_parser.add_argument('--name', required=True, help='stage name')
+    run_parser.add_argument('--report', required=True, help='run report path')
+    run_parser.add_argument('--outputs', action='append', default=[], help='file or directory the command writes to')
+    run_parser.add_argument('cmd', nargs=argparse.REMAINDER, help='command (after --)')
+
+    args = parser.parse_args()
+
+    if args.command == 'diff':
+        with open(args.old, 'r') as f:
+            old = json.load(f)
+        with open(args.new, 'r') as f:
+            new = json.load(f)
+        diff_reports(old, new)
+    else:
+        cmd = args.cmd[1:] if args.cmd[:1] == ['--'] else args.cmd
+        sys.exit(run_command(args.name, args.report, args.outputs, cmd))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+import os
+import csv
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import scraping_util
+
+# ======================================================================
+# GLOBAL VARIABLES
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+BENCHMARK_DIR = os.path.join(dir_path, 'benchmarks')
+YEAR = scraping_util.YEAR
+INPUT_FILES = [f'{YEAR}.EV.priors.csv', f'{YEAR}.Senate.priors.csv', f'{YEAR}.EV.districts.csv']
+
+# ======================================================================
+# SYNTHETIC 538 FEED
+
+def read_csv_rows(name):
+    """
+    NOTE: Helper function for generate_feed.
+
+    Reads the rows of one of the scraper's input CSVs as dicts.
+    """
+    with open(os.path.join(dir_path, name), 'r') as f:
+        return list(csv.DictReader(f))
+
+def generate_feed(num_polls=6000, num_states=None, num_pollsters=40, district_share=0.05,
+                  other_share=0.15, duplicate_share=0.15, start_date=None, num_days=365, seed=1):
+    """
+    Generates a deterministic feed with the same shape as the 538
+    polls.json feed, with margins drawn around the priors.
+
+    Args:
+    - num_polls (int, optional): Number of polls (before duplicates).
+    - num_states (int, optional): Number of states polled (the first
+        ones of the priors CSVs). Default is None (all states).
+    - num_pollsters (int, optional): Number of distinct pollsters.
+    - district_share (float, optional): Share of Presidential polls that
+        are district polls (Maine and Nebraska districts).
+    - other_share (float, optional): Share of polls of types the scraper
+        ignores (e.g. governor).
+    - duplicate_share (float, optional): Share of polls repeated by the
+        same pollster on the same end date with another population.
+    - start_date (datetime, optional): First end date. Default is None
+        (January 1 of YEAR).
+    - num_days (int, optional): Number of days the end dates span.
+    - seed (int, optional): Random seed.
+
+    Returns:
+    - records (list of dicts): Poll records.
+    """
+    rnd = random.Random(seed)
+    start_date = start_date or datetime(year=YEAR, month=1, day=1)
+
+    ev_states = read_csv_rows(f'{YEAR}.EV.priors.csv')[:num_states]
+    sen_states = read_csv_rows(f'{YEAR}.Senate.priors.csv')[:num_states]
+    districts = read_csv_rows(f'{YEAR}.EV.districts.csv')
+    pollsters = ['Pollster %03d' % idx for idx in range(num_pollsters)]
+    populations = ['lv', 'rv', 'a', 'v', None]
+
+    def answer(choice, party, pct):
+        return dict(choice=choice, party=party, pct='%.1f' % pct)
+
+    records = []
+    for idx in range(num_polls):
+        end_date = start_date + timedelta(days=rnd.randrange(num_days))
+        district = None
+        roll = rnd.random()
+
+        if roll < other_share:
+            poll_type, state = 'governor', rnd.choice(ev_states)['name']
+            answers = [answer('X', 'Dem', 50), answer('Y', 'Rep', 40)]
+
+        elif roll < other_share + (1 - other_share) * 0.5:
+            poll_type = 'president-general'
+            if rnd.random() < district_share:
+                row = rnd.choice(districts)
+                state, district = row['name'], int(row['district'])
+                margin = rnd.gauss(-float(row['offset']), 4)
+            else:
+                row = rnd.choice(ev_states)
+                state, margin = row['name'], rnd.gauss(float(row['prior']), 4)
+            dem_cand = scraping_util.DEM_CAND_AFTER if end_date >= scraping_util.HARRIS_DATE else scraping_util.DEM_CAND_BEFORE
+            answers = [answer(dem_cand, 'Dem', 46 + margin / 2), answer(scraping_util.REP_CAND, 'Rep', 46 - margin / 2)]
+            if rnd.random() < 0.2:
+                answers.append(answer('Kennedy', 'Ind', rnd.uniform(1, 8)))
+
+        elif roll < other_share + (1 - other_share) * 0.85:
+            poll_type = 'senate'
+            row = rnd.choice(sen_states)
+            state, margin = row['name'], rnd.gauss(float(row['prior']), 4)
+            dem_party = 'Ind' if rnd.random() < 0.05 else 'Dem'
+            answers = [answer(row['dem'], dem_party, 46 + margin / 2), answer(row['rep'], 'Rep', 46 - margin / 2)]
+
+        else:
+            poll_type, state = 'generic-ballot', 'National'
+            margin = rnd.gauss(0, 3)
+            answers = [answer('Dem', 'Dem', 45 + margin / 2), answer('Rep', 'Rep', 45 - margin / 2)]
+
+        record = dict(id=str(idx), pollId=str(idx), type=poll_type, state=state,
+                      pollster=rnd.choice(pollsters), sponsors='',
+                      startDate=(end_date - timedelta(days=rnd.randint(0, 5))).strftime('%Y-%m-%d'),
+                      endDate=end_date.strftime('%Y-%m-%d'),
+                      sampleSize=rnd.randint(300, 3000), population=rnd.choice(populations),
+                      url=f'https://example.com/polls/{idx}', answers=answers, district=district)
+        records.append(record)
+
+        if rnd.random() < duplicate_share:
+            records.append(dict(record, id=f'{idx}-2', population=rnd.choice(populations),
+                                answers=[dict(a, pct='%.1f' % (float(a['pct']) + rnd.uniform(-2, 2))) for a in answers]))
+
+    return records
+
+def write_feed(records, path):
+    """
+    Writes records as a polls.json-shaped JSON array (see generate_feed).
+    """
+    with open(path, 'w') as f:
+        json.dump(records, f)
+
+# ======================================================================
+# BENCHMARK
+
+def time_calls(timings, name, function):
+    """
+    NOTE: Helper function for run_benchmark.
+
+    Wraps function so the time spent in each call is added to
+    timings[name].
+    """
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+    return timed
+
+def run_stages(path, timings):
+    """
+    NOTE: Helper function for run_benchmark.
+
+    Runs the scraping stages of scraping_util.main() on a local feed
+    (full recompute), timing each stage.
+    """
+    start = time.perf_counter()
+    all_polls = scraping_util.get_all_polls(YEAR, path)
+    timings['get_all_polls'] = time.perf_counter() - start
+
+    sen_states, *sen_cands = scraping_util.get_sen_states_cands()
+    pres_states = scraping_util.get_pres_states()
+
+    stages = [('process_house_polls', scraping_util.process_house_polls, (all_polls, scraping_util.START_DATE)),
+              ('process_senate_polls', scraping_util.process_senate_polls, (all_polls, scraping_util.START_DATE, sen_states, sen_cands)),
+              ('process_presidential_polls', scraping_util.process_presidential_polls, (all_polls, scraping_util.START_DATE, pres_states))]
+    for name, process, process_args in stages:
+        start = time.perf_counter()
+        process(*process_args, incremental=False)
+        timings[name] = time.perf_counter() - start
+
+    return len(all_polls.index)
+
+def run_benchmark(path, repeat=3):
+    """
+    Times get_all_polls (and clean_districts within it), each
+    process_*_polls stage, and the output writers within them, on a local
+    feed. Outputs are written to a temporary directory, never to
+    scraping/outputs. Each stage reports the best of repeat runs.
+
+    Args:
+    - path (str): Path to the feed (or a snapshot of it).
+    - repeat (int, optional): Number of runs.
+
+    Returns:
+    - dict: Best time (seconds) by stage, and the number of polls kept.
+    """
+    work_dir = tempfile.mkdtemp(prefix='scraping-benchmark-')
+    os.makedirs(os.path.join(work_dir, 'outputs'))
+    for name in INPUT_FILES:
+        shutil.copy(os.path.join(dir_path, name), work_dir)
+
+    patched = ['clean_districts', 'write_output_table']
+    originals = {name: getattr(scraping_util, name) for name in patched}
+    original_dir_path = scraping_util.dir_path
+    best = {}
+
+    try:
+        scraping_util.dir_path = work_dir
+        for _ in range(repeat):
+            timings = {}
+            for name in patched:
+                setattr(scraping_util, name, time_calls(timings, name, originals[name]))
+            num_polls = run_stages(path, timings)
+            for name, seconds in timings.items():
+                best[name] = min(best.get(name, seconds), seconds)
+    finally:
+        scraping_util.dir_path = original_dir_path
+        for name in patched:
+            setattr(scraping_util, name, originals[name])
+        shutil.rmtree(work_dir)
+
+    return dict(timings=best, num_polls=num_polls)
+
+def get_git_commit():
+    """
+    Returns the current git commit hash, or None outside a git checkout.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=dir_path,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(old, new):
+    """
+    Prints the stage timings of two benchmark results side by side.
+
+    Args:
+    - old (dict): Earlier benchmark result (see main).
+    - new (dict): Later benchmark result.
+    """
+    print(f"{'stage':<28} {'old (s)':>9} {'new (s)':>9} {'ratio':>7}")
+    for name in new['timings']:
+        old_seconds = old['timings'].get(name, float('nan'))
+        new_seconds = new['timings'][name]
+        print(f"{name:<28} {old_seconds:>9.3f} {new_seconds:>9.3f} {old_seconds / new_seconds:>6.2f}x")
+
+# ======================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the 538 poll scraper on a synthetic feed.')
+    parser.add_argument('--polls', type=int, default=6000, help='number of polls to generate')
+    parser.add_argument('--states', type=int, default=None, help='number of states to poll (default: all)')
+    parser.add_argument('--pollsters', type=int, default=40, help='number of distinct pollsters')
+    parser.add_argument('--district-share', type=float, default=0.05, help='share of Presidential polls that are district polls')
+    parser.add_argument('--days', type=int, default=365, help='number of days the poll end dates span')
+    parser.add_argument('--seed', type=int, default=1, help='random seed')
+    parser.add_argument('--feed', help='benchmark this feed instead of generating one')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs (best is reported)')
+    parser.add_argument('--output', help='results JSON path (default: benchmarks/<timestamp>.json)')
+    parser.add_argument('--compare', metavar='RESULTS', help='compare with earlier results JSON')
+    args = parser.parse_args()
+
+    params = dict(polls=args.polls, states=args.states, pollsters=args.pollsters,
+                  district_share=args.district_share, days=args.days, seed=args.seed)
+
+    feed_path = args.feed
+    if feed_path is None:
+        feed_path = os.path.join(tempfile.mkdtemp(prefix='scraping-feed-'), 'polls.json')
+        write_feed(generate_feed(num_polls=args.polls, num_states=args.states, num_pollsters=args.pollsters,
+                                 district_share=args.district_share, num_days=args.days, seed=args.seed),
+                   feed_path)
+    else:
+        params = dict(feed=os.path.abspath(feed_path))
+
+    result = run_benchmark(feed_path, repeat=args.repeat)
+    result.update(params=params,
+                  commit=get_git_commit(),
+                  date=datetime.now().isoformat(timespec='seconds'),
+                  python=platform.python_version(),
+                  pandas=pd.__version__,
+                  numpy=np.__version__)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print("Wrote", output)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare_results(json.load(f), result)
+    else:
+        for name, seconds in result['timings'].items():
+            print(f"{name:<28} {seconds:>9.3f} s")
+
+if __name__ == '__main__':
+    main()
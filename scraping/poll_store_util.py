@@ -0,0 +1,244 @@
+import os
+import json
+import hashlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# ======================================================================
+# GLOBAL VARIABLES
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+STORE_DIR = os.path.join(dir_path, 'polls')
+INDEX_NAME = 'index.json'
+
+# Columns (name, dtype) of the cleaned poll table
+STORE_COLUMNS = [('id', 'U'),
+                 ('race', 'U'),
+                 ('state', 'U'),
+                 ('district', 'int16'),
+                 ('pollster', 'U'),
+                 ('population', 'U'),
+                 ('startDate', 'datetime64[D]'),
+                 ('endDate', 'datetime64[D]'),
+                 ('dem_cand', 'U'),
+                 ('rep_cand', 'U'),
+                 ('dminusr', 'float64')]
+
+# ======================================================================
+# CLEANED POLL STORE
+
+def get_index_path(race, store_dir=STORE_DIR):
+    return os.path.join(store_dir, race, INDEX_NAME)
+
+def read_index(store_dir=STORE_DIR, races=None):
+    """
+    NOTE: Helper function for append_polls and query_polls.
+
+    Reads the index of the store: the current part of each partition.
+    Each race has its own index file (see write_index).
+
+    Args:
+    - store_dir (str, optional): Directory of the store.
+    - races (list of str, optional): Races to read. Default is None
+        (every race in the store).
+
+    Returns:
+    - index (dict): By race, then month ('YYYY-MM' of the end date), a
+        dict with the part's file name, content hash and number of rows.
+    """
+    if races is None:
+        races = sorted(os.listdir(store_dir)) if os.path.isdir(store_dir) else []
+
+    index = {}
+    for race in races:
+        try:
+            with open(get_index_path(race, store_dir), 'r') as f:
+                index[race] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return index
+
+def write_index(partitions, race, store_dir=STORE_DIR):
+    """
+    NOTE: Helper function for append_polls.
+
+    Writes the index of a race atomically. Each race has its own index
+    file, and each write its own temporary file, so stages that run at
+    the same time (--jobs) never overwrite each other's entries.
+    """
+    path = get_index_path(race, store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'{INDEX_NAME}.', suffix='.tmp', dir=os.path.dirname(path))
+    with os.fdopen(fd, 'w') as f:
+        json.dump(partitions, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def get_poll_columns(polls, race):
+    """
+    NOTE: Helper function for append_polls.
+
+    Converts cleaned polls to the store's columns (see STORE_COLUMNS).
+
+    Args:
+    - polls (pandas.DataFrame): Cleaned polls with 'dminusr' (and
+        'dem_cand'/'rep_cand' if candidates were resolved).
+    - race (str): Race, e.g. 'Senate'.
+
+    Returns:
+    - columns (dict): numpy array by column name, sorted by end date
+        and id.
+    """
+    num_polls = len(polls.index)
+
+    def strings(column, default=''):
+        if column not in polls:
+            return np.full(num_polls, default)
+        return polls[column].astype(object).where(polls[column].notna(), default).to_numpy(dtype='U')
+
+    columns = dict(id=strings('id'),
+                   race=np.full(num_polls, race),
+                   state=strings('state'),
+                   district=polls['district'].to_numpy(dtype=np.int16),
+                   pollster=strings('pollster'),
+                   population=strings('population'),
+                   startDate=polls['startDate'].values.astype('datetime64[D]'),
+                   endDate=polls['endDate'].values.astype('datetime64[D]'),
+                   dem_cand=strings('dem_cand', 'Dem' if race == 'house' else ''),
+                   rep_cand=strings('rep_cand', 'Rep' if race == 'house' else ''),
+                   dminusr=polls['dminusr'].to_numpy(dtype=np.float64))
+
+    order = np.lexsort((columns['id'], columns['endDate']))
+    return {name: values[order] for name, values in columns.items()}
+
+def hash_columns(columns):
+    """
+    NOTE: Helper function for append_polls.
+
+    Returns the SHA-256 hex digest of the contents of a partition.
+    """
+    digest = hashlib.sha256()
+    for name, dtype in STORE_COLUMNS:
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(columns[name]).tobytes())
+    return digest.hexdigest()
+
+def remove_part(path):
+    """
+    NOTE: Helper function for append_polls.
+
+    Deletes a part file, and its month directory if that is left empty.
+    """
+    try:
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+    except OSError:
+        pass
+
+def append_polls(polls, race, store_dir=STORE_DIR):
+    """
+    Persists the cleaned, candidate-resolved polls of a race, partitioned
+    by month of the end date. Part files are never modified: a partition
+    whose polls changed gets a new (content-addressed) part file, the
+    index is switched to it, and only then is the superseded part 
+    deleted. Unchanged partitions cost nothing.
+
+    Args:
+    - polls (pandas.DataFrame): Cleaned polls of the race (see
+        get_poll_columns).
+    - race (str): Race, e.g. 'Senate'.
+    - store_dir (str, optional): Directory of the store.
+
+    Returns:
+    - int: Number of partitions written.
+    """
+    columns = get_poll_columns(polls, race)
+    months = columns['endDate'].astype('datetime64[M]')
+    # A race without polls (e.g. early in a cycle) has no partitions
+    bounds = np.flatnonzero(np.r_[True, months[1:] != months[:-1], True]) if len(months) else np.zeros(1, dtype=np.int64)
+
+    old_partitions = read_index(store_dir, [race]).get(race, {})
+    partitions = {}
+    num_written = 0
+
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        month = str(months[lo])
+        # Narrow strings to the partition's own longest value, so that its
+        # contents (and hash) do not depend on other partitions
+        partition = {name: values[lo:hi].astype(f'U{max(1, np.char.str_len(values[lo:hi]).max())}') 
+                     if values.dtype.kind == 'U' else values[lo:hi] 
+                     for name, values in columns.items()}
+        digest = hash_columns(partition)
+
+        part = os.path.join(race, month, f'{digest[:16]}.npz')
+        if old_partitions.get(month, {}).get('hash') != digest:
+            path = os.path.join(store_dir, part)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + '.tmp.npz'
+                np.savez_compressed(tmp_path, **partition)
+                os.replace(tmp_path, path)
+            num_written += 1
+
+        partitions[month] = dict(part=part, hash=digest, rows=int(hi - lo))
+
+    # Months without polls anymore drop out of the index
+    write_index(partitions, race, store_dir)
+
+    # Delete the parts the index no longer points to
+    current_parts = {partition['part'] for partition in partitions.values()}
+    for partition in old_partitions.values():
+        if partition['part'] not in current_parts:
+            remove_part(os.path.join(store_dir, partition['part']))
+
+    return num_written
+
+def query_polls(race=None, states=None, start_date=None, end_date=None, store_dir=STORE_DIR):
+    """
+    Reads cleaned polls from the store, e.g.
+    query_polls('Senate', states=['Ohio'], start_date='2024-09-01'). Only
+    the partitions of the requested months are read.
+
+    Args:
+    - race (str or list of str, optional): Race(s), e.g. 'EV'. Default is
+        None (all races).
+    - states (list of str, optional): State names. Default is None (all).
+    - start_date (str or datetime, optional): Earliest end date. Default
+        is None.
+    - end_date (str or datetime, optional): Latest end date. Default is
+        None.
+    - store_dir (str, optional): Directory of the store.
+
+    Returns:
+    - polls (pandas.DataFrame): Polls with the columns of STORE_COLUMNS,
+        by race and then end date.
+    """
+    races = None if race is None else [race] if isinstance(race, str) else race
+    index = read_index(store_dir, races)
+    races = sorted(index) if races is None else races
+    start = None if start_date is None else np.datetime64(pd.Timestamp(start_date).date(), 'D')
+    end = None if end_date is None else np.datetime64(pd.Timestamp(end_date).date(), 'D')
+
+    parts = []
+    for name in races:
+        for month, partition in sorted(index.get(name, {}).items()):
+            month = np.datetime64(month, 'M')
+            if (start is not None and month < start.astype('datetime64[M]')) or (end is not None and month > end.astype('datetime64[M]')):
+                continue
+            with np.load(os.path.join(store_dir, partition['part'])) as data:
+                parts.append({column: data[column] for column, dtype in STORE_COLUMNS})
+
+    if not parts:
+        return pd.DataFrame({column: np.empty(0, dtype=dtype) for column, dtype in STORE_COLUMNS})
+    columns = {column: np.concatenate([part[column] for part in parts]) for column, dtype in STORE_COLUMNS}
+
+    keep = np.ones(len(columns['id']), dtype=bool)
+    if states is not None:
+        keep &= np.isin(columns['state'], states)
+    if start is not None:
+        keep &= columns['endDate'] >= start
+    if end is not None:
+        keep &= columns['endDate'] <= end
+
+    return pd.DataFrame({column: values[keep] for column, values in columns.items()})
@@ -1,10 +1,28 @@
 import os
+import re
+import sys
 import csv 
+import json
+import codecs
+import hashlib
+import argparse
+import multiprocessing
+from bisect import bisect_left, insort
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+import snapshot_util
+import poll_store_util
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+import run_report_util
+import manifest_util
+import export_util
+
 # ======================================================================
 # GLOBAL VARIABLES
 
@@ -18,239 +36,403 @@ PRES_CANDS = [['Biden'], ['Harris'], ['Trump']] # must be Dem, Rep order
 DEM_CAND_BEFORE = 'Biden'
 DEM_CAND_AFTER = 'Harris'
 REP_CAND = 'Trump'
+CHECKPOINT_VERSION = 1  # Bump to force a full recompute after changing the algorithm
+FEED_TYPES = ('president-general', 'senate', 'generic-ballot') # poll types used below
+FEED_COLUMNS = ['id', 'type', 'state', 'district', 'pollster', 'population', 'startDate', 'endDate', 'answers']
+FEED_CHUNK_SIZE = 1 << 20   # characters read from the feed at a time
+STATS_DAYS_PER_TASK = 32    # days per worker task (shard) with --jobs or --backfill
+
+# Length of the poll window from each day on (see get_timespans); rule 
+# before 7/31/24 was 4-3-2 (weeks before September, September, October)
+TIMESPAN_SCHEDULE = [(datetime(year=YEAR, month=1, day=1), timedelta(weeks=2)),
+                     (datetime(year=YEAR, month=10, day=1), timedelta(weeks=1))]
+FIXED_TIMESPAN = timedelta(weeks=2)  # House
 
 # ======================================================================
 # MAIN 538 POLL SCRAPING / CLEANING
 
+def get_districts():
+    """
+    Reads from the EV districts CSV. Extracts the sub-units (congressional
+    districts) that allocate their own electoral vote, e.g. in Maine and
+    Nebraska:
+    - code, name (parent state), district
+    - num: Index of the unit after the 51 states (as in EV_estimator.m).
+    - offset: Poll adjustment, added to the first answer's 'pct' of the
+        unit's polls at ingest (see clean_districts).
+    - mode: 'poll' if the unit's polls are kept apart from the statewide
+        race and give the unit its own median (Maine), or 'derive' if they
+        are adjusted by offset and count for the statewide race, from 
+        which the unit is derived (Nebraska). Only 'poll' units have rows
+        in the EV.districts outputs.
+    - derive_offset, derive_variance: Derivation of 'derive' units from
+        the statewide median, read by the estimators (EV_estimator.m): 
+        the unit's margin is the statewide margin plus derive_offset, and
+        its SEM is sqrt(statewide SEM^2 + derive_variance).
+
+    Returns:
+    - districts (pandas.DataFrame): Sub-units, in CSV order, indexed by 
+        (state name, district).
+    """
+    path = os.path.join(dir_path, f'{YEAR}.EV.districts.csv')
+    districts = pd.read_csv(path)
+    districts['district'] = districts['district'].astype(np.int64)
+    districts['offset'] = districts['offset'].astype(float)
+    districts[['derive_offset', 'derive_variance']] = districts[['derive_offset', 'derive_variance']].astype(float)
+
+    return districts.set_index(['name', 'district'], drop=False)
+
 def clean_districts(polls):
     """
     NOTE: Helper function for get_all_polls. 
 
     Cleans poll data by adjusting percentages and dropping irrelevant 
-    rows based on specific state districts (Maine and Nebraska). 
+    rows based on specific state districts (see get_districts). District 
+    polls are kept only if they are 'president-general' polls of a 
+    district listed in the EV districts CSV. The input DataFrame and its
+    'answers' are not modified.
     
     Args:
     - polls (DataFrame): DataFrame with poll data.
 
     Returns:
-    - polls (DataFrame): DataFrame with cleaned district poll data.
-    """
-
-    dropped = 0     # Counter for the number of dropped rows
-    adjusted = 0    # Counter for the number of adjusted rows
-
-    # Iterate through each row (poll)
-    for index in polls.index: 
-        # Check if the poll is associated with a specific district
-        if polls.loc[index, 'district'] > 0:
-            adjusted += 1
-
-            # Check if the poll is of type 'president-general'
-            if polls.loc[index, 'type'] == 'president-general':
-                # Adjust percentages for Maine districts
-                if polls.loc[index, 'state'] == "Maine":
-                    if polls.loc[index, 'district'] == 1:
-                        polls.loc[index, 'answers'][0]['pct'] = float(polls.loc[index, 'answers'][0]['pct']) # - 10 # Remove adjustment to polls if separating them
-                    elif polls.loc[index, 'district'] == 2:
-                        polls.loc[index, 'answers'][0]['pct'] = float(polls.loc[index, 'answers'][0]['pct']) # + 10
-                    else: 
-                        # Drop rows for invalid districts
-                        polls = polls.drop(index)
-                        dropped += 1
-
-                # Adjust percentages for Nebraska districts
-                elif polls.loc[index, 'state'] == "Nebraska":
-                    if polls.loc[index, 'district'] == 1:
-                        polls.loc[index, 'answers'][0]['pct'] = float(polls.loc[index, 'answers'][0]['pct']) - 6
-                    elif polls.loc[index, 'district'] == 2:
-                        polls.loc[index, 'answers'][0]['pct'] = float(polls.loc[index, 'answers'][0]['pct']) - 20
-                    elif polls.loc[index, 'district'] == 3:
-                        polls.loc[index, 'answers'][0]['pct'] = float(polls.loc[index, 'answers'][0]['pct']) + 26
-                    else: 
-                        # Drop rows for invalid districts
-                        polls = polls.drop(index)
-                        dropped += 1
-                
-                # Drop rows for states other than Maine or Nebraska
-                else: 
-                    polls = polls.drop(index)
-                    dropped += 1
-            
-            # Drop rows for polls not of 'president-general' type
-            else: 
-                polls = polls.drop(index) 
-                dropped += 1
+    - polls (DataFrame): DataFrame with cleaned district poll data, with a
+        'unit' column: the row of the poll's district in get_districts, 
+        or -1 for statewide polls.
+    """
+    # Look up the unit of each poll's (state, district), -1 if not listed
+    districts = get_districts()
+    unit = districts.index.get_indexer(pd.MultiIndex.from_arrays([polls['state'].astype(object), polls['district']]))
+    offsets = np.where(unit >= 0, districts['offset'].values[unit], np.nan)
+
+    is_district = (polls['district'] > 0).values
+    keep = is_district & (polls['type'] == 'president-general').values & (unit >= 0)
+    drop = is_district & ~keep
+
+    # Adjust percentages of the first answer, copying instead of mutating
+    answers = polls['answers'].values.copy()
+    for idx in np.flatnonzero(keep):
+        first = dict(answers[idx][0], pct=float(answers[idx][0]['pct']) + offsets[idx])
+        answers[idx] = [first] + answers[idx][1:]
+
+    polls = polls.assign(answers=answers, unit=np.where(keep, unit, -1))[~drop]
 
     # Print summary of cleaning process
-    print(f"Cleaning districts: Dropped {dropped}, Adjusted {adjusted - dropped}")
+    print(f"Cleaning districts: Dropped {drop.sum()}, Adjusted {keep.sum()}")
 
     return polls 
 
-def get_all_polls(year):
+SKIP_SEPARATORS = re.compile(r'[\s,]*')
+
+def iter_feed_records(f, chunk_size=FEED_CHUNK_SIZE):
+    """
+    NOTE: Helper function for read_polls.
+
+    Parses the records of the feed (a JSON array of objects) one at a 
+    time, reading the file in chunks, so the whole feed is never held in
+    memory as Python objects.
+
+    Args:
+    - f (file object): Binary file object with the (uncompressed) feed.
+    - chunk_size (int, optional): Number of characters to read at a time.
+
+    Yields:
+    - record (dict): One poll record.
+    """
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    decoder = json.JSONDecoder()
+
+    def read_chunk():
+        data = f.read(chunk_size)
+        return utf8.decode(data, final=not data), not data
+
+    buffer, eof = read_chunk()
+    buffer = buffer.lstrip()
+    while not buffer.startswith('[') and not eof:
+        chunk, eof = read_chunk()
+        buffer = (buffer + chunk).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("Feed is not a JSON array")
+    pos = 1
+
+    while True:
+        pos = SKIP_SEPARATORS.match(buffer, pos).end()
+
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+
+        # Decode the next record, reading more if it is incomplete
+        try:
+            if pos == len(buffer):
+                raise json.JSONDecodeError("Incomplete record", buffer, pos)
+            record, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk, eof = read_chunk()
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        yield record
+
+def read_polls(f, year):
     """
-    Gets all available polls from the 538 API for the specified year.
+    NOTE: Helper function for get_all_polls.
+
+    Streams the feed and keeps only the polls used below (see FEED_TYPES)
+    that ended after January 1 of the specified year, and only the 
+    columns used below (see FEED_COLUMNS). Strings that repeat across
+    polls are stored as categoricals.
+
+    Args:
+    - f (file object): Binary file object with the (uncompressed) feed.
+    - year (int): Specific (election) year.
+
+    Returns:
+    - polls (pandas.DataFrame): DataFrame with poll data, with 'id' (the
+        feed's poll ID), 'type', 'state', 'pollster' and 'population' as 
+        categoricals, 'district' as integer (0 for state-wide polls) and 
+        dates as datetime.
+    """
+    # ISO dates compare like the dates themselves
+    cutoff = datetime(year=year, month=1, day=1).date().isoformat()
+
+    columns = {column: [] for column in FEED_COLUMNS}
+    for record in iter_feed_records(f):
+        if record.get('type') not in FEED_TYPES or not (record.get('endDate') or '') > cutoff:
+            continue
+        for column in FEED_COLUMNS:
+            columns[column].append(record.get(column))
+
+    return pd.DataFrame(dict(
+        id=pd.Series(columns['id'], dtype=object),
+        type=pd.Categorical(columns['type']),
+        state=pd.Categorical(columns['state']),
+        district=np.array([0 if district is None else int(district) for district in columns['district']], dtype=np.int64),
+        pollster=pd.Categorical(columns['pollster']),
+        population=pd.Categorical(columns['population']),
+        startDate=pd.to_datetime(columns['startDate']),
+        endDate=pd.to_datetime(columns['endDate']),
+        answers=pd.Series(columns['answers'], dtype=object),
+    ))
+
+def get_population_rank(population):
+    """
+    NOTE: Helper function for get_all_polls.
+
+    Ranks poll populations by priority for dropping duplicate pollsters:
+    Likely Voters (LV), Registered Voters (RV), All Adults (A), then any
+    other population in alphabetical order, then missing populations.
+
+    Args:
+    - population (pandas.Series): 'population' column.
+
+    Returns:
+    - rank (numpy.ndarray): Integer rank of each population (lower first).
+    """
+    priority = population.astype(object).replace({'lv': '1lv', 'rv': '2rv', 'a': '3a'})
+    rank, populations = pd.factorize(priority, sort=True)
+    return np.where(rank < 0, len(populations), rank)
+
+def get_all_polls(year, path):
+    """
+    Gets all available polls from a snapshot of the 538 API feed for the
+    specified year.
     
     Args:
     - year (int): Specific (election) year.
+    - path (str): Path to the snapshot (see snapshot_util).
 
     Returns:
     - all_polls (pandas.DataFrame): DataFrame with all polls in the 
-        specified year.
+        specified year, with 'unit' (see clean_districts) and 
+        'population_rank' columns.
     """
-    all_polls = pd.read_json(FIVETHIRTYEIGHT_API_URL)
-    
-    # Convert dates to standard datetime format
-    all_polls.loc[:, 'endDate'] = pd.to_datetime(all_polls['endDate'])
-    all_polls.loc[:, 'startDate'] = pd.to_datetime(all_polls['startDate'])
+    # Filter by election year and poll type while reading
+    with snapshot_util.open_snapshot(path) as f:
+        all_polls = read_polls(f, year)
     
-    # Filter by election year and clean specific districts
-    all_polls = all_polls[all_polls['endDate'] > datetime(year=year, month=1, day=1)]
+    # Clean specific districts and rank populations (see drop_duplicate_pollsters)
     all_polls = clean_districts(all_polls)
+    all_polls = all_polls.assign(population_rank=get_population_rank(all_polls['population']))
    
     return all_polls
 
 # ======================================================================
-# ROW-BY-ROW POLL CLEANING
+# ANSWER PARSING
 
-def parse_candidate(row, party, cand_list=None):
+def explode_answers(polls):
+    """
+    NOTE: Used for House, Senate, and Presidential polls.
+
+    Flattens the nested 'answers' lists of dicts into one long table with
+    one row per answer, in poll and answer order. 'pct' is converted to 
+    float once, here.
+
+    Args:
+    - polls (pandas.DataFrame): DataFrame with poll data (with 'answers').
+
+    Returns:
+    - answers (pandas.DataFrame): DataFrame with columns:
+        - poll (int): Row position of the poll in polls.
+        - choice (str): Candidate choice (or party for generic polls).
+        - party (str): Party of the candidate choice.
+        - pct (float): Percentage for the candidate choice.
+    """
+    nested = polls['answers'].values
+    flat = [answer for poll_answers in nested for answer in poll_answers]
+    lengths = [len(poll_answers) for poll_answers in nested]
+
+    return pd.DataFrame(dict(
+        poll=np.repeat(np.arange(len(nested)), lengths),
+        choice=[answer['choice'] for answer in flat],
+        party=[answer['party'] for answer in flat],
+        pct=np.fromiter((float(answer['pct']) for answer in flat), dtype=np.float64, count=len(flat)),
+    ))
+
+def match_first_choice(answers, num_polls, party, choices=None):
+    """
+    NOTE: Helper function for parse_candidate and parse_candidate_presidential.
+
+    Finds, for each poll, the first answer of the specified party whose
+    choice is in choices. 
+
+    Args:
+    - answers (pandas.DataFrame): Long answers table from explode_answers.
+    - num_polls (int): Number of polls in the table.
+    - party (str): Party affiliation to filter the candidate choices.
+    - choices (list, optional): Accepted candidate choices. Default is 
+        None (any choice).
+
+    Returns:
+    - choice (numpy.ndarray): The candidate choice of each poll, or 
+        "parse_candidate_error" if none is found.
+    """
+    matches = answers['party'] == party
+    if choices is not None:
+        matches &= answers['choice'].isin(choices)
+    first = answers[matches].drop_duplicates('poll', keep='first')
+
+    choice = np.full(num_polls, "parse_candidate_error", dtype=object)
+    choice[first['poll'].values] = first['choice'].values
+    return choice
+
+def parse_candidate(answers, num_polls, party, cand_list=None):
     """
     NOTE: Used for Senate and Presidential (prior to Harris) polls only.
 
-    Parses a poll (row) to extract the candidate choice based on party 
-    affiliation. Returns "parse_candidate_error" if the candidate is not 
-    in the provided cand_list. 
+    Parses polls to extract the candidate choice based on party 
+    affiliation. Returns "parse_candidate_error" for a poll if the 
+    candidate is not in the provided cand_list. 
 
     Args:
-    - row (pandas.Series): A row of poll data with the 'answers' field.
+    - answers (pandas.DataFrame): Long answers table from explode_answers.
+    - num_polls (int): Number of polls in the table.
     - party (str, optional): Party affiliation to filter the candidate choices. 
     - cand_list (list of lists, optional): A list containing two lists,
         the first for Dem candidate(s), the second for Rep candidate(s). 
         Used to verify the extracted candidate choice. Default is None.
 
     Returns: 
-    - choice (str): The name of the candidate choice based on specified party.
-    """
-    choice = None
-
-    # Extract the 'answers' from the row
-    answers = row['answers']
-
-    # Iterate through answers until choice is found
-    for answer in answers:
-        # Check if the candidate choice matches the specified party 
-        # and (if applicable) is in the list of candidates
-        if answer['party'] == party: 
-            if (party == 'Dem' or party == 'Ind') and (cand_list is None or answer['choice'] in cand_list[0]): 
-                choice = answer['choice']
-                break   
-            elif party == 'Rep' and (cand_list is None or answer['choice'] in cand_list[1]):
-                choice = answer['choice']
-                break 
-    
-    # If no candidate choice is found, return an error
-    if not choice:
-        # print("PARSE CANDIDATE ERROR IN {} FOR {}: {}".format(row['state'].upper(), party.upper(), answers))
-        return "parse_candidate_error"
+    - choice (numpy.ndarray): The name of the candidate choice of each
+        poll based on specified party.
+    """
+    choices = None
+    if cand_list is not None:
+        choices = cand_list[0] if party in ('Dem', 'Ind') else cand_list[1]
 
-    # print(choice)
-    return choice
+    return match_first_choice(answers, num_polls, party, choices)
 
-def parse_candidate_presidential(row, party, cand_list=None):
+def parse_candidate_presidential(answers, num_polls, party, cand_list=None):
     """
     NOTE: Used Presidential polls only to account for split Harris/Biden polls.
 
-    Parses a poll (row) to extract the candidate choice based on party 
-    affiliation. Returns "parse_candidate_error" if the candidate is not 
-    in the provided cand_list. 
+    Parses polls to extract the candidate choice based on party 
+    affiliation. Returns "parse_candidate_error" for a poll if the 
+    candidate is not in the provided cand_list. 
 
     Args:
-    - row (pandas.Series): A row of poll data with the 'answers' field.
+    - answers (pandas.DataFrame): Long answers table from explode_answers.
+    - num_polls (int): Number of polls in the table.
     - party (str, optional): Party affiliation to filter the candidate choices. 
     - cand_list (list of lists, optional): A list containing three lists,
         the two for Dem candidate(s), the second for Rep candidate(s). 
         Used to verify the extracted candidate choice. Default is None.
 
     Returns: 
-    - choice (str): The name of the candidate choice based on specified party.
-    """
-    choice = None
-
-    # Extract the 'answers' from the row
-    answers = row['answers']
-
-    # Iterate through answers until choice is found
-    for answer in answers:
-        # Check if the candidate choice matches the specified party 
-        # and (if applicable) is in the list of candidates
-        if answer['party'] == party: 
-            if party == 'Dem' and (cand_list is None or answer['choice'] in cand_list[0] or answer['choice'] in cand_list[1]):
-                choice = answer['choice']
-                break   
-            elif party == 'Rep' and (cand_list is None or answer['choice'] in cand_list[2]):
-                choice = answer['choice']
-                break 
-    
-    # If no candidate choice is found, return an error
-    if not choice:
-        # print("PARSE CANDIDATE ERROR IN {} FOR {}: {}".format(row['state'].upper(), party.upper(), answers))
-        return "parse_candidate_error"
+    - choice (numpy.ndarray): The name of the candidate choice of each
+        poll based on specified party.
+    """
+    choices = None
+    if cand_list is not None:
+        choices = cand_list[0] + cand_list[1] if party == 'Dem' else cand_list[2]
 
-    # print(choice)
-    return choice
+    return match_first_choice(answers, num_polls, party, choices)
+
+def sum_pct(answers, num_polls, matches):
+    """
+    NOTE: Helper function for parse_dminusr and parse_dminusr_presidential.
+
+    Sums 'pct' of the matching answers of each poll, in answer order.
+
+    Args:
+    - answers (pandas.DataFrame): Long answers table from explode_answers.
+    - num_polls (int): Number of polls in the table.
+    - matches (numpy.ndarray): Boolean mask of the answers to sum.
+
+    Returns:
+    - numpy.ndarray: Sum for each poll (0 if no answer matches).
+    """
+    return np.bincount(answers['poll'].values[matches], 
+                       weights=answers['pct'].values[matches], 
+                       minlength=num_polls)
 
-def parse_dminusr(row, generic=False, dem_cand=None, rep_cand=None):
+def parse_dminusr(answers, num_polls, generic=False, dem_cand=None, rep_cand=None):
     """
     NOTE: Used for House, Senate, and Presidential (prior to Harris) polls.
 
-    Parses a poll (row) to calculate the margin between the Dem and Rep 
+    Parses polls to calculate the margin between the Dem and Rep 
     party/candidate.
 
     Args:
-    - row (pandas.Series): A row of poll data with the 'answers' field.
-    - generic (bool, optional): Whether or not the poll is generic (meaning for House). 
+    - answers (pandas.DataFrame): Long answers table from explode_answers.
+    - num_polls (int): Number of polls in the table.
+    - generic (bool, optional): Whether or not the polls are generic (meaning for House). 
         Default is False.
-    - dem_cand (str, optional: Name of Democratic candidate choice.
-        Default is None (not needed for generic polls).
-    - rep_cand (str, optional): Name of Republican candidate choice.
-        Default if None (not needed for generic polls).
+    - dem_cand (numpy.ndarray, optional): Democratic candidate choice of
+        each poll. Default is None (not needed for generic polls).
+    - rep_cand (numpy.ndarray, optional): Republican candidate choice of
+        each poll. Default if None (not needed for generic polls).
     
     Returns:
-    - dminusr (float): Margin between the Dem and Rep candidates.
+    - dminusr (numpy.ndarray): Margin between the Dem and Rep candidates.
     """
-    d_sum = 0
-    r_sum = 0
+    choice = answers['choice'].values
+    party = answers['party'].values
 
-    # Extract the 'answers' from the row
-    answers = row['answers']
+    if generic:
+        dem_matches = (choice == 'Dem') | (choice == 'Ind')
+        rep_matches = choice == 'Rep'
 
-    # Iterate through answers and calculate polling sums
-    if generic: 
-        for answer in answers:
-            if answer['choice'] == 'Dem' or answer['choice'] == 'Ind':
-                d_sum += float(answer['pct'])
-            elif answer['choice'] == 'Rep':
-                r_sum += float(answer['pct'])
-    
     else: # dem_cand, rep_cand are not None
-        for answer in answers:
-            if (answer['party'] == 'Dem' or answer['party'] == 'Ind') and answer['choice'] == dem_cand:
-                d_sum += float(answer['pct'])
-            elif answer['party'] == 'Rep' and answer['choice'] == rep_cand:
-                r_sum += float(answer['pct'])
+        poll = answers['poll'].values
+        dem_matches = ((party == 'Dem') | (party == 'Ind')) & (choice == np.asarray(dem_cand, dtype=object)[poll])
+        rep_matches = (party == 'Rep') & (choice == np.asarray(rep_cand, dtype=object)[poll])
 
     # Calculate and return the margin
-    return d_sum - r_sum
+    return sum_pct(answers, num_polls, dem_matches) - sum_pct(answers, num_polls, rep_matches)
 
-def parse_dminusr_presidential(row, generic=False, dem_cand_before=None, dem_cand_after=None, rep_cand=None):
+def parse_dminusr_presidential(answers, num_polls, generic=False, dem_cand_before=None, dem_cand_after=None, rep_cand=None):
     """
     NOTE: Used for Presidential polls only to account for Harris/Biden split.
 
-    Parses a poll (row) to calculate the margin between the Dem and Rep 
+    Parses polls to calculate the margin between the Dem and Rep 
     party/candidate.
 
     Args:
-    - row (pandas.Series): A row of poll data with the 'answers' field.
-    - generic (bool, optional): Whether or not the poll is generic (meaning for House). 
+    - answers (pandas.DataFrame): Long answers table from explode_answers.
+    - num_polls (int): Number of polls in the table.
+    - generic (bool, optional): Whether or not the polls are generic (meaning for House). 
         Default is False.
     - dem_cand_before (str, optional: Name of Democratic candidate choice prior.
         Default is None (not needed for generic polls).
@@ -260,35 +442,84 @@ def parse_dminusr_presidential(row, generic=False, dem_cand_before=None, dem_can
         Default if None (not needed for generic polls).
     
     Returns:
-    - dminusr (float): Margin between the Dem and Rep candidates.
+    - dminusr (numpy.ndarray): Margin between the Dem and Rep candidates.
     """
-    d_sum = 0
-    r_sum = 0
+    choice = answers['choice'].values
+    party = answers['party'].values
 
-    # Extract the 'answers' from the row
-    answers = row['answers']
+    if generic:
+        dem_matches = choice == 'Dem'
+        rep_matches = choice == 'Rep'
 
-    # Iterate through answers and calculate polling sums
-    if generic: 
-        for answer in answers:
-            if answer['choice'] == 'Dem':
-                d_sum += float(answer['pct'])
-            elif answer['choice'] == 'Rep':
-                r_sum += float(answer['pct'])
-    
     else: # dem_cand, rep_cand are not None
-        for answer in answers:
-            if answer['party'] == 'Dem' and (answer['choice'] == dem_cand_before or answer['choice'] == dem_cand_after):
-                d_sum += float(answer['pct'])
-            elif answer['party'] == 'Rep' and answer['choice'] == rep_cand:
-                r_sum += float(answer['pct'])
+        dem_matches = (party == 'Dem') & ((choice == dem_cand_before) | (choice == dem_cand_after))
+        rep_matches = (party == 'Rep') & (choice == rep_cand)
 
     # Calculate and return the margin
-    return d_sum - r_sum
+    return sum_pct(answers, num_polls, dem_matches) - sum_pct(answers, num_polls, rep_matches)
 
 # ======================================================================
 # COLLECTIVE POLL CLEANING
 
+def get_timespan_schedule(dynamic_timespan=True):
+    """
+    NOTE: Helper function for get_timespans and the config fingerprints.
+
+    Gets the schedule of poll window lengths: (first day, length) pairs in 
+    ascending order, each length applying from its first day until the 
+    next. Days before the first entry use the first length.
+
+    Args:
+    - dynamic_timespan (bool, optional): Whether to use the cycle's 
+        TIMESPAN_SCHEDULE, or the fixed FIXED_TIMESPAN. Default is True.
+
+    Returns:
+    - schedule (list of tuples): (datetime, datetime.timedelta) pairs.
+    """
+    if dynamic_timespan:
+        return TIMESPAN_SCHEDULE
+    return [(START_DATE, FIXED_TIMESPAN)]
+
+def get_timespans(days, dynamic_timespan=True):
+    """
+    NOTE: Helper function for get_timespan and the windowed statistics 
+    engine.
+
+    Gets the length of the poll window on each day, from the schedule 
+    (see get_timespan_schedule). The lengths only depend on the days, not
+    on the day the scraper runs, so backfills are reproducible.
+
+    Args:
+    - days (list of datetime.date): Days.
+    - dynamic_timespan (bool, optional): Whether the window length follows
+        the cycle's schedule. Default is True.
+
+    Returns:
+    - timespans (numpy.ndarray): Window length (timedelta64[ns]) of each day.
+    """
+    schedule = get_timespan_schedule(dynamic_timespan)
+    starts = np.array([start for start, timespan in schedule], dtype='datetime64[ns]')
+    lengths = np.array([timespan for start, timespan in schedule], dtype='timedelta64[ns]')
+
+    idx = np.searchsorted(starts, np.array(days, dtype='datetime64[ns]'), side='right') - 1
+    return lengths[np.maximum(idx, 0)]
+
+def get_timespan(day, dynamic_timespan=True):
+    """
+    NOTE: Helper function for get_polls_in_timespan.
+
+    Gets the length of the poll window on one day (see get_timespans).
+
+    Args:
+    - day (datetime.date): Reference day.
+    - dynamic_timespan (bool, optional): Whether the window length follows
+        the cycle's schedule. Default is True.
+
+    Returns:
+    - timespan (datetime.timedelta): Length of the poll window.
+    """
+    return pd.Timedelta(get_timespans([day], dynamic_timespan)[0]).to_pytimedelta()
+
 def get_polls_in_timespan(day, polls, dynamic_timespan=True):
     """
     NOTE: Helper function for filter_day_polls.
@@ -299,25 +530,14 @@ def get_polls_in_timespan(day, polls, dynamic_timespan=True):
     Args:
     - day (datetime.date): Reference day for determining the time span.
     - polls (pandas.DataFrame): DataFrame with poll data. 
-    - dynamic_timespan (bool, optional): Whether to adjust the timespan 
-        dynamically based on the current month. Default is True.
+    - dynamic_timespan (bool, optional): Whether the window length follows
+        the cycle's schedule. Default is True.
 
     Returns:
     - filtered_polls (pandas.DataFrame): DataFrame with the polls that 
         fall within the timespan.
     """
-    current_month = datetime.today().month
-    timespan = timedelta(weeks=2)
-
-    if dynamic_timespan:
-        # Adjust timespan based on the current_month
-        # Rule before 7/31/24 was 4-3-2
-        if current_month < 9:       # Before September
-            timespan = timedelta(weeks=2)
-        elif current_month < 10:    # Before October
-            timespan = timedelta(weeks=2)
-        else:                       # October - November
-            timespan = timedelta(weeks=1)
+    timespan = get_timespan(day, dynamic_timespan=dynamic_timespan)
 
     # Filter polls based on end dates within the specified timespan
     filtered_polls = polls[(polls['endDate'] >= day - timespan)
@@ -329,9 +549,10 @@ def drop_duplicate_pollsters(polls):
     """
     NOTE: Helper function for filter_day_polls.
 
-    Drops duplicate pollsters. Temporarily transforms 'population' fields
-    to sort the DataFrame. Then, drops 'pollster' duplicates
-    and reverts the temporary transformation. 
+    Drops duplicate pollsters. Sorts polls by 'endDate' (descending) and
+    'population_rank' (see get_population_rank) in one stable sort, then
+    keeps the first poll of each 'pollster' and 'endDate'. The input 
+    DataFrame is not modified.
 
     Args:
     - polls (pandas.DataFrame): DataFrame with poll data.
@@ -339,29 +560,16 @@ def drop_duplicate_pollsters(polls):
     Returns:
     - polls (pandas.DataFrame): DataFrame with duplicate pollsters removed.
     """
+    end = polls['endDate'].values.astype('datetime64[ns]').astype(np.int64)
+    order = np.lexsort((np.arange(len(polls.index)), polls['population_rank'].values, -end))
 
-    # Temporarily tranform 'population' categories for sorting
-    # Likely Voters (LV), Registered Voters (RV), All Adults (A)
-    polls.loc[polls['population'] == 'lv', 'population'] = '1lv'
-    polls.loc[polls['population'] == 'rv', 'population'] = '2rv'
-    polls.loc[polls['population'] == 'a', 'population'] = '3a'
-
-    # Sort the DataFrame by 'population' and 'endDate' in descending order
-    polls = polls.sort_values(by=['population']).sort_values(by=['endDate'], ascending=False)
-    
-    # Drop duplicates based on 'pollster' and 'endDate' columns, keeping the first occurrence
-    polls = polls.drop_duplicates(['pollster', 'endDate'], keep='first')
-
-    # Revert the transformation of 'population'
-    polls.loc[polls['population'] == '1lv', 'population'] = 'lv'
-    polls.loc[polls['population'] == '2rv', 'population'] = 'rv'
-    polls.loc[polls['population'] == '3a', 'population'] = 'a'
-
-    return polls
+    sorted_polls = polls.iloc[order]
+    return sorted_polls[~sorted_polls.duplicated(['pollster', 'endDate'], keep='first').values]
 
 def clean_and_filter_polls(day, polls, dynamic_timespan=True):
     """
-    NOTE: Used for House, Senate, and Presidential polls.
+    NOTE: Single-day version of window_day_stats, which the House, 
+    Senate, and Presidential daily loops use instead.
 
     Filters, sorts, and deduplicates polls within a specified (dynamic)
     time span. Returns the cleaned polls.
@@ -380,87 +588,565 @@ def clean_and_filter_polls(day, polls, dynamic_timespan=True):
     filtered_polls = get_polls_in_timespan(day=day, polls=polls, dynamic_timespan=dynamic_timespan)
     
     # Sort filtered polls by end date in descending order
-    sorted_polls = filtered_polls.sort_values(by=['endDate'], ascending=False)
+    sorted_polls = filtered_polls.sort_values(by=['endDate'], ascending=False, kind='mergesort')
     
     # Drop duplicate polls and sort by end date
-    deduped_polls = drop_duplicate_pollsters(sorted_polls).sort_values(by=['endDate'], ascending=False)
+    deduped_polls = drop_duplicate_pollsters(sorted_polls).sort_values(by=['endDate'], ascending=False, kind='mergesort')
 
     # Get at least 3 polls or polls from the last N weeks, whichever is more data
     final_polls = deduped_polls
     if len(final_polls.index) < 3:
         # Get the three most recent from *all* polls
         filtered_all_polls = polls[polls['endDate'] <= day]
-        sorted_all_polls = filtered_all_polls.sort_values(by=['endDate'], ascending=False)
-        final_polls = drop_duplicate_pollsters(sorted_all_polls).sort_values(by=['endDate'], ascending=False).head(3)
+        sorted_all_polls = filtered_all_polls.sort_values(by=['endDate'], ascending=False, kind='mergesort')
+        final_polls = drop_duplicate_pollsters(sorted_all_polls).sort_values(by=['endDate'], ascending=False, kind='mergesort').head(3)
 
     return final_polls
 
-def write_state_day_stats(day, state, polls, file):
+# ======================================================================
+# WINDOWED POLL STATISTICS
+
+def get_days(start_date):
+    """
+    Gets the days to calculate statistics for, from today back to (but
+    not including) the start date.
+
+    Args:
+    - start_date (datetime.date): Start date for processing polls.
+
+    Returns:
+    - days (list of datetime.date): Days in descending order (newest first).
     """
-    NOTE: Used for Senate and Presidential polls only.
+    today = datetime.today()
+    return [today - timedelta(days=idx) for idx in range((today - start_date).days)]
 
-    Calculates statistics based on poll data for a specified day and state.
-    Writes them to a specified file (assumed TXT).
+def build_poll_windows(polls, group, num_groups):
+    """
+    NOTE: Helper function for build_poll_window and partition_poll_windows.
+
+    Sorts and deduplicates polls once so that the window for any day is a
+    contiguous slice. Polls are ordered exactly as clean_and_filter_polls 
+    orders them (end date, then population, then feed order) and 
+    drop_duplicate_pollsters is applied to the whole set: duplicates share
+    an end date, so they always enter and leave a window together. All
+    groups are sorted together and then split.
 
     Args:
-    - day (datetime.date): Reference day for calculating statistics.
-    - state (dict): State information (number, code, etc.)
     - polls (pandas.DataFrame): DataFrame with poll data.
-    - file (file object): File object to write statistics to.
+    - group (numpy.ndarray): Group code (0 to num_groups - 1) of each poll.
+    - num_groups (int): Number of groups.
+
+    Returns:
+    - windows (list of dicts): Poll window arrays of each group, in 
+        ascending order of end date:
+        - end (numpy.ndarray): End dates as int64 nanoseconds.
+        - dminusr (numpy.ndarray): D-R margins as float64.
+    """
+    population_rank = polls['population_rank'].values
+    end = polls['endDate'].values.astype('datetime64[ns]').astype(np.int64)
+    dminusr = polls['dminusr'].values.astype(np.float64)
+    feed_order = np.arange(len(polls.index))
+
+    # By group, newest first, keeping the first occurrence of each (pollster, endDate)
+    # (same order as drop_duplicate_pollsters)
+    order = np.lexsort((feed_order, population_rank, -end, group))
+    keys = pd.DataFrame(dict(group=group, pollster=pd.factorize(polls['pollster'])[0], endDate=end))
+    keep = ~keys.iloc[order].duplicated(keep='first').values
+    order = order[keep]
+
+    bounds = np.searchsorted(group[order], np.arange(num_groups + 1))
+    windows = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        # Reverse to ascending order for the window bounds
+        group_order = order[lo:hi][::-1]
+        windows.append(dict(end=end[group_order], dminusr=dminusr[group_order]))
+
+    return windows
+
+def build_poll_window(polls):
+    """
+    NOTE: Helper function for window_day_stats.
+
+    Builds the poll window of a single set of polls (see build_poll_windows).
+
+    Args:
+    - polls (pandas.DataFrame): DataFrame with poll data (one state).
+
+    Returns:
+    - dict: Poll window arrays, in ascending order of end date.
+    """
+    return build_poll_windows(polls, np.zeros(len(polls.index), dtype=np.int64), 1)[0]
+
+def partition_poll_windows(polls, by):
+    """
+    NOTE: Helper function for window_day_stats.
+
+    Partitions polls by the specified columns (e.g. state) and builds the
+    poll window of every partition in one pass, rather than masking the 
+    full DataFrame once per state.
+
+    Args:
+    - polls (pandas.DataFrame): DataFrame with poll data.
+    - by (list of str): Columns to partition by.
+
+    Returns:
+    - windows (dict): Poll window (see build_poll_windows) by key tuple, 
+        e.g. ('Maine', 0). Keys without polls are missing (all of them 
+        if there are no polls); use get_poll_window.
+    """
+    if len(polls.index) == 0:
+        return {}
+
+    keys = pd.MultiIndex.from_frame(polls[by])
+    group, groups = pd.factorize(keys)
+    return dict(zip(groups, build_poll_windows(polls, group, len(groups))))
+
+def get_poll_window(windows, key):
+    """
+    Returns the poll window of key from partition_poll_windows, or an 
+    empty window if there are no polls for key.
+    """
+    if key in windows:
+        return windows[key]
+    return dict(end=np.empty(0, dtype=np.int64), dminusr=np.empty(0, dtype=np.float64))
+
+# Rolling order statistics: the polls in a window are kept as a sorted 
+# list of margins, updated with rolling_insert/rolling_remove (binary 
+# search), from which get_median_stats reads the median and MAD directly.
+
+def rolling_insert(values, value):
+    """
+    Inserts value into the sorted list values.
+    """
+    insort(values, value)
+
+def rolling_remove(values, value):
+    """
+    Removes (one occurrence of) value from the sorted list values.
+    """
+    values.pop(bisect_left(values, value))
+
+def get_kth_abs_dev(values, median_margin, k):
+    """
+    NOTE: Helper function for get_median_stats.
+
+    Finds the k-th smallest absolute deviation from the median without
+    sorting the deviations. Deviations of the values below the median 
+    (read right to left) and of the rest (read left to right) are two 
+    sorted sequences; the k-th smallest of their union is found by 
+    binary search on how many come from the first sequence.
+
+    Args:
+    - values (list of float): D-R margins in ascending order.
+    - median_margin (float): Median of values.
+    - k (int): Rank (0-based) of the deviation.
+
+    Returns:
+    - float: k-th smallest absolute deviation.
+    """
+    split = bisect_left(values, median_margin)
+    num_below, num_above = split, len(values) - split
+
+    def below(idx):
+        return median_margin - values[split - 1 - idx]
+
+    def above(idx):
+        return values[split + idx] - median_margin
+
+    # Take i deviations from below and k + 1 - i from above
+    lo, hi = max(0, k + 1 - num_above), min(k + 1, num_below)
+    while True:
+        i = (lo + hi) // 2
+        j = k + 1 - i
+        if i < num_below and j > 0 and below(i) < above(j - 1):
+            lo = i + 1
+        elif i > 0 and j < num_above and below(i - 1) > above(j):
+            hi = i - 1
+        else:
+            break
+
+    return max(below(i - 1) if i > 0 else 0.0, above(j - 1) if j > 0 else 0.0)
+
+def get_median_stats(values):
+    """
+    NOTE: Helper function for window_day_stats.
+
+    Calculates the median and median standard deviation of sorted values.
+
+    Args:
+    - values (list of float): D-R margins in ascending order.
+
+    Returns:
+    - tuple: Median margin, median standard deviation.
+    """
+    n = len(values)
+    mid = n // 2
+    median_margin = values[mid] if n % 2 else (values[mid - 1] + values[mid]) / 2
+
+    if n % 2:
+        median_abs_dev = get_kth_abs_dev(values, median_margin, mid)
+    else:
+        median_abs_dev = (get_kth_abs_dev(values, median_margin, mid - 1) + get_kth_abs_dev(values, median_margin, mid)) / 2
+
+    return median_margin, median_abs_dev * 1.4826 # set multiplicative factor
+
+def window_day_stats(window, days, timespans):
+    """
+    NOTE: Used for House, Senate, and Presidential polls.
+
+    Calculates the statistics clean_and_filter_polls would produce for
+    each day, by moving a two-pointer window backwards one day at a time
+    and keeping the polls in the window sorted by margin. The window 
+    bounds of all days are found up front.
+
+    Args:
+    - window (dict): Poll window arrays from build_poll_window.
+    - days (list of datetime.date): Days in descending order (newest first).
+    - timespans (numpy.ndarray): Length of the poll window on each day 
+        (see get_timespans).
 
     Returns:
-    - dict: Calculated statistics:
-        - number of polls
-        - Julian date
-        - date of the most recent poll
-        - median margin
-        - median standard deviation
-        - state number
-        - state code
+    - stats (list of tuples): For each day, (number of polls, end date of 
+        the most recent poll, median margin, median standard deviation).
+        The last three are None if there are no polls.
+    """
+    end, dminusr = window['end'], window['dminusr']
+    day_values = np.array(days, dtype='datetime64[ns]').astype(np.int64)
+
+    # Polls with day - timespan <= endDate <= day are in the window
+    his = np.searchsorted(end, day_values, side='right')
+    los = np.searchsorted(end, day_values - np.asarray(timespans, dtype='timedelta64[ns]').astype(np.int64), side='left')
+
+    stats = []
+    in_window = []  # Margins of polls in [lo, hi), kept sorted
+    lo = hi = len(end)
+
+    for new_lo, new_hi in zip(los.tolist(), his.tolist()):
+        # Polls with endDate > day leave the window
+        while hi > new_hi:
+            hi -= 1
+            if hi >= lo:
+                rolling_remove(in_window, dminusr[hi])
+        lo = min(lo, hi)
+
+        # Polls with endDate >= day - timespan enter (or leave) the window
+        while lo > new_lo:
+            lo -= 1
+            rolling_insert(in_window, dminusr[lo])
+        while lo < new_lo:
+            rolling_remove(in_window, dminusr[lo])
+            lo += 1
+
+        # Get at least 3 polls or polls from the last N weeks, whichever is more data
+        values = in_window
+        if len(values) < 3:
+            values = sorted(dminusr[max(hi - 3, 0):hi])
+
+        if len(values) == 0:
+            stats.append((0, None, None, None))
+        else:
+            median_margin, median_std_dev = get_median_stats(values)
+            date_most_recent_poll = pd.Timestamp(end[hi - 1]).to_pydatetime()
+            stats.append((len(values), date_most_recent_poll, median_margin, median_std_dev))
+
+    return stats
+
+def window_shard_stats(windows, days, timespans):
     """
-    # Calculate the number of polls
-    num_polls = len(polls.index)
+    NOTE: Helper function for map_window_stats.
 
-    # Get the Julian date of the specified date
-    julian_date = day.strftime("%j")
+    Calculates window_day_stats of every poll window for one shard of 
+    days. Shards are independent: each starts from an empty window.
 
-    # Parse state information
-    state_num = int(state['num'])
+    Args:
+    - windows (list of dicts): Poll windows from build_poll_window.
+    - days (list of datetime.date): Days of the shard, newest first.
+    - timespans (numpy.ndarray): Length of the poll window on each day.
 
-    # Initialize default/prior values
+    Returns:
+    - stats (list of lists): window_day_stats of each window.
+    """
+    return [window_day_stats(window, days, timespans) for window in windows]
+
+def map_window_stats(windows, days, timespans, executor=None):
+    """
+    NOTE: Used for House, Senate, and Presidential polls.
+
+    Calculates window_day_stats for each poll window. Given a process 
+    pool, the date range is split into contiguous shards of 
+    STATS_DAYS_PER_TASK days, and each worker computes the as-of-day 
+    statistics of all windows for its shard from the same (read-only) 
+    windows. Shards are reassembled newest first, so results do not 
+    depend on the number of workers.
+
+    Args:
+    - windows (list of dicts): Poll windows from build_poll_window.
+    - days (list of datetime.date): Days in descending order (newest first).
+    - timespans (numpy.ndarray): Length of the poll window on each day 
+        (see get_timespans).
+    - executor (concurrent.futures.Executor, optional): Process pool.
+        Default is None (run sequentially).
+
+    Returns:
+    - stats (list of lists): window_day_stats of each window.
+    """
+    if executor is None:
+        return window_shard_stats(windows, days, timespans)
+
+    bounds = range(0, len(days), STATS_DAYS_PER_TASK)
+    shards = [days[idx:idx + STATS_DAYS_PER_TASK] for idx in bounds]
+    shard_timespans = [timespans[idx:idx + STATS_DAYS_PER_TASK] for idx in bounds]
+    results = executor.map(window_shard_stats, repeat(windows), shards, shard_timespans)
+
+    # Results come back in shard order (newest first)
+    stats = [[] for window in windows]
+    for shard_stats in results:
+        for window_stats, window_shard in zip(stats, shard_stats):
+            window_stats.extend(window_shard)
+
+    return stats
+
+# ======================================================================
+# OUTPUT TABLES
+
+OUTPUT_COLUMNS = ['num_polls', 'julian_date', 'date_most_recent_poll', 'median_margin', 'median_std_dev', 'state_num']
+
+def new_output_table(num_rows):
+    """
+    NOTE: Used for House, Senate, and Presidential polls.
+
+    Preallocates the columns of a TXT/CSV output (see OUTPUT_COLUMNS). 
+    Rows are filled with set_day_stats and written with write_output_table.
+
+    Args:
+    - num_rows (int): Number of rows (days times states).
+
+    Returns:
+    - table (dict): Column arrays by name.
+    """
+    return dict(num_polls=np.zeros(num_rows, dtype=np.int64),
+                julian_date=np.empty(num_rows, dtype='<U3'),
+                date_most_recent_poll=np.empty(num_rows, dtype='<U3'),
+                median_margin=np.zeros(num_rows, dtype=np.float64),
+                median_std_dev=np.zeros(num_rows, dtype=np.float64),
+                state_num=np.zeros(num_rows, dtype=np.int64))
+
+def set_day_stats(table, row, day, day_stats, state=None):
+    """
+    NOTE: Used for House, Senate, and Presidential polls.
+
+    Sets statistics for a specified day (and state) in a row of an 
+    output table.
+
+    Args:
+    - table (dict): Output table from new_output_table.
+    - row (int): Row to set.
+    - day (datetime.date): Reference day for calculating statistics.
+    - day_stats (tuple): Statistics for the day from window_day_stats.
+    - state (dict, optional): State information (number, prior, etc.).
+        Default is None (House, which always has polls).
+
+    Returns:
+    - None: Sets the row of table.
+    """
+    num_polls, most_recent_poll, median_margin, median_std_dev = day_stats
+
+    # Initialize default/prior values if there are no polls
     date_most_recent_poll = datetime(year=YEAR, month=1, day=1).strftime("%j")
-    median_margin = float(state['prior'])
-    median_std_dev = -999
+    if state is None or num_polls > 0:
+        date_most_recent_poll = most_recent_poll.strftime("%j")
+    else:
+        median_margin = float(state['prior'])
+        median_std_dev = -999
+
+    table['num_polls'][row] = num_polls
+    table['julian_date'][row] = day.strftime("%j")
+    table['date_most_recent_poll'][row] = date_most_recent_poll
+    table['median_margin'][row] = median_margin
+    table['median_std_dev'][row] = median_std_dev
+    if state is not None:
+        table['state_num'][row] = int(state['num'])
+
+def write_output_table(table, name, txt_lines=(), csv_lines=(), state_num=True):
+    """
+    NOTE: Used for House, Senate, and Presidential polls.
 
-    # If there are polls, update statistics
-    if num_polls > 0:
-        date_most_recent_poll = polls['endDate'].iloc[0].strftime("%j")
+    Formats all rows of an output table in one pass over its columns and
+    writes the TXT file (fixed width, read by MATLAB) and the CSV file,
+    followed by any rows reused from the previous run, and a typed 
+    columnar '.npz' copy of the CSV.
 
-        x = pd.Series(polls['dminusr'])
-        median_margin = x.median()
-        median_abs_dev = x.sub(x.median()).abs().median()
-        median_std_dev = median_abs_dev * 1.4826 # set multiplicative factor
-    
-    # Write the statistics to the specified file
-    file.write('%-3d %-4s %-4s %-7.2f %-7.2f %-3d\n' % (num_polls, 
-                                                       julian_date,
-                                                       date_most_recent_poll, 
-                                                       median_margin, 
-                                                       median_std_dev,
-                                                       state_num))
-    
-    # Return a dictionary with the calculated statistics
-    return dict(num_polls=num_polls, 
-                julian_date=julian_date, 
-                date_most_recent_poll=date_most_recent_poll, 
-                median_margin=median_margin, 
-                median_std_dev=median_std_dev, 
-                state_num=state_num)
+    Args:
+    - table (dict): Output table from new_output_table.
+    - name (str): Output name, e.g. 'Senate' for 2024.Senate.polls.median.txt.
+    - txt_lines (list of str, optional): Reused TXT rows.
+    - csv_lines (list of str, optional): Reused CSV rows.
+    - state_num (bool, optional): Whether to write the state number column
+        (not for House). Default is True.
+
+    Returns:
+    - None: Generates TXT/CSV files.
+    """
+    columns = OUTPUT_COLUMNS if state_num else OUTPUT_COLUMNS[:-1]
+    values = list(zip(*[table[column].tolist() for column in columns]))
+
+    # Same as DataFrame.to_csv(index=False, float_format='%.2f'), where
+    # median_std_dev stays an integer column if no row has polls
+    std_format = '%.2f'
+    if len(csv_lines) == 0 and np.all(table['num_polls'] == 0):
+        std_format = '%d'
+
+    if state_num:
+        txt_rows = ['%-3d %-4s %-4s %-7.2f %-7.2f %-3d\n' % row for row in values]
+        csv_rows = [('%d,%s,%s,%.2f,' + std_format + ',%d\n') % row for row in values]
+    else:
+        txt_rows = ['%-3d %-4s %-4s %-7.2f %-7.2f \n' % row for row in values]
+        csv_rows = [('%d,%s,%s,%.2f,' + std_format + '\n') % row for row in values]
+
+    path = os.path.join(dir_path, f'outputs/{YEAR}.{name}.polls.median.txt')
+    with open(path, 'w') as f:
+        f.write(''.join(txt_rows))
+        f.writelines(txt_lines)
+
+    path = os.path.join(dir_path, f'outputs/{YEAR}.{name}.polls.median.csv')
+    with open(path, 'w') as f:
+        f.write(','.join(columns) + '\n')
+        f.write(''.join(csv_rows))
+        f.writelines(csv_lines)
+
+    # Typed columnar copy (see export_util)
+    export_util.export_csv(path, 'polls.median' if state_num else 'house.polls.median')
+
+# ======================================================================
+# INCREMENTAL OUTPUTS
+
+def get_day_fingerprints(polls, days):
+    """
+    NOTE: Helper function for get_reusable_days.
+
+    Fingerprints the poll set behind each day. A day's statistics only
+    depend on polls that ended on or before it, so each fingerprint chains
+    the previous day's with the polls ending on that day: a changed poll
+    changes the fingerprints of its end date and every later day.
+
+    Args:
+    - polls (pandas.DataFrame): DataFrame with parsed poll data.
+    - days (list of datetime.date): Days in descending order (newest first).
+
+    Returns:
+    - fingerprints (list of str): Hex digests, in the same order as days.
+    """
+    columns = ['state', 'district', 'pollster', 'population', 'endDate', 'dminusr']
+    row_hashes = pd.util.hash_pandas_object(polls[columns], index=False).values
+
+    # Group rows by end date, keeping feed order within each date
+    end_dates = polls['endDate'].values.astype('datetime64[D]')
+    order = np.argsort(end_dates, kind='mergesort')
+    row_hashes, end_dates = row_hashes[order], end_dates[order]
+
+    day_dates = np.array([day.date() for day in reversed(days)], dtype='datetime64[D]')
+    bounds = np.searchsorted(end_dates, day_dates, side='right')
+
+    fingerprints = []
+    chain = hashlib.sha1()
+    start = 0
+    for bound in bounds:
+        chain.update(row_hashes[start:bound].tobytes())
+        fingerprints.append(chain.copy().hexdigest())
+        start = bound
+
+    return fingerprints[::-1]
+
+def get_config_fingerprint(**config):
+    """
+    NOTE: Helper function for get_reusable_days.
+
+    Fingerprints everything besides the polls that the outputs depend on
+    (priors, window length, etc.). 
+
+    Args:
+    - **config: JSON-serializable settings.
+
+    Returns:
+    - str: Hex digest.
+    """
+    config['version'] = CHECKPOINT_VERSION
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+def get_checkpoint_path(name):
+    return os.path.join(dir_path, f'outputs/{YEAR}.{name}.polls.checkpoint.json')
+
+def get_reusable_days(name, days, fingerprints, config, lines_per_day):
+    """
+    Compares the current poll fingerprints with the checkpoint of the 
+    previous run. Finds the (oldest) days whose inputs did not change, and
+    reads their rows from the existing TXT/CSV files.
+
+    Args:
+    - name (str): Output name, e.g. 'Senate' for 2024.Senate.polls.median.txt.
+    - days (list of datetime.date): Days in descending order (newest first).
+    - fingerprints (list of str): Fingerprints from get_day_fingerprints.
+    - config (str): Fingerprint from get_config_fingerprint.
+    - lines_per_day (int): Number of rows written per day (number of states).
+
+    Returns:
+    - tuple:
+        - num_reused (int): Number of days (at the end of days) to reuse.
+        - txt_lines (list of str): TXT rows for the reused days.
+        - csv_lines (list of str): CSV rows for the reused days.
+    """
+    no_reuse = (0, [], [])
+
+    try:
+        with open(get_checkpoint_path(name), 'r') as f:
+            checkpoint = json.load(f)
+        with open(os.path.join(dir_path, f'outputs/{YEAR}.{name}.polls.median.txt'), 'r') as f:
+            txt_lines = f.readlines()
+        with open(os.path.join(dir_path, f'outputs/{YEAR}.{name}.polls.median.csv'), 'r') as f:
+            csv_lines = f.readlines()[1:]
+    except (OSError, ValueError):
+        return no_reuse
+
+    # Check that the existing files are the ones described by the checkpoint
+    old_days = checkpoint.get('days', [])
+    num_lines = len(old_days) * lines_per_day
+    if (checkpoint.get('config') != config 
+            or len(txt_lines) != num_lines or len(csv_lines) != num_lines):
+        return no_reuse
+
+    # Count unchanged days, oldest first (always recompute the newest day)
+    new_days = [[day.strftime('%Y-%m-%d'), fingerprint] for day, fingerprint in zip(days, fingerprints)]
+    num_reused = 0
+    while (num_reused < min(len(old_days), len(new_days) - 1)
+           and old_days[-1 - num_reused] == new_days[-1 - num_reused]):
+        num_reused += 1
+
+    start = num_lines - num_reused * lines_per_day
+    return num_reused, txt_lines[start:], csv_lines[start:]
+
+def write_checkpoint(name, days, fingerprints, config):
+    """
+    Records the days and fingerprints behind the TXT/CSV files just written.
+
+    Args:
+    - name (str): Output name, e.g. 'Senate' for 2024.Senate.polls.median.txt.
+    - days (list of datetime.date): Days in descending order (newest first).
+    - fingerprints (list of str): Fingerprints from get_day_fingerprints.
+    - config (str): Fingerprint from get_config_fingerprint.
+
+    Returns:
+    - None: Generates JSON file.
+    """
+    checkpoint = dict(config=config,
+                      days=[[day.strftime('%Y-%m-%d'), fingerprint] for day, fingerprint in zip(days, fingerprints)])
+
+    with open(get_checkpoint_path(name), 'w') as f:
+        json.dump(checkpoint, f)
 
 # ======================================================================
 # HOUSE ELECTION DATA
 
-def process_house_polls(polls, start_date):
+def process_house_polls(polls, start_date, incremental=True, executor=None):
     """
     Filters and parses generic (House) polls. Calculates poll statistics 
     by day, and generates relevant TXT/CSV files.
@@ -468,62 +1154,54 @@ def process_house_polls(polls, start_date):
     Args:
     - polls (pandas.DataFrame): DataFrame with generic poll data.
     - start_date (datetime.date): Start date for processing polls.
+    - incremental (bool, optional): Whether to only recompute days whose
+        polls changed since the last run. Default is True.
+    - executor (concurrent.futures.Executor, optional): Process pool for
+        the poll statistics (see map_window_stats). Default is None.
 
     Returns:
-    - None: Generates TXT/CSV files.
+    - num_polls (int): Number of polls used (after cleaning). Generates
+        TXT/CSV files.
     """
     # Filter 'generic-ballot' polls
     house_polls = polls[polls['type'] == 'generic-ballot']
     print("Number of 'generic-ballot' polls:", len(house_polls))
 
     # For each poll, calculate D-R margins
-    # house_polls.loc[:, 'dminusr'] = house_polls.apply(lambda row: parse_dminusr(row, generic=True), axis=1)
-    # June 2024: Getting rid of 'SettingWithCopyWarning' 
-    house_polls_copy = house_polls.copy()
-    house_polls_copy['dminusr'] = house_polls_copy.apply(lambda row: parse_dminusr(row, generic=True), axis=1)
-    house_polls = house_polls_copy
+    answers = explode_answers(house_polls)
+    house_polls = house_polls.assign(dminusr=parse_dminusr(answers, len(house_polls.index), generic=True))
+
+    # Persist the cleaned polls (see poll_store_util)
+    poll_store_util.append_polls(house_polls, 'house', os.path.join(dir_path, 'polls'))
 
     # --> Generic algorithm
-    path = os.path.join(dir_path, f'outputs/{YEAR}.house.polls.median.txt') 
-    all_output = []
+    days = get_days(start_date)
+    timespans = get_timespans(days, dynamic_timespan=False)
 
-    with open(path, 'w') as f:
+    # Only recompute days whose polls changed since the last run
+    fingerprints = get_day_fingerprints(house_polls, days)
+    config = get_config_fingerprint(start_date=start_date, timespans=get_timespan_schedule(dynamic_timespan=False))
+    num_reused, txt_lines, csv_lines = 0, [], []
+    if incremental:
+        num_reused, txt_lines, csv_lines = get_reusable_days('house', days, fingerprints, config, lines_per_day=1)
+    compute_days = days[:len(days) - num_reused]
+    print(f"Recomputing {len(compute_days)} of {len(days)} days")
+
+    house_stats = map_window_stats(windows=[build_poll_window(house_polls)],
+                                   days=compute_days,
+                                   timespans=timespans[:len(compute_days)],
+                                   executor=executor)[0]
+
+    table = new_output_table(len(compute_days))
+    for row, (day, day_stats) in enumerate(zip(compute_days, house_stats)):
+        set_day_stats(table, row, day, day_stats)
 
-        for idx in range((datetime.today() - start_date).days):
-
-            # Filter polls for the current day
-            day = datetime.today() - timedelta(days=idx)
-            final_polls = clean_and_filter_polls(day=day, 
-                                        polls=house_polls, 
-                                        dynamic_timespan=False)
-
-            # Calculate statistics and write to TXT file
-            num_polls = len(final_polls.index)
-            julian_date = day.strftime("%j")
-            date_most_recent_poll = final_polls['endDate'].iloc[0].strftime("%j")
-            median_margin = final_polls['dminusr'].median()
-
-            x = pd.Series(final_polls['dminusr'])
-            median_abs_dev = x.sub(x.median()).abs().median() 
-            median_std_dev = median_abs_dev * 1.4826 # set multiplicative factor
-
-            f.write('%-3d %-4s %-4s %-7.2f %-7.2f \n' % (num_polls, 
-                                                        julian_date,
-                                                        date_most_recent_poll, 
-                                                        median_margin, 
-                                                        median_std_dev))
-
-            # Append statistics to all_output list
-            all_output.append(dict(num_polls=num_polls, 
-                                   julian_date=julian_date, 
-                                   date_most_recent_poll=date_most_recent_poll, 
-                                   median_margin=median_margin,
-                                   median_std_dev=median_std_dev))
-
-    # Convert all_output to DataFrame and write to CSV file
-    df = pd.DataFrame(all_output)
-    path = os.path.join(dir_path, f'outputs/{YEAR}.house.polls.median.csv')
-    df.to_csv(path, index=False, float_format='%.2f')
+    # Write TXT/CSV files, splicing in the unchanged days
+    write_output_table(table, 'house', txt_lines, csv_lines, state_num=False)
+
+    write_checkpoint('house', days, fingerprints, config)
+
+    return len(house_polls.index)
 
 # ======================================================================
 # SENATE ELECTION DATA
@@ -554,7 +1232,7 @@ def get_sen_states_cands():
 
     return [sen_states, dem_cands, rep_cands]
 
-def process_senate_polls(polls, start_date, sen_states, sen_cands):
+def process_senate_polls(polls, start_date, sen_states, sen_cands, incremental=True, executor=None):
     """
     Filters, parses, and cleans Senate polls. Calculates poll statistics 
     by state and day, and generates relevant TXT/CSV files.
@@ -565,64 +1243,73 @@ def process_senate_polls(polls, start_date, sen_states, sen_cands):
     - sen_states (list of dicts): Information about Senate races by state.
     - sen_cands (list of lists): Two lists: Democratic and Republican 
         candidates(s).
+    - incremental (bool, optional): Whether to only recompute days whose
+        polls changed since the last run. Default is True.
+    - executor (concurrent.futures.Executor, optional): Process pool for
+        the poll statistics (see map_window_stats). Default is None.
 
     Returns:
-    - None: Generates TXT/CSV files.
+    - num_polls (int): Number of polls used (after cleaning). Generates
+        TXT/CSV files.
     """
     # Filter 'senate' polls
     sen_polls = polls[polls['type'] == 'senate']
     print("Number of 'senate' polls:", len(sen_polls))
 
     # For each poll, parse Dem/Rep candidates
-    sen_polls = sen_polls.assign(
-        dem_cand=lambda x: x.apply(parse_candidate, axis=1, party='Dem', cand_list=sen_cands),
-        rep_cand=lambda x: x.apply(parse_candidate, axis=1, party='Rep', cand_list=sen_cands)
-    )
+    answers = explode_answers(sen_polls)
+    num_polls = len(sen_polls.index)
+    dem_cand = parse_candidate(answers, num_polls, party='Dem', cand_list=sen_cands)
+    rep_cand = parse_candidate(answers, num_polls, party='Rep', cand_list=sen_cands)
 
     # Adjust for Nebraska 
-    sen_polls['dem_cand'] = sen_polls.apply(
-        lambda row: parse_candidate(row, party='Ind', cand_list=sen_cands) 
-        if row['dem_cand'] == 'parse_candidate_error' else row['dem_cand'], axis=1
-    )
+    ind_cand = parse_candidate(answers, num_polls, party='Ind', cand_list=sen_cands)
+    dem_cand = np.where(dem_cand == 'parse_candidate_error', ind_cand, dem_cand)
+
+    # For each poll, calculate D-R margins
+    sen_polls = sen_polls.assign(dem_cand=dem_cand, 
+                                 rep_cand=rep_cand,
+                                 dminusr=parse_dminusr(answers, num_polls, dem_cand=dem_cand, rep_cand=rep_cand))
     
     # Cleaning: Remove rows with parse candidate errors
     sen_polls = sen_polls[(sen_polls['dem_cand'] != "parse_candidate_error") & (sen_polls['rep_cand'] != "parse_candidate_error")]
 
     print("Number of polls after cleaning:", len(sen_polls))
 
-    # For each poll, calculate D-R margins
-    sen_polls['dminusr'] = sen_polls.apply(lambda row: parse_dminusr(row, dem_cand=row['dem_cand'], rep_cand=row['rep_cand']), axis=1)
+    # Persist the cleaned polls (see poll_store_util)
+    poll_store_util.append_polls(sen_polls, 'Senate', os.path.join(dir_path, 'polls'))
 
     # --> Generic algorithm
-    path = os.path.join(dir_path, f'outputs/{YEAR}.Senate.polls.median.txt')
-    all_output = [] 
+    days = get_days(start_date)
+    timespans = get_timespans(days, dynamic_timespan=True)
 
-    with open(path, 'w') as f:
+    # Only recompute days whose polls changed since the last run
+    fingerprints = get_day_fingerprints(sen_polls, days)
+    config = get_config_fingerprint(start_date=start_date, timespans=get_timespan_schedule(dynamic_timespan=True), states=sen_states)
+    num_reused, txt_lines, csv_lines = 0, [], []
+    if incremental:
+        num_reused, txt_lines, csv_lines = get_reusable_days('Senate', days, fingerprints, config, lines_per_day=len(sen_states))
+    compute_days = days[:len(days) - num_reused]
+    print(f"Recomputing {len(compute_days)} of {len(days)} days")
+
+    # Calculate statistics for all days, one state at a time
+    sen_windows = partition_poll_windows(sen_polls, by=['state'])
+    sen_stats = map_window_stats(windows=[get_poll_window(sen_windows, (state['name'],)) for state in sen_states],
+                                 days=compute_days,
+                                 timespans=timespans[:len(compute_days)],
+                                 executor=executor)
 
-        for idx in range((datetime.today() - start_date).days):
-            # Filter polls for the current day
-            day = datetime.today() - timedelta(days=idx)
-
-            # Filter polls for specific states
-            for state in sen_states:
-                sen_polls_state = sen_polls[sen_polls['state'] == state['name']] 
-                final_polls = clean_and_filter_polls(day=day, 
-                                            polls=sen_polls_state,
-                                            dynamic_timespan=True)
-
-                # Calculate statistics (dict) and write to TXT file
-                row = write_state_day_stats(day=day,
-                                            state=state, 
-                                            polls=final_polls, 
-                                            file=f)
-                
-                # Append statistics to all_output list
-                all_output.append(row)
-
-    # Convert all_output to DataFrame and write to CSV file
-    df = pd.DataFrame(all_output)
-    path = os.path.join(dir_path, f'outputs/{YEAR}.Senate.polls.median.csv')
-    df.to_csv(path, index=False, float_format='%.2f')
+    table = new_output_table(len(compute_days) * len(sen_states))
+    for idx, day in enumerate(compute_days):
+        for state_idx, (state, state_stats) in enumerate(zip(sen_states, sen_stats)):
+            set_day_stats(table, idx * len(sen_states) + state_idx, day, state_stats[idx], state)
+
+    # Write TXT/CSV files, splicing in the unchanged days
+    write_output_table(table, 'Senate', txt_lines, csv_lines)
+
+    write_checkpoint('Senate', days, fingerprints, config)
+
+    return len(sen_polls.index)
 
 # ======================================================================
 # PRESIDENTIAL ELECTION DATA
@@ -646,27 +1333,38 @@ def get_pres_states():
     
     return states
 
-def process_presidential_polls(polls, start_date, states):
+def process_presidential_polls(polls, start_date, states, incremental=True, executor=None):
     """
     Filters, parses, and cleans Presidential polls. Calculates poll statistics 
-    by state and day, and generates relevant TXT/CSV files.
+    by state and day, and by district with its own medians (mode 'poll', 
+    see get_districts) and day, and generates relevant TXT/CSV files. 
+    Districts with mode 'derive' get no rows: they are derived from their
+    state's median downstream.
 
     Args:
     - polls (pandas.DataFrame): DataFrame with Presidential poll data.
     - start_date (datetime.date): Start date for processing polls.
     - states (list of dicts): Information about Presidential race by state.
+    - incremental (bool, optional): Whether to only recompute days whose
+        polls changed since the last run. Default is True.
+    - executor (concurrent.futures.Executor, optional): Process pool for
+        the poll statistics (see map_window_stats). Default is None.
 
     Returns:
-    - None: Generates TXT/CSV files.
+    - num_polls (int): Number of polls used (after cleaning). Generates
+        TXT/CSV files.
     """
     # Filter 'president-general' polls
     pres_polls = polls[polls['type'] == 'president-general']
     print("Number of 'president-general' polls:", len(pres_polls))
 
-    # For each poll, parse Dem/Rep candidates
+    # For each poll, parse Dem/Rep candidates and calculate D-R margins
+    answers = explode_answers(pres_polls)
+    num_polls = len(pres_polls.index)
     pres_polls = pres_polls.assign(
-        dem_cand=lambda x: x.apply(parse_candidate_presidential, axis=1, party='Dem', cand_list=PRES_CANDS),
-        rep_cand=lambda x: x.apply(parse_candidate_presidential, axis=1, party='Rep', cand_list=PRES_CANDS)
+        dem_cand=parse_candidate_presidential(answers, num_polls, party='Dem', cand_list=PRES_CANDS),
+        rep_cand=parse_candidate_presidential(answers, num_polls, party='Rep', cand_list=PRES_CANDS),
+        dminusr=parse_dminusr_presidential(answers, num_polls, dem_cand_before=DEM_CAND_BEFORE, dem_cand_after=DEM_CAND_AFTER, rep_cand=REP_CAND)
     )
 
     # Cleaning: Remove rows with other match-ups and national polls
@@ -679,106 +1377,247 @@ def process_presidential_polls(polls, start_date, states):
 
     print("Number of polls after cleaning:", len(pres_polls))
 
-    # For each poll, calculate D-R margins
-    pres_polls['dminusr'] = pres_polls.apply(lambda row: parse_dminusr_presidential(row, dem_cand_before=DEM_CAND_BEFORE, dem_cand_after=DEM_CAND_AFTER, rep_cand=REP_CAND), axis=1)
+    # Persist the cleaned polls (see poll_store_util)
+    poll_store_util.append_polls(pres_polls, 'EV', os.path.join(dir_path, 'polls'))
+
+    # Sub-units (districts) with their own medians report the prior of their 
+    # state if they have no polls
+    districts = get_districts()
+    separate_units = np.flatnonzero((districts['mode'] == 'poll').values)
+    priors = {state['name']: state['prior'] for state in states}
+    units = [dict(num=unit['num'], prior=priors[unit['name']]) for unit in districts.iloc[separate_units].to_dict('records')]
 
     # --> Generic algorithm
-    path = os.path.join(dir_path, f'outputs/{YEAR}.EV.polls.median.txt')
-    all_output = []
-    district_output = []
+    days = get_days(start_date)
+    timespans = get_timespans(days, dynamic_timespan=True)
+
+    # Only recompute days whose polls changed since the last run
+    # (the same days for the state and district files)
+    fingerprints = get_day_fingerprints(pres_polls, days)
+    config = get_config_fingerprint(start_date=start_date, timespans=get_timespan_schedule(dynamic_timespan=True), states=states, 
+                                    districts=districts.to_dict('records'), units=units)
+    num_reused, txt_lines, csv_lines = 0, [], []
+    district_txt_lines, district_csv_lines = [], []
+    if incremental:
+        num_reused, txt_lines, csv_lines = get_reusable_days('EV', days, fingerprints, config, lines_per_day=len(states))
+        num_district_reused, district_txt_lines, district_csv_lines = get_reusable_days('EV.districts', days, fingerprints, config,
+                                                                                        lines_per_day=len(units))
+        num_reused = min(num_reused, num_district_reused)
+        txt_lines, csv_lines = txt_lines[len(txt_lines) - num_reused * len(states):], csv_lines[len(csv_lines) - num_reused * len(states):]
+        district_txt_lines = district_txt_lines[len(district_txt_lines) - num_reused * len(units):]
+        district_csv_lines = district_csv_lines[len(district_csv_lines) - num_reused * len(units):]
+    compute_days = days[:len(days) - num_reused]
+    print(f"Recomputing {len(compute_days)} of {len(days)} days")
+
+    # Calculate statistics for all days, one state or district at a time, in one pass
+    # Polls of districts with their own medians are left out of their state's
+    is_separate = np.isin(pres_polls['unit'].values, separate_units)
+    state_windows = partition_poll_windows(pres_polls[~is_separate], by=['state'])
+    unit_windows = partition_poll_windows(pres_polls[is_separate], by=['unit'])
+    windows = ([get_poll_window(state_windows, (state['name'],)) for state in states] 
+               + [get_poll_window(unit_windows, (idx,)) for idx in separate_units])
+    all_stats = map_window_stats(windows=windows,
+                                 days=compute_days,
+                                 timespans=timespans[:len(compute_days)],
+                                 executor=executor)
+    pres_stats, unit_stats = all_stats[:len(states)], all_stats[len(states):]
+
+    table = new_output_table(len(compute_days) * len(states))
+    for idx, day in enumerate(compute_days):
+        for state_idx, (state, state_stats) in enumerate(zip(states, pres_stats)):
+            set_day_stats(table, idx * len(states) + state_idx, day, state_stats[idx], state)
+
+    district_table = new_output_table(len(compute_days) * len(units))
+    for idx, day in enumerate(compute_days):
+        for unit_idx, (unit, stats) in enumerate(zip(units, unit_stats)):
+            set_day_stats(district_table, idx * len(units) + unit_idx, day, stats[idx], unit)
+
+    # Write TXT/CSV files, splicing in the unchanged days
+    write_output_table(table, 'EV', txt_lines, csv_lines)
+    write_output_table(district_table, 'EV.districts', district_txt_lines, district_csv_lines)
+
+    # Latest day of the districts with their own medians, with their
+    # state's number (read by EV_estimator.m)
+    states_by_name = {state['name']: state for state in states}
+    latest_table = new_output_table(len(separate_units))
+    for row, unit_idx in enumerate(separate_units):
+        set_day_stats(latest_table, row, days[0], unit_stats[row][0], states_by_name[districts['name'].iloc[unit_idx]])
+    write_output_table(latest_table, 'EV.district')
+
+    write_checkpoint('EV', days, fingerprints, config)
+    write_checkpoint('EV.districts', days, fingerprints, config)
+
+    return len(pres_polls.index)
 
-    with open(path, 'w') as f:
+# ======================================================================
+# CHANGE MANIFEST
 
-        for idx in range((datetime.today() - start_date).days):
-            # Filter polls for the current day
-            day = datetime.today() - timedelta(days=idx)
-
-            # Filter polls for specific states
-            for state in states:
-                pres_polls_state = pres_polls[pres_polls['state'] == state['name']] 
-                
-                # TODO: Add conditionals to do aggregated polls if there are enough polls or distinguish between district polls
-                # TODO: Incorporate exception for districts more cleanly into the algorithm
-                if state['name'] == 'Maine':
-                    if idx == 0:
-                        # Save district polling data 
-                        pres_polls_maine_district_1 = pres_polls_state[pres_polls_state['district'] == 1].copy()
-                        pres_polls_maine_district_2 = pres_polls_state[pres_polls_state['district'] == 2].copy()
-                        
-                        final_polls_maine_district_1 = clean_and_filter_polls(day=day,
-                                                                    polls=pres_polls_maine_district_1,
-                                                                    dynamic_timespan=True)
-                        final_polls_maine_district_2 = clean_and_filter_polls(day=day,
-                                                                    polls=pres_polls_maine_district_2,
-                                                                    dynamic_timespan=True)
-                        
-                        path_district = os.path.join(dir_path, f'outputs/{YEAR}.EV.district.polls.median.txt')
-                        
-                        with open(path_district, 'w') as g:
-                            row_maine_district_1 = write_state_day_stats(day=day,
-                                                                         state = state,
-                                                                         polls = final_polls_maine_district_1,
-                                                                         file = g) 
-                            row_maine_district_2 = write_state_day_stats(day=day,
-                                                                         state = state,
-                                                                         polls = final_polls_maine_district_2,
-                                                                         file = g) 
-                            
-                        district_output.append(row_maine_district_1)
-                        district_output.append(row_maine_district_2)
-                        
-                        df_district = pd.DataFrame(district_output)
-                        path_district = os.path.join(dir_path, f'outputs/{YEAR}.EV.district.polls.median.csv')
-                        df_district.to_csv(path_district, index=False, float_format='%.2f')
-                    
-                    # Filter polls for NaN districts, which are state-wide polls
-                    pres_polls_state = pres_polls_state[np.isnan(pres_polls_state['district'])]
-                    
-                final_polls = clean_and_filter_polls(day=day, 
-                                            polls=pres_polls_state,
-                                            dynamic_timespan=True)
-                
-                # Calculate statistics (dict) and write to TXT file
-                row = write_state_day_stats(day=day, 
-                                            state=state, 
-                                            polls=final_polls, 
-                                            file=f)
-                
-                # Append statistics to all_output list
-                all_output.append(row)
-    
-    # Convert all_output to DataFrame and write to CSV file
-    df = pd.DataFrame(all_output)
-    path = os.path.join(dir_path, f'outputs/{YEAR}.EV.polls.median.csv')
-    df.to_csv(path, index=False, float_format='%.2f')
+# Input files of each stage besides the feed (see write_manifest)
+STAGE_INPUT_FILES = {'House': [],
+                     'Senate': [f'{YEAR}.Senate.priors.csv'],
+                     'Presidential': [f'{YEAR}.EV.priors.csv', f'{YEAR}.EV.districts.csv']}
+
+def write_manifest(stages, feed_digest):
+    """
+    Adds an entry for each output of the stages (e.g. 'Senate') to the 
+    change manifest (see manifest_util): hashes of the inputs (feed and
+    priors) and of the TXT/CSV outputs. Downstream stages compare the 
+    output hashes to skip work whose inputs did not change.
+
+    Hashes are per race file, not per state: every downstream output 
+    (the MATLAB estimates, graphics, banner and sidebar) is computed 
+    from all the states of its race, so a changed state median changes
+    them all, and an unchanged file already skips them.
+
+    Args:
+    - stages (list of tuples): (name, output names, process function, arguments).
+    - feed_digest (str): SHA-256 hex digest of the feed.
+    """
+    entries = {}
+    for name, outputs, process, process_args in stages:
+        inputs = {os.path.basename(path): manifest_util.hash_file(os.path.join(dir_path, path)) 
+                  for path in STAGE_INPUT_FILES[name]}
+        inputs['feed'] = feed_digest
+
+        for output in outputs:
+            paths = {ext: os.path.join(dir_path, f'outputs/{YEAR}.{output}.polls.median.{ext}') for ext in ('txt', 'csv')}
+            entries[output] = dict(inputs=inputs,
+                                   outputs={os.path.basename(path): manifest_util.hash_file(path) for path in paths.values()})
+
+    manifest_util.update_manifest(entries, os.path.join(dir_path, 'outputs', os.path.basename(manifest_util.MANIFEST_PATH)))
 
 # ======================================================================
 
-def main():
+def run_stage(name, outputs, process, process_args, incremental, executor=None):
+    """
+    Runs one of process_house_polls, process_senate_polls and
+    process_presidential_polls as a stage of the run report.
+    """
+    print(f"Generating {name} medians...")
+    paths = [os.path.join(dir_path, f'outputs/{YEAR}.{output}.polls.median.{ext}') for output in outputs for ext in ('txt', 'csv')]
+    with run_report_util.stage(f'{name} medians', outputs=paths) as info:
+        info['rows'] = process(*process_args, incremental=incremental, executor=executor)
+    print(f"Done generating {name} medians...")
+
+def run_stages_concurrently(stages, incremental, jobs):
+    """
+    Runs the House, Senate and Presidential stages at the same time. The 
+    stages share a pool of worker processes for their poll statistics
+    (see map_window_stats); each stage writes its own files, so outputs
+    are the same as when run one after another.
+
+    Args:
+    - stages (list of tuples): (name, output names, process function, arguments).
+    - incremental (bool): Whether to only recompute days whose polls changed.
+    - jobs (int): Number of worker processes.
+    """
+    # Spawn (rather than fork) workers, since the stages run in threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context) as executor:
+        with ThreadPoolExecutor(max_workers=len(stages)) as threads:
+            futures = [threads.submit(run_stage, name, outputs, process, process_args, incremental, executor)
+                       for name, outputs, process, process_args in stages]
+            for future in futures:
+                future.result()
+
+def run_backfill(stages, jobs):
+    """
+    Rebuilds the whole daily history of every stage (e.g. after priors,
+    candidate lists or cleaning rules change). Stages run one after 
+    another; within each, the date range is sharded across the worker 
+    processes (see map_window_stats) and the checkpoints are rewritten.
+
+    Args:
+    - stages (list of tuples): (name, output names, process function, arguments).
+    - jobs (int): Number of worker processes.
+    """
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for name, outputs, process, process_args in stages:
+            run_stage(name, outputs, process, process_args, incremental=False, executor=executor)
+
+def run_scraper(args):
+    """
+    Fetches (or replays) the 538 feed and generates the House, Senate and
+    Presidential medians.
+
+    Args:
+    - args (argparse.Namespace): Command-line arguments (see main).
+
+    Returns:
+    - str: Status for the run report ('ok' or 'skipped').
+    """
+    incremental = not (args.full or args.backfill)
+
+    snapshot = None
+    if args.replay:
+        print("Replaying 538 API polls from", args.replay)
+        path = args.replay
+    else:
+        print("Fetching 538 API polls...")
+        with run_report_util.stage('fetch', outputs=[snapshot_util.SNAPSHOT_DIR]):
+            snapshot = snapshot_util.fetch_snapshot(FIVETHIRTYEIGHT_API_URL)
+        if snapshot['processed_today'] and not (args.force or args.full or args.backfill):
+            print("Feed unchanged and already processed today, skipping")
+            return 'skipped'
+        path = snapshot['path']
+
     print("Scraping all 538 API polls...")
-    all_polls = get_all_polls(YEAR)
+    with run_report_util.stage('get_all_polls') as info:
+        all_polls = get_all_polls(YEAR, path)
+        info['rows'] = len(all_polls.index)
     print("Total number of polls:", len(all_polls))
 
-    # HOUSE
-    print("Generating House medians...")
-    process_house_polls(all_polls, START_DATE)
-    print("Done generating House medians...")
-
-    # SENATE
-    print("Generating Senate medians...")
     sen_states = get_sen_states_cands()[0]
     sen_cands = get_sen_states_cands()[1:]
+    pres_states = get_pres_states() 
     # print("sen_states:", sen_states)
     # print("sen_cands:", sen_cands)
-    process_senate_polls(all_polls, START_DATE, sen_states, sen_cands)
-    print("Done generating Senate medians...")
-
-    # PRESIDENTIAL
-    print("Generating Presidential medians...")
-    pres_states = get_pres_states() 
     # print("pres_states:", pres_states)
-    process_presidential_polls(all_polls, START_DATE, pres_states)
-    print("Done generating Presidential medians...")
+
+    stages = [('House', ['house'], process_house_polls, (all_polls, START_DATE)),
+              ('Senate', ['Senate'], process_senate_polls, (all_polls, START_DATE, sen_states, sen_cands)),
+              ('Presidential', ['EV', 'EV.districts', 'EV.district'], process_presidential_polls, (all_polls, START_DATE, pres_states))]
+
+    if args.backfill:
+        jobs = args.jobs or os.cpu_count() or 1
+        print(f"Backfilling all days since {START_DATE:%Y-%m-%d} with {jobs} worker processes...")
+        run_backfill(stages, jobs)
+    elif args.jobs and args.jobs > 1:
+        run_stages_concurrently(stages, incremental, args.jobs)
+    else:
+        for name, outputs, process, process_args in stages:
+            run_stage(name, outputs, process, process_args, incremental)
+
+    write_manifest(stages, snapshot['digest'] if snapshot is not None else manifest_util.hash_file(path))
+
+    if snapshot is not None:
+        snapshot_util.mark_processed(snapshot['digest'])
+
+    return 'ok'
+
+def main():
+    parser = argparse.ArgumentParser(description='Scrape 538 polls and generate daily poll medians.')
+    parser.add_argument('--full', action='store_true',
+                        help='recompute every day since START_DATE instead of only days whose polls changed')
+    parser.add_argument('--replay', metavar='SNAPSHOT',
+                        help='run against a stored snapshot (or local copy) of the feed instead of fetching it')
+    parser.add_argument('--force', action='store_true',
+                        help='process the feed even if it is unchanged and was already processed today')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='number of worker processes; with more than 1, House, Senate and Presidential medians are generated concurrently')
+    parser.add_argument('--backfill', action='store_true',
+                        help='rebuild the whole daily history (implies --full and --force), sharding the days across '
+                             '--jobs worker processes (default: all CPUs)')
+    args = parser.parse_args()
+
+    # Write a run report next to the outputs, even if the run fails
+    run_report_util.start_report('scraping', os.path.join(dir_path, 'outputs', run_report_util.REPORT_NAME))
+    try:
+        status = run_scraper(args)
+    except BaseException:
+        run_report_util.write_report('error')
+        raise
+    run_report_util.write_report(status)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,168 @@
+import os
+import gzip
+import json
+import hashlib
+import urllib.request
+import urllib.error
+from datetime import datetime
+
+# ======================================================================
+# GLOBAL VARIABLES
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+SNAPSHOT_DIR = os.path.join(dir_path, 'snapshots')
+STATE_PATH = os.path.join(SNAPSHOT_DIR, 'state.json')
+FETCH_TIMEOUT = 120  # seconds
+
+# ======================================================================
+# SNAPSHOT STORE
+
+def get_snapshot_path(digest):
+    """
+    Returns the path of the (gzip-compressed) snapshot with the given
+    SHA-256 digest of its uncompressed contents.
+    """
+    return os.path.join(SNAPSHOT_DIR, f'{digest}.json.gz')
+
+def read_state():
+    """
+    NOTE: Helper function for fetch_snapshot and mark_processed.
+
+    Reads the state of the snapshot store: the validators (ETag and
+    Last-Modified) of the latest fetch, the digest of the latest snapshot,
+    and the date on which it was last processed.
+
+    Returns:
+    - state (dict): Snapshot store state (empty if there is none yet).
+    """
+    if not os.path.exists(STATE_PATH):
+        return {}
+
+    with open(STATE_PATH, 'r') as f:
+        return json.load(f)
+
+def write_state(state):
+    """
+    NOTE: Helper function for fetch_snapshot and mark_processed.
+
+    Writes the state of the snapshot store atomically.
+
+    Args:
+    - state (dict): Snapshot store state.
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp_path = STATE_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_PATH)
+
+def save_snapshot(content):
+    """
+    Stores the feed contents as a compressed, content-addressed snapshot.
+    Identical contents are only stored once.
+
+    Args:
+    - content (bytes): Uncompressed feed contents.
+
+    Returns:
+    - digest (str): SHA-256 hex digest of content.
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    path = get_snapshot_path(digest)
+
+    if not os.path.exists(path):
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    return digest
+
+def open_snapshot(path):
+    """
+    Opens a stored snapshot (or any local copy of the feed) for reading.
+    Files ending in '.gz' are decompressed.
+
+    Args:
+    - path (str): Path to the snapshot.
+
+    Returns:
+    - file object: Binary file object with the uncompressed feed.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+# ======================================================================
+# CONDITIONAL FETCH
+
+def fetch_snapshot(url):
+    """
+    Fetches the feed with a conditional request (If-None-Match /
+    If-Modified-Since), so an unchanged feed is not downloaded again, and
+    stores new contents as a snapshot.
+
+    Args:
+    - url (str): URL of the feed.
+
+    Returns:
+    - dict:
+        - path (str): Path to the snapshot of the current feed.
+        - digest (str): SHA-256 hex digest of the current feed.
+        - changed (bool): Whether the feed changed since the last fetch.
+        - processed_today (bool): Whether this feed was already processed
+            today (see mark_processed).
+    """
+    state = read_state()
+    latest = state.get('digest')
+
+    # Only send validators if the snapshot they refer to is still stored
+    headers = {}
+    if latest and os.path.exists(get_snapshot_path(latest)):
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            content = response.read()
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+        digest = save_snapshot(content)
+        print(f"Fetched feed: {len(content)} bytes")
+
+    except urllib.error.HTTPError as error:
+        if error.code != 304:
+            raise
+        digest, etag, last_modified = latest, state.get('etag'), state.get('last_modified')
+        print("Fetched feed: not modified")
+
+    # Keep the processed date only if the feed did not change
+    changed = digest != latest
+    processed_date = None if changed else state.get('processed_date')
+
+    write_state(dict(digest=digest,
+                     etag=etag,
+                     last_modified=last_modified,
+                     processed_date=processed_date))
+
+    return dict(path=get_snapshot_path(digest),
+                digest=digest,
+                changed=changed,
+                processed_today=processed_date == datetime.today().date().isoformat())
+
+def mark_processed(digest):
+    """
+    Records that the snapshot with the given digest was processed today.
+    Call after all outputs have been written.
+
+    Args:
+    - digest (str): SHA-256 hex digest of the processed snapshot.
+    """
+    state = read_state()
+    if state.get('digest') == digest:
+        state['processed_date'] = datetime.today().date().isoformat()
+        write_state(state)
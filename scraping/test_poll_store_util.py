@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import poll_store_util
+
+def make_polls(end_dates, margins):
+    num_polls = len(end_dates)
+    return pd.DataFrame(dict(id=[str(idx) for idx in range(num_polls)],
+                             state=['Ohio'] * num_polls,
+                             district=np.zeros(num_polls, dtype=np.int64),
+                             pollster=['Pollster'] * num_polls,
+                             population=['lv'] * num_polls,
+                             startDate=pd.to_datetime(end_dates) - pd.Timedelta(days=2),
+                             endDate=pd.to_datetime(end_dates),
+                             dminusr=np.asarray(margins, dtype=float)))
+
+def test_append_polls_empty(tmp_path):
+    assert poll_store_util.append_polls(make_polls([], []), 'Senate', str(tmp_path)) == 0
+    assert poll_store_util.read_index(str(tmp_path)) == {'Senate': {}}
+    assert len(poll_store_util.query_polls('Senate', store_dir=str(tmp_path)).index) == 0
+
+def test_append_polls_empty_after_polls(tmp_path):
+    poll_store_util.append_polls(make_polls(['2024-09-03', '2024-10-01'], [1.5, -2.0]), 'Senate', str(tmp_path))
+    poll_store_util.append_polls(make_polls([], []), 'Senate', str(tmp_path))
+
+    assert poll_store_util.read_index(str(tmp_path)) == {'Senate': {}}
+    assert len(poll_store_util.query_polls('Senate', store_dir=str(tmp_path)).index) == 0
+
+def test_append_polls_races_keep_own_index(tmp_path):
+    poll_store_util.append_polls(make_polls(['2024-09-03'], [1.5]), 'Senate', str(tmp_path))
+    poll_store_util.append_polls(make_polls(['2024-10-01', '2024-10-02'], [3.0, 4.0]), 'EV', str(tmp_path))
+
+    index = poll_store_util.read_index(str(tmp_path))
+    assert sorted(index) == ['EV', 'Senate']
+    assert index['Senate']['2024-09']['rows'] == 1
+    assert list(poll_store_util.query_polls(['Senate', 'EV'], store_dir=str(tmp_path))['race']) == ['Senate', 'EV', 'EV']
+
+def test_append_polls_removes_superseded_parts(tmp_path):
+    poll_store_util.append_polls(make_polls(['2024-09-03', '2024-10-01'], [1.5, -2.0]), 'Senate', str(tmp_path))
+    old_index = poll_store_util.read_index(str(tmp_path))['Senate']
+    poll_store_util.append_polls(make_polls(['2024-10-01', '2024-10-04'], [-2.0, 0.5]), 'Senate', str(tmp_path))
+    index = poll_store_util.read_index(str(tmp_path))['Senate']
+
+    assert sorted(index) == ['2024-10']
+    assert not (tmp_path / old_index['2024-09']['part']).exists()
+    assert not (tmp_path / old_index['2024-10']['part']).exists()
+    assert sorted(path.name for path in (tmp_path / 'Senate').rglob('*.npz')) == [index['2024-10']['part'].split(os.sep)[-1]]
+    assert list(poll_store_util.query_polls('Senate', store_dir=str(tmp_path))['dminusr']) == [-2.0, 0.5]
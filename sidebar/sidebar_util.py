@@ -1,5 +1,6 @@
 
 import os
+import sys
 import csv
 
 from decimal import *
@@ -8,6 +9,10 @@ from collections import OrderedDict
 from datetime import datetime
 import operator
 
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+import run_report_util
+import manifest_util
+
 # ======================================================================
 # GLOBAL VARIABLES
 
@@ -466,21 +471,44 @@ def write_presidential_race_table_full(margins, votes):
 
 # ======================================================================
 
-def main():
-    # SENATE
+def write_senate_sidebars():
     sen_names = get_sen_candidates(SENATE_PRIORS_CSV)
     sen_margins = get_sen_margins(SENATE_POLLS_CSV)
     sen_votes = get_sen_jerseyvotes(SENATE_JERSEYVOTES_CSV)
-    
+
     write_senate_jv_widget(sen_names, sen_margins, sen_votes)
     write_senate_table(sen_names, sen_margins, sen_votes)
 
-    # PRESIDENTIAL
+def write_presidential_sidebars():
     ev_margins = get_ev_margins(EV_STATEPROBS_CSV)
     ev_votes = get_ev_jerseyvotes(EV_JERSEYVOTES_CSV)
 
     write_presidential_race_table(ev_margins, ev_votes)
     write_presidential_race_table_full(ev_margins, ev_votes)
 
+def run_sidebars():
+    """
+    Writes the Senate and Presidential sidebar widgets and tables, timing
+    each race as a stage of the run report. A race is skipped if the 
+    outputs it reads did not change since its sidebars were last written
+    today (see manifest_util).
+    """
+    stamp_path = os.path.join(DIR_PATH, manifest_util.STAMP_NAME)
+    races = [('Senate', ['Senate', f'matlab/Senate_jerseyvotes_{YEAR}.csv'], write_senate_sidebars),
+             ('Presidential', [f'matlab/EV_stateprobs_{YEAR}.csv', f'matlab/EV_jerseyvotes_{YEAR}.csv'], write_presidential_sidebars)]
+
+    for name, names, write in races:
+        with run_report_util.stage(f'{name} sidebar', outputs=[DIR_PATH]) as info:
+            info['skipped'] = not manifest_util.run_if_changed(stamp_path, name, names, write)
+
+def main():
+    run_report_util.start_report('sidebar', os.path.join(DIR_PATH, run_report_util.REPORT_NAME))
+    try:
+        run_sidebars()
+    except BaseException:
+        run_report_util.write_report('error')
+        raise
+    run_report_util.write_report()
+
 if __name__ == "__main__":
     main()